@@ -112,6 +112,7 @@ class AstakosClient(object):
         # API urls under auth_url
         self.auth_prefix = parsed_auth_url.path
         self.api_tokens = join_urls(self.auth_prefix, "tokens")
+        self.api_tokens_introspect = join_urls(self.api_tokens, "introspect")
 
     def _fill_endpoints(self, endpoints, extra=False):
         """Fill the endpoints for our AstakosClient
@@ -495,6 +496,21 @@ class AstakosClient(object):
         self._fill_endpoints(r)
         return r
 
+    # --------------------------------------
+    # do a GET to ``API_TOKENS_INTROSPECT`` with a token
+    def introspect_token(self):
+        """ Get the uuid, expiration and roles of the token holder
+
+        Unlike authenticate, no service catalog is returned, so this is
+        the cheapest way for a service to validate the token of a request.
+        It returns a dict with the keys "uuid", "expires" and "roles".
+
+        In case of error raise an AstakosClientException.
+
+        """
+        return self._call_astakos(self.api_tokens_introspect, method="GET",
+                                  log_body=False)
+
     # --------------------------------------
     # do a GET to ``API_TOKENS`` with a token
     def validate_token(self, token_id, belongs_to=None):
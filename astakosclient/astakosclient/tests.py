@@ -53,6 +53,7 @@ account_prefix = "/account_prefix"
 ui_prefix = "/ui_prefix"
 oauth2_prefix = "/oauth2"
 api_tokens = "/identity/v2.0/tokens"
+api_tokens_introspect = "/identity/v2.0/tokens/introspect"
 api_usercatalogs = join_urls(account_prefix, "user_catalogs")
 api_resources = join_urls(account_prefix, "resources")
 api_quotas = join_urls(account_prefix, "quotas")
@@ -76,6 +77,12 @@ user = {
     'roles_links': []
     }
 
+introspection = {
+    "uuid": user['id'],
+    "expires": "2013-06-19T15:23:59.975572+00:00",
+    "roles": user['roles'],
+    }
+
 resources = {
     "cyclades.ram": {
         "unit": "bytes",
@@ -248,6 +255,8 @@ def _mock_request(conn, method, url, **kwargs):
     """This request behaves like original Astakos does"""
     if api_tokens == url:
         return _req_tokens(conn, method, url, **kwargs)
+    elif api_tokens_introspect == url:
+        return _req_tokens_introspect(conn, method, url, **kwargs)
     elif api_usercatalogs == url:
         return _req_catalogs(conn, method, url, **kwargs)
     elif api_resources == url:
@@ -281,6 +290,22 @@ def _req_tokens(conn, method, url, **kwargs):
         return ("", json.dumps(endpoints), 200)
 
 
+def _req_tokens_introspect(conn, method, url, **kwargs):
+    """Return the introspection of the token"""
+    global token, user
+
+    # Check input
+    if conn.__class__.__name__ != "HTTPSConnection":
+        return _request_status_302(conn, method, url, **kwargs)
+    if method != "GET":
+        return _request_status_400(conn, method, url, **kwargs)
+    req_token = kwargs['headers'].get('X-Auth-Token')
+    if req_token != token['id']:
+        return _request_status_401(conn, method, url, **kwargs)
+
+    return ("", json.dumps(introspection), 200)
+
+
 def _req_catalogs(conn, method, url, **kwargs):
     """Return user catalogs"""
     global token, user
@@ -599,6 +624,25 @@ class TestAuthenticate(unittest.TestCase):
         self._auth_user(True)
 
 
+class TestIntrospectToken(unittest.TestCase):
+    """Test cases for function introspect_token"""
+
+    # Patch astakosclient's _do_request function
+    def setUp(self):  # noqa
+        astakosclient._do_request = _mock_request
+
+    def test_invalid_token(self):
+        """Test introspect_token with an invalid token"""
+        client = AstakosClient("skaksaFlBl+fasFdaf24sx", auth_url)
+        self.assertRaises(Unauthorized, client.introspect_token)
+
+    def test_introspect_token(self):
+        """Test introspect_token"""
+        global token, introspection, auth_url
+        client = AstakosClient(token['id'], auth_url)
+        self.assertEqual(client.introspect_token(), introspection)
+
+
 class TestDisplayNames(unittest.TestCase):
     """Test cases for functions getDisplayNames/getDisplayName"""
 
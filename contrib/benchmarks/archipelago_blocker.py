@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Microbenchmark of ArchipelagoBlocker.block_stor and block_ping.
+
+The blocker talks to an in-process stand-in of the xseg Request API that
+emulates a fixed storage round-trip latency, so the numbers reflect the
+number of round-trips rather than the speed of the storage.
+
+Usage: archipelago_blocker.py [-n BLOCKS] [-l LATENCY_MS] [-b 1,8,32]
+"""
+
+from optparse import OptionParser
+from time import time
+
+from mock import patch
+
+from pithos.backends.test.fakexseg import FakeXseg
+from pithos.backends.test.blocker import fake_archipelago_blocker
+from pithos.backends.test.util import get_random_data
+
+
+def run(blocks, block_size, latency, batch_size, write_depth):
+    xseg = FakeXseg(latency=latency)
+    with patch('pithos.backends.lib.hashfiler.archipelagoblocker.Request',
+               xseg.request_class()):
+        b = fake_archipelago_blocker(xseg, blocksize=block_size,
+                                     batch_size=batch_size,
+                                     write_depth=write_depth)
+        start = time()
+        hashes, missing = b.block_stor(blocks)
+        stor = time() - start
+        assert len(missing) == len(blocks)
+
+        start = time()
+        assert b.block_ping(hashes) == []
+        ping = time() - start
+    return len(blocks) / stor, len(blocks) / ping, xseg.submitted
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', dest='blocks', type='int', default=256,
+                      help='number of blocks to store')
+    parser.add_option('-s', dest='block_size', type='int', default=4096,
+                      help='block size in bytes')
+    parser.add_option('-l', dest='latency', type='float', default=1.0,
+                      help='emulated round-trip latency in milliseconds')
+    parser.add_option('-b', dest='batch_sizes', default='1,4,16,32,64',
+                      help='comma separated batch sizes')
+    parser.add_option('-w', dest='write_depth', type='int', default=0,
+                      help='write depth (default: same as the batch size)')
+    options, args = parser.parse_args()
+
+    blocks = [get_random_data(options.block_size)
+              for _ in xrange(options.blocks)]
+    latency = options.latency / 1000.0
+    print '%10s %10s %16s %16s %10s' % ('batch', 'depth', 'stor blocks/s',
+                                        'ping blocks/s', 'requests')
+    for batch_size in [int(x) for x in options.batch_sizes.split(',')]:
+        write_depth = options.write_depth or batch_size
+        stor, ping, requests = run(blocks, options.block_size, latency,
+                                   batch_size, write_depth)
+        print '%10d %10d %16.1f %16.1f %10d' % (batch_size, write_depth,
+                                                stor, ping, requests)
+
+
+if __name__ == '__main__':
+    main()
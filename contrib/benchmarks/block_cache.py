@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark repeated range reads through ModularBackend.get_block.
+
+An object is uploaded to a backend using the filestore block module and a
+SQLite database, and the same range of its blocks is read repeatedly, with
+and without the block cache. An extra per-block storage latency can be
+emulated to approximate a remote block store.
+
+Usage: block_cache.py [-n BLOCKS] [-r RANGE] [-i ITERATIONS] [-l MS]
+"""
+
+from optparse import OptionParser
+from time import time, sleep
+
+import os
+import shutil
+import tempfile
+
+from pithos.backends import connect_backend
+from pithos.backends.test.util import get_random_data
+
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def setup(path, block_size, blocks, cache_size):
+    b = connect_backend(db_module='pithos.backends.lib.sqlite',
+                        db_connection=os.path.join(path, 'db'),
+                        block_module='pithos.backends.lib.filestore',
+                        block_params={'path': os.path.join(path, 'data')},
+                        block_size=block_size,
+                        block_cache_size=cache_size)
+    b.pre_exec()
+    b.put_container('user', 'user', 'bench')
+    hashmap = [b.put_block(get_random_data(64) * (block_size / 64))
+               for _ in xrange(blocks)]
+    b.update_object_hashmap('user', 'user', 'bench', 'object',
+                            blocks * block_size, 'application/octet-stream',
+                            hashmap, '', 'pithos')
+    b.post_exec()
+    return b, hashmap
+
+
+def run(b, hashmap, start, end, iterations, latency):
+    if latency:
+        block_get = b.store.block_get_archipelago
+
+        def slow_block_get(hash):
+            sleep(latency)
+            return block_get(hash)
+        b.store.block_get_archipelago = slow_block_get
+
+    read = 0
+    t = time()
+    for _ in xrange(iterations):
+        for h in hashmap[start:end]:
+            read += len(b.get_block(h))
+    return read / (time() - t) / (1024 * 1024)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', dest='blocks', type='int', default=32,
+                      help='number of blocks of the object')
+    parser.add_option('-s', dest='block_size', type='int', default=BLOCK_SIZE,
+                      help='block size in bytes')
+    parser.add_option('-r', dest='range', default='0:8',
+                      help='range of blocks to read repeatedly')
+    parser.add_option('-i', dest='iterations', type='int', default=20,
+                      help='number of times to read the range')
+    parser.add_option('-l', dest='latency', type='float', default=0,
+                      help='emulated storage latency per block in ms')
+    options, args = parser.parse_args()
+
+    start, end = [int(x) for x in options.range.split(':')]
+    cache_size = (end - start) * options.block_size
+    print '%12s %10s %10s %10s %10s' % ('cache', 'MB/s', 'hits',
+                                        'misses', 'evictions')
+    for size in (0, cache_size / 2, cache_size):
+        path = tempfile.mkdtemp()
+        try:
+            b, hashmap = setup(path, options.block_size, options.blocks, size)
+            mbps = run(b, hashmap, start, end, options.iterations,
+                       options.latency / 1000.0)
+            stats = b.block_cache.stats() if b.block_cache else {}
+            print '%12d %10.1f %10s %10s %10s' % (
+                size, mbps, stats.get('hits', '-'), stats.get('misses', '-'),
+                stats.get('evictions', '-'))
+            b.close()
+        finally:
+            shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
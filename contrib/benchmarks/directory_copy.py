@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark copying and moving a directory with a delimiter.
+
+A directory tree of the given number of objects, spread over nested
+subdirectories, is created in a backend using the filestore block module
+and then copied and moved with the per-object path of _copy_object and
+with the bulk path, each in a new temporary SQLite database.
+
+Usage: directory_copy.py [-o OBJECTS] [-f FANOUT]
+"""
+
+from optparse import OptionParser
+from time import time
+
+import os
+import shutil
+import tempfile
+
+from pithos.backends import connect_backend
+
+BLOCK_SIZE = 4 * 1024 * 1024
+ACCOUNT = 'user'
+
+
+def setup(path, objects, fanout):
+    b = connect_backend(db_module='pithos.backends.lib.sqlite',
+                        db_connection=os.path.join(path, 'db'),
+                        block_module='pithos.backends.lib.filestore',
+                        block_params={'path': os.path.join(path, 'data')},
+                        block_size=BLOCK_SIZE)
+    b.pre_exec()
+    b.put_container(ACCOUNT, ACCOUNT, 'bench')
+    b.update_object_hashmap(ACCOUNT, ACCOUNT, 'bench', 'dir', 0,
+                            'application/directory', [], '', 'pithos')
+    data = 'x' * 1024
+    hashmap = [b.put_block(data)]
+    for i in xrange(objects):
+        # dir/a/b/.../i, with fanout entries per level
+        levels = []
+        j = i
+        while j >= fanout:
+            j //= fanout
+            levels.append(str(j % fanout))
+        name = '/'.join(['dir'] + levels + [str(i)])
+        b.update_object_hashmap(ACCOUNT, ACCOUNT, 'bench', name, len(data),
+                                'application/octet-stream', hashmap, '',
+                                'pithos', meta={'index': str(i)})
+        if i % 1000 == 999:
+            b.post_exec()
+            b.pre_exec()
+    b.post_exec()
+    return b
+
+
+def run(b, method, dest):
+    t = time()
+    b.pre_exec()
+    method(ACCOUNT, ACCOUNT, 'bench', 'dir', ACCOUNT, 'bench', dest,
+           'application/directory', 'pithos', delimiter='/')
+    b.post_exec()
+    return time() - t
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-o', dest='objects', type='int', default=100000,
+                      help='number of objects in the directory')
+    parser.add_option('-f', dest='fanout', type='int', default=100,
+                      help='number of entries per subdirectory')
+    options, args = parser.parse_args()
+
+    print '%10s %10s %14s %14s' % ('operation', 'objects', 'per-object s',
+                                   'bulk s')
+    for name in ('copy', 'move'):
+        results = []
+        for bulk in (False, True):
+            path = tempfile.mkdtemp()
+            try:
+                b = setup(path, options.objects, options.fanout)
+                if not bulk:
+                    b._can_copy_objects_bulk = lambda *args: False
+                method = b.copy_object if name == 'copy' else b.move_object
+                results.append(run(b, method, 'dir-%s-%d' % (name, bulk)))
+                b.close()
+            finally:
+                shutil.rmtree(path)
+        print '%10s %10d %14.2f %14.2f' % (name, options.objects,
+                                           results[0], results[1])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark the processing of Ganeti messages by snf-dispatcher.
+
+The messages recorded in the given snf-ganeti-eventd logs (the 'Delivering
+msg' lines of its debug output) or files with one JSON message per line are
+replayed through the callbacks of the dispatcher, the given number of copies
+at a time, as if a mass creation of servers was under way. Every copy refers
+to its own servers and networks, which are created in the Cyclades database
+before each run and deleted after it. Every run is served one message at a
+time, the way the dispatcher did before (0 workers), and by the given
+numbers of workers. The messages per second and the number of acknowledged
+messages are reported. Cluster messages and heartbeats are not replayed.
+
+It runs on a host where snf-cyclades-app is configured. Messages of
+successful operations may issue commissions to Astakos, as they do in the
+dispatcher, so it must not run against a production deployment.
+
+Usage: dispatcher_replay.py [-w 0,4,16] [-c COPIES] [-b BACKEND] LOG...
+"""
+
+from optparse import OptionParser
+from time import time, sleep
+
+import json
+import re
+import os
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "synnefo.settings")
+
+from django.db import close_connection
+
+from synnefo.db.models import (Backend, Flavor, Network, VirtualMachine,
+                               IPAddress)
+from synnefo.logic import callbacks
+from synnefo.logic.worker_pool import WorkerPool
+
+USERID = "dispatcher-replay-benchmark"
+
+RECORDED = re.compile(r"Delivering msg: (\{.*\}) \(key=[^)]*\)")
+
+CALLBACKS = {
+    "ganeti-op-status": callbacks.update_db,
+    "ganeti-network-status": callbacks.update_network,
+    "image-copy-progress": callbacks.update_build_progress,
+    "image-error": callbacks.update_build_progress,
+    "image-info": callbacks.update_build_progress,
+    "image-warning": callbacks.update_build_progress,
+    "image-helper": callbacks.update_build_progress,
+}
+
+
+class Client(object):
+    """Count the replies of the callbacks to the messages."""
+
+    def __init__(self):
+        self.replies = {}
+
+    def reply(self, method, message):
+        self.replies[method] = self.replies.get(method, 0) + 1
+
+    def basic_ack(self, message):
+        self.reply("ack", message)
+
+    def basic_nack(self, message):
+        self.reply("nack", message)
+
+    def basic_reject(self, message, requeue=False):
+        self.reply("reject", message)
+
+
+def read_messages(paths):
+    messages = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                match = RECORDED.search(line)
+                if match is not None:
+                    line = match.group(1)
+                elif not line.startswith("{"):
+                    continue
+                msg = json.loads(line)
+                if msg.get("type") in CALLBACKS:
+                    messages.append(msg)
+    return messages
+
+
+def create_objects(messages, copies, backend):
+    """Create the servers and networks of every copy of the messages."""
+    flavor = Flavor.objects.filter(deleted=False)[0]
+    instances = set()
+    networks = set()
+    for msg in messages:
+        if "instance" in msg:
+            instances.add(msg["instance"])
+        if "network" in msg:
+            networks.add(msg["network"])
+        for nic in msg.get("instance_nics") or []:
+            if nic.get("network"):
+                networks.add(nic["network"])
+
+    names = []
+    for i in xrange(copies):
+        mapping = {}
+        for name in instances:
+            vm = VirtualMachine.objects.create(name=USERID, userid=USERID,
+                                               backend=backend, flavor=flavor,
+                                               imageid=USERID,
+                                               operstate="BUILD")
+            mapping[name] = vm.backend_vm_id
+        for name in networks:
+            network = Network.objects.create(name=USERID, userid=USERID,
+                                             flavor="CUSTOM", mode="bridged",
+                                             state="ACTIVE")
+            mapping[name] = network.backend_id
+        names.append(mapping)
+    return names
+
+
+def delete_objects():
+    IPAddress.objects.filter(userid=USERID).delete()
+    VirtualMachine.objects.filter(userid=USERID).delete()
+    Network.objects.filter(userid=USERID).delete()
+
+
+def copy_messages(messages, names, backend):
+    """Return the AMQP messages of all copies, interleaved."""
+    copies = []
+    for msg in messages:
+        for mapping in names:
+            copy = dict(msg, cluster=backend.clustername)
+            for field in ("instance", "network"):
+                if field in copy:
+                    copy[field] = mapping[copy[field]]
+            if copy.get("instance_nics"):
+                copy["instance_nics"] = [
+                    dict(nic, network=mapping.get(nic.get("network")))
+                    for nic in copy["instance_nics"]]
+            copies.append((CALLBACKS[copy["type"]],
+                           {"delivery_tag": len(copies),
+                            "body": json.dumps(copy)}))
+    return copies
+
+
+def run(messages, workers):
+    client = Client()
+    t = time()
+    if not workers:
+        for callback, message in messages:
+            close_connection()
+            callback(client, message)
+    else:
+        pool = WorkerPool(client, workers)
+        for callback, message in messages:
+            pool.submit(callback, message)
+        while pool.flush():
+            sleep(0.01)
+        pool.close()
+    t = time() - t
+    return len(messages) / t, client.replies
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-w', dest='workers', default='0,4,16',
+                      help='comma separated numbers of workers')
+    parser.add_option('-c', dest='copies', type='int', default=10,
+                      help='number of copies of the recorded messages')
+    parser.add_option('-b', dest='backend',
+                      help='cluster name of the backend of the servers'
+                           ' (default: the first online backend)')
+    options, args = parser.parse_args()
+    if not args:
+        parser.error('no recorded messages given')
+
+    backends = Backend.objects.filter(offline=False)
+    if options.backend is not None:
+        backends = backends.filter(clustername=options.backend)
+    backend = backends[0]
+    recorded = read_messages(args)
+
+    print '%8s %10s %14s %10s' % ('workers', 'messages', 'messages/s',
+                                  'acked')
+    for workers in [int(x) for x in options.workers.split(',')]:
+        names = create_objects(recorded, options.copies, backend)
+        try:
+            messages = copy_messages(recorded, names, backend)
+            rate, replies = run(messages, workers)
+        finally:
+            close_connection()
+            delete_objects()
+        print '%8d %10d %14.1f %10d' % (workers, len(messages), rate,
+                                        replies.get('ack', 0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark parsing the hashmaps of PUT ?hashmap requests.
+
+The body of the request is read in chunks of the given size, as
+socket_read_iterator does, and is parsed either by concatenating the chunks
+and decoding the result with json.loads, or incrementally with
+pithos.api.util.HashmapParser.
+
+Usage: hashmap_parser.py [-n 1000,10000,100000] [-c 4096,4194304]
+"""
+
+from optparse import OptionParser
+from time import time
+
+import hashlib
+
+from django.conf import settings
+if not settings.configured:
+    settings.configure()
+from django.utils import simplejson as json
+
+from pithos.api.util import HashmapParser
+
+
+def concatenate(chunks):
+    data = ''
+    for chunk in chunks:
+        data = ''.join([data, chunk])
+    d = json.loads(data)
+    return d['hashes'], int(d['bytes'])
+
+
+def incremental(chunks):
+    parser = HashmapParser('sha256')
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', dest='hashes', default='1000,10000,100000',
+                      help='comma separated numbers of hashes')
+    parser.add_option('-c', dest='chunk_sizes', default='4096,4194304',
+                      help='comma separated sizes of the chunks read')
+    options, args = parser.parse_args()
+
+    print '%10s %12s %10s %16s %16s' % ('hashes', 'body KB', 'chunk',
+                                        'concatenate s', 'incremental s')
+    for n in [int(x) for x in options.hashes.split(',')]:
+        hashes = [hashlib.sha256(str(i)).hexdigest() for i in xrange(n)]
+        body = json.dumps({'block_hash': 'sha256', 'block_size': 4194304,
+                           'bytes': n * 4194304, 'hashes': hashes})
+        for cs in [int(x) for x in options.chunk_sizes.split(',')]:
+            chunks = [body[i:i + cs] for i in xrange(0, len(body), cs)]
+            results = []
+            for func in (concatenate, incremental):
+                t = time()
+                parsed, size = func(chunks)
+                results.append(time() - t)
+                assert list(parsed) == hashes and size == n * 4194304
+            print '%10d %12d %10d %16.3f %16.3f' % (
+                n, len(body) / 1024, cs, results[0], results[1])
+
+
+if __name__ == '__main__':
+    main()
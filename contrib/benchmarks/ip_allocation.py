@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark concurrent allocations of IP addresses.
+
+A public network with an IPv4 subnet of the given prefix length is created
+in the Cyclades database, and the given numbers of processes allocate
+addresses from it in parallel, one per transaction, the way server
+creations do. Every run is served by the previous layout of the pool (the
+whole pool stored in the row of the pool, which every allocation locks and
+rewrites) and by the current one (the pool stored in chunks, of which an
+allocation locks and rewrites only one). The allocations per second and the
+bytes of pool maps written per allocation are reported. The networks are
+deleted at the end of each run.
+
+It runs on a host where snf-cyclades-app is configured, and must use a
+PostgreSQL database for the results to be meaningful.
+
+Usage: ip_allocation.py [-p PREFIXLEN] [-c 1,4,16] [-n ALLOCATIONS]
+"""
+
+from base64 import b64encode
+from optparse import OptionParser
+from time import time
+
+import os
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "synnefo.settings")
+
+import ipaddr
+
+from django.db import connection, transaction
+
+from synnefo.db.models import Network, Subnet, IPPoolTable, IPAddress
+from synnefo.db.pools import (AVAILABLE, UNAVAILABLE, CHUNK_SIZE,
+                              _bitarray_from_string, _bitarray_to_string)
+from synnefo.logic import ips
+
+USERID = "ip-allocation-benchmark"
+
+
+@transaction.commit_on_success
+def create_network(prefixlen, legacy):
+    network = Network.objects.create(name=USERID, userid=USERID,
+                                     flavor="CUSTOM", mode="bridged",
+                                     mac_prefix="aa:00:0", public=True,
+                                     state="ACTIVE")
+    cidr = ipaddr.IPNetwork("10.0.0.0/%d" % prefixlen)
+    subnet = Subnet.objects.create(network=network, userid=USERID,
+                                   public=True, name=USERID, ipversion=4,
+                                   cidr=str(cidr), gateway=str(cidr[1]))
+    pool_row = IPPoolTable.objects.create(size=cidr.numhosts - 3, offset=2,
+                                          base=str(cidr), subnet=subnet)
+    pool = pool_row.pool
+    if legacy:
+        pool_row.available_map = _bitarray_to_string(pool.available)
+        pool_row.reserved_map = _bitarray_to_string(pool.reserved)
+        pool_row.save()
+    else:
+        pool.save()
+    return network
+
+
+@transaction.commit_on_success
+def delete_network(network):
+    IPAddress.objects.filter(network=network).delete()
+    IPPoolTable.objects.filter(subnet__network=network).delete()
+    Subnet.objects.filter(network=network).delete()
+    network.delete()
+
+
+@transaction.commit_on_success
+def legacy_allocate(network):
+    pool_row = IPPoolTable.objects.select_for_update()\
+        .get(subnet__network=network)
+    available = _bitarray_from_string(pool_row.available_map)
+    reserved = _bitarray_from_string(pool_row.reserved_map)
+    index = int((available & reserved).index(AVAILABLE))
+    available[index] = UNAVAILABLE
+    pool_row.available_map = _bitarray_to_string(available)
+    pool_row.reserved_map = _bitarray_to_string(reserved)
+    pool_row.save()
+    subnet = pool_row.subnet
+    address = str(ipaddr.IPNetwork(subnet.cidr)[index + pool_row.offset])
+    IPAddress.objects.create(subnet=subnet, network=network, userid=USERID,
+                             address=address, ipversion=4)
+    return len(pool_row.available_map) + len(pool_row.reserved_map)
+
+
+@transaction.commit_on_success
+def current_allocate(network):
+    ips.allocate_ip(network, USERID)
+    # The maps of one chunk are rewritten
+    return 2 * len(b64encode("\0" * (CHUNK_SIZE // 8)))
+
+
+def run(allocate, network, processes, allocations):
+    # Every child process opens its own connection
+    connection.close()
+    pids = []
+    pipes = []
+    t = time()
+    for i in xrange(processes):
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            written = 0
+            for j in xrange(allocations):
+                written += allocate(network)
+            connection.close()
+            os.write(w, '%d' % written)
+            os._exit(0)
+        os.close(w)
+        pids.append(pid)
+        pipes.append(r)
+    written = 0
+    for pid, r in zip(pids, pipes):
+        written += int(os.read(r, 64))
+        os.close(r)
+        os.waitpid(pid, 0)
+    t = time() - t
+    total = processes * allocations
+    assert IPAddress.objects.filter(network=network).count() == total
+    return total / t, written / total
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-p', dest='prefixlen', type='int', default=16,
+                      help='prefix length of the subnet')
+    parser.add_option('-c', dest='processes', default='1,4,16',
+                      help='comma separated numbers of parallel processes')
+    parser.add_option('-n', dest='allocations', type='int', default=100,
+                      help='number of allocations per process')
+    options, args = parser.parse_args()
+
+    print '%9s %10s %10s %14s %14s' % ('prefixlen', 'processes', 'layout',
+                                       'allocations/s', 'bytes/alloc')
+    for processes in [int(x) for x in options.processes.split(',')]:
+        for label, allocate in (('legacy', legacy_allocate),
+                                ('current', current_allocate)):
+            network = create_network(options.prefixlen,
+                                     allocate is legacy_allocate)
+            try:
+                rate, written = run(allocate, network, processes,
+                                    options.allocations)
+            finally:
+                delete_network(network)
+            print '%9d %10d %10s %14.1f %14d' % (
+                options.prefixlen, processes, label, rate, written)
+
+
+if __name__ == '__main__':
+    main()
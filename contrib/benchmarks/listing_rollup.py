@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark listing a container with a delimiter.
+
+A synthetic tree of the given number of directories, each holding the
+given number of objects nested the given number of levels deep, is created
+with the SQLAlchemy backend module and its top level is listed with the
+'/' delimiter, with the previous implementation (the listing query is
+executed again after every common prefix, here fetching at most PAGE rows
+each time) and the current one (the common prefixes are computed by the
+database in a single query). By default a temporary SQLite database is
+used; pass a connection string to benchmark another one, e.g. PostgreSQL.
+
+Usage: listing_rollup.py [-d DIRECTORIES] [-o OBJECTS] [-l LEVELS]
+                         [-n LISTINGS] [-c CONNECTION]
+"""
+
+from optparse import OptionParser
+from time import time
+
+import os
+import shutil
+import tempfile
+
+from pithos.backends.lib.sqlalchemy.dbwrapper import DBWrapper
+from pithos.backends.lib.sqlalchemy.node import (Node, ROOTNODE,
+                                                 strnextling)
+from pithos.backends.modular import _props, _propnames, CLUSTER_DELETED
+
+PAGE = 100
+LIMIT = 10000
+
+
+def setup(n, directories, objects, levels):
+    n.wrapper.execute()
+    account = n.node_create(ROOTNODE, 'user')
+    container = n.node_create(account, 'user/bench')
+    for i in xrange(directories):
+        path = 'user/bench/%06d' % i
+        for j in xrange(levels):
+            path += '/%d' % j
+        for j in xrange(objects):
+            node = n.node_create(container, '%s/%06d' % (path, j))
+            n.version_create(node, 'hash', 1024, 'application/octet-stream',
+                             None, 'user', 'uuid', '',
+                             update_statistics_ancestors_depth=0)
+        n.wrapper.commit()
+        n.wrapper.execute()
+    n.wrapper.commit()
+    return container
+
+
+def legacy_list(n, parent, prefix, delimiter, limit):
+    matches = []
+    prefixes = []
+    start = ''
+    while len(matches) < limit:
+        rows, _ = n.latest_version_list(parent, prefix, None, start, PAGE,
+                                         except_cluster=CLUSTER_DELETED)
+        if not rows:
+            break
+        for row in rows:
+            path = row[0]
+            start = path
+            idx = path.find(delimiter, len(prefix))
+            if idx < 0 or idx + len(delimiter) == len(path):
+                matches.append(row)
+                if len(matches) >= limit:
+                    break
+                continue
+            pf = path[:idx + len(delimiter)]
+            prefixes.append(pf)
+            start = strnextling(pf)
+            break
+    return matches, prefixes
+
+
+def current_list(n, parent, prefix, delimiter, limit):
+    return n.latest_version_list(parent, prefix, delimiter, '', limit,
+                                 except_cluster=CLUSTER_DELETED)
+
+
+def run(n, func, parent, listings):
+    t = time()
+    for i in xrange(listings):
+        n.wrapper.execute()
+        matches, prefixes = func(n, parent, 'user/bench/', '/', LIMIT)
+        n.wrapper.commit()
+    return (time() - t) / listings, len(matches) + len(prefixes)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-d', dest='directories', type='int', default=5000,
+                      help='number of top level directories')
+    parser.add_option('-o', dest='objects', type='int', default=4,
+                      help='number of objects per directory')
+    parser.add_option('-l', dest='levels', type='int', default=5,
+                      help='nesting levels of the objects')
+    parser.add_option('-n', dest='listings', type='int', default=5,
+                      help='number of listings per run')
+    parser.add_option('-c', dest='connection', default=None,
+                      help='SQLAlchemy connection string')
+    options, args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    try:
+        db = options.connection or 'sqlite:///%s' % os.path.join(path, 'db')
+        n = Node(wrapper=DBWrapper(db), props=_props(_propnames))
+        parent = setup(n, options.directories, options.objects,
+                       options.levels)
+        print '%12s %10s %14s %14s' % ('directories', 'entries', 'legacy s',
+                                       'current s')
+        results = [run(n, func, parent, options.listings)
+                   for func in (legacy_list, current_list)]
+        assert results[0][1] == results[1][1]
+        print '%12d %10d %14.3f %14.3f' % (options.directories,
+                                           results[1][1], results[0][0],
+                                           results[1][0])
+        n.wrapper.close()
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark serializing object listings in JSON and XML.
+
+A listing of the given number of objects, as returned by
+ModularBackend.list_object_meta, is serialized by the previous path of
+object_list (all objects formatted in a list, then rendered in one string)
+and by the current one (each object formatted and serialized while the
+response is sent). Each run takes place in a child process and reports the
+time to the first chunk of the response, the total time and the growth of
+the peak RSS of the process while serializing.
+
+Usage: listing_stream.py [-n 1000,10000] [-f json,xml]
+"""
+
+from optparse import OptionParser
+from time import time
+
+import os
+import resource
+
+from django.conf import settings
+if not settings.configured:
+    settings.configure(INSTALLED_APPS=('pithos.api',))
+from django.template.loader import render_to_string
+from django.utils import simplejson as json
+
+from pithos.api.functions import _object_list_meta
+from pithos.api.util import listing_iterator, json_encode_decimal
+
+
+class Request(object):
+    def __init__(self, serialization):
+        self.serialization = serialization
+        self.user_uniq = 'user'
+        self.token = None
+
+
+def get_objects(n):
+    objects = []
+    for i in xrange(n):
+        if i % 10 == 0:
+            objects.append({'subdir': 'dir%08d/' % i})
+            continue
+        objects.append({
+            'name': 'object%08d' % i, 'bytes': 4194304 * i,
+            'type': 'application/octet-stream',
+            'hash': '%064x' % i, 'version': i, 'version_timestamp': time(),
+            'modified': time(), 'modified_by': 'user',
+            'uuid': '%032x' % i, 'checksum': '%032x' % i,
+            'available': True, 'map_check_timestamp': None})
+    return objects
+
+
+def legacy_response(request, objects):
+    object_meta = list(_object_list_meta(request, 'user', 'bench', None,
+                                         list(objects), {}, {}))
+    if request.serialization == 'xml':
+        data = render_to_string(
+            'objects.xml', {'container': 'bench', 'objects': object_meta})
+    else:
+        data = json.dumps(object_meta, default=json_encode_decimal)
+    return [data]
+
+
+def current_response(request, objects):
+    return listing_iterator(
+        request, 'object',
+        _object_list_meta(request, 'user', 'bench', None, objects, {}, {}),
+        container='bench')
+
+
+def maxrss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run(func, serialization, n):
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        objects = get_objects(n)
+        rss = maxrss()
+        t = time()
+        first = None
+        length = 0
+        for chunk in func(Request(serialization), objects):
+            if first is None:
+                first = time() - t
+            # The chunk is sent and dropped.
+            length += len(chunk)
+        total = time() - t
+        os.write(w, '%f %f %d' % (first, total, maxrss() - rss))
+        os._exit(0)
+    os.close(w)
+    data = os.read(r, 1024)
+    os.close(r)
+    os.waitpid(pid, 0)
+    first, total, rss = data.split()
+    return float(first), float(total), int(rss)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', dest='objects', default='1000,10000',
+                      help='comma separated numbers of listed objects')
+    parser.add_option('-f', dest='formats', default='json,xml',
+                      help='comma separated serializations')
+    options, args = parser.parse_args()
+
+    print '%6s %8s %10s %10s %10s %10s' % ('format', 'objects', 'path',
+                                           'ttfb s', 'total s', 'rss KB')
+    for serialization in options.formats.split(','):
+        for n in [int(x) for x in options.objects.split(',')]:
+            for name, func in (('legacy', legacy_response),
+                               ('current', current_response)):
+                first, total, rss = run(func, serialization, n)
+                print '%6s %8d %10s %10.3f %10.3f %10d' % (
+                    serialization, n, name, first, total, rss)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark streaming object data through pithos.api.util.ObjectWrapper.
+
+A large object is served from a few in-memory blocks, so the numbers
+reflect the cost of the iterator itself. For each kind of request the
+benchmark reports the throughput, the number of writes handed to the WSGI
+server and the data copied, i.e. the bytes of the chunks that are not
+blocks returned as they are by the backend. Runs with merging disabled
+show the behaviour of one write per piece.
+
+Usage: object_wrapper.py [-g GIGABYTES] [-s BLOCK_SIZE] [-r RANGES]
+"""
+
+from optparse import OptionParser
+from time import time
+
+import os
+
+from django.conf import settings
+if not settings.configured:
+    settings.configure()
+
+from pithos.api.util import ObjectWrapper
+
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class Backend(object):
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self.blocks = dict((str(i), os.urandom(block_size)) for i in range(4))
+
+    def get_block(self, hash):
+        return self.blocks[hash]
+
+
+def run(backend, size, ranges, merge):
+    bs = backend.block_size
+    hashmap = [str(i % 4) for i in xrange((size + bs - 1) / bs)]
+    boundary = 'b' * 32 if len(ranges) > 1 else ''
+    wrapper = ObjectWrapper(backend, ranges, [size], [hashmap], boundary, {})
+    if not merge:
+        wrapper.write_size = 0
+    blocks = set(id(b) for b in backend.blocks.values())
+    writes = copied = total = 0
+    t = time()
+    for chunk in wrapper:
+        writes += 1
+        total += len(chunk)
+        if id(chunk) not in blocks:
+            copied += len(chunk)
+    elapsed = time() - t
+    return total / elapsed / (1024 * 1024), writes, copied / (1024.0 * 1024)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-g', dest='gigabytes', type='float', default=2,
+                      help='object size in GB')
+    parser.add_option('-s', dest='block_size', type='int', default=BLOCK_SIZE,
+                      help='block size in bytes')
+    parser.add_option('-r', dest='ranges', type='int', default=10000,
+                      help='number of small ranges of the multiple range run')
+    options, args = parser.parse_args()
+
+    backend = Backend(options.block_size)
+    size = int(options.gigabytes * 1024 * 1024 * 1024)
+    step = size / options.ranges
+    requests = [
+        ('full', [(0, size)]),
+        ('unaligned', [(1000, size - 2000)]),
+        ('%d ranges' % options.ranges,
+         [(i * step, min(step, 100)) for i in xrange(options.ranges)]),
+    ]
+
+    print '%16s %6s %10s %10s %12s' % ('request', 'merge', 'MB/s', 'writes',
+                                       'copied MB')
+    for name, ranges in requests:
+        for merge in (False, True):
+            mbps, writes, copied = run(backend, size, ranges, merge)
+            print '%16s %6s %10.1f %10d %12.1f' % (name, merge, mbps, writes,
+                                                   copied)
+
+
+if __name__ == '__main__':
+    main()
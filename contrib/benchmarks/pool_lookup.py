@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark free value lookups and counts of pools.
+
+An IP pool of every given prefix length is filled up to the given ratio,
+and then values are allocated from it one at a time, the way allocate_ip
+does (check that the pool is not empty, get the first free value), and
+the free values are counted and looked up, the way pool-list and the
+statistics of floating IPs do. Every operation is served by the previous
+implementation (a new bitarray of the free values of the whole pool per
+operation) and by the current one (the free values, their counts and a
+cursor below which no value is free are kept up to date on every change).
+The pools are kept in memory, so only the cost of the bitarray operations
+is measured.
+
+Usage: pool_lookup.py [-p 24,20,16,12] [-f 0.5] [-n OPERATIONS]
+"""
+
+from optparse import OptionParser
+from time import time
+
+from bitarray import bitarray
+
+from synnefo.db.pools import PoolManager, AVAILABLE, UNAVAILABLE, EmptyPool
+
+
+class Table(object):
+    def __init__(self, size):
+        self.size = size
+        self.available_map = ''
+        self.reserved_map = ''
+
+
+class CurrentPool(PoolManager):
+    def value_to_index(self, value):
+        return value
+
+    def index_to_value(self, index):
+        return index
+
+
+class LegacyPool(object):
+    def __init__(self, size):
+        self.pool_size = size
+        padding = -size % 8
+        self.available = bitarray(size)
+        self.available.setall(AVAILABLE)
+        self.available.extend([UNAVAILABLE] * padding)
+        self.reserved = bitarray(self.available)
+
+    @property
+    def pool(self):
+        return (self.available & self.reserved)
+
+    def get(self):
+        if self.empty():
+            raise EmptyPool
+        index = int(self.pool.index(AVAILABLE))
+        self.available[index] = UNAVAILABLE
+        return index
+
+    def empty(self):
+        return not self.pool.any()
+
+    def count_available(self):
+        return self.pool.count(AVAILABLE)
+
+    def is_available(self, index):
+        return self.pool[index] == AVAILABLE
+
+
+def timed(func, operations):
+    t = time()
+    for i in xrange(operations):
+        result = func(i)
+    return (time() - t) / operations * 1000000, result
+
+
+def run(pool, fill, operations):
+    used = bitarray(fill)
+    used.setall(UNAVAILABLE)
+    available = pool.available
+    available[:fill] = used
+    pool.available = available
+
+    def allocate(i):
+        if not pool.empty():
+            return pool.get()
+
+    alloc, last = timed(allocate, operations)
+    count, free = timed(lambda i: pool.count_available(), operations)
+    lookup, available = timed(lambda i: pool.is_available(last + i),
+                              operations)
+    return alloc, count, lookup, (last, free, available)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-p', dest='prefixlens', default='24,20,16,12',
+                      help='comma separated prefix lengths of the pools')
+    parser.add_option('-f', dest='fill', type='float', default=0.5,
+                      help='ratio of the pool allocated before timing')
+    parser.add_option('-n', dest='operations', type='int', default=100,
+                      help='number of timed operations of every kind')
+    options, args = parser.parse_args()
+
+    print '%9s %10s %14s %14s %14s' % ('prefixlen', 'pool', 'alloc us',
+                                       'count us', 'lookup us')
+    for prefixlen in [int(x) for x in options.prefixlens.split(',')]:
+        size = 2 ** (32 - prefixlen)
+        fill = int(size * options.fill)
+        operations = min(options.operations, (size - fill) // 2)
+        results = []
+        for label, pool in (('legacy', LegacyPool(size)),
+                            ('current', CurrentPool(Table(size)))):
+            alloc, count, lookup, result = run(pool, fill, operations)
+            results.append(result)
+            print '%9d %10s %14.2f %14.2f %14.2f' % (prefixlen, label, alloc,
+                                                      count, lookup)
+        assert results[0] == results[1]
+
+
+if __name__ == '__main__':
+    main()
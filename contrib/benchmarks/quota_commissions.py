@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark the quota commissions of Pithos writes.
+
+A local HTTP server stands in for Astakos, answering the token, commission
+and resolve calls of astakosclient after an emulated latency. Requests are
+run against a backend using the filestore block module and a SQLite
+database, with and without aggregate_commissions, and the benchmark reports
+the mean latency of each request and the commission calls it made.
+
+Usage: quota_commissions.py [-n REQUESTS] [-o OBJECTS] [-l MS]
+"""
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from optparse import OptionParser
+from threading import Thread
+from time import time, sleep
+
+import json
+import os
+import shutil
+import tempfile
+
+from astakosclient import AstakosClient
+from pithos.backends import connect_backend
+from pithos.backends.test.util import get_random_data
+
+BLOCK_SIZE = 4 * 1024 * 1024
+ACCOUNT = 'user'
+
+
+class Astakos(BaseHTTPRequestHandler):
+    latency = 0
+    calls = 0
+    serial = 0
+
+    def do_POST(self):
+        length = int(self.headers.getheader('content-length') or 0)
+        body = json.loads(self.rfile.read(length) or '{}')
+        if self.path.endswith('/tokens'):
+            url = 'http://%s:%d' % self.server.server_address
+            reply = {'access': {'serviceCatalog': [{
+                'name': 'astakos_account', 'type': 'account',
+                'endpoints': [{'versionId': 'v1.0', 'region': 'default',
+                               'publicURL': url + '/account/v1.0',
+                               'SNF:uiURL': url + '/ui'}]}]}}
+        else:
+            sleep(self.latency)
+            Astakos.calls += 1
+            if self.path.endswith('/action'):
+                reply = {'accepted': body.get('accept', []),
+                         'rejected': body.get('reject', []), 'failed': []}
+            else:
+                Astakos.serial += 1
+                reply = {'serial': Astakos.serial}
+        data = json.dumps(reply)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def setup(path, url, aggregate, objects):
+    b = connect_backend(db_module='pithos.backends.lib.sqlite',
+                        db_connection=os.path.join(path, 'db'),
+                        block_module='pithos.backends.lib.filestore',
+                        block_params={'path': os.path.join(path, 'data')},
+                        block_size=BLOCK_SIZE,
+                        aggregate_commissions=aggregate)
+    b.astakosclient = AstakosClient('token', url)
+    b.commission_serials.delete_many = lambda serials: None
+    b.pre_exec()
+    b.put_container(ACCOUNT, ACCOUNT, 'bench')
+    b.update_object_hashmap(ACCOUNT, ACCOUNT, 'bench', 'dir', 0,
+                            'application/directory', [], '', 'pithos')
+    data = get_random_data(1024)
+    hashmap = [b.put_block(data)]
+    for j in xrange(objects):
+        b.update_object_hashmap(ACCOUNT, ACCOUNT, 'bench', 'dir/%d' % j,
+                                len(data), 'application/octet-stream',
+                                hashmap, '', 'pithos')
+    b.post_exec()
+    return b
+
+
+def put(b, i):
+    data = get_random_data(1024)
+    hashmap = [b.put_block(data)]
+    b.update_object_hashmap(ACCOUNT, ACCOUNT, 'bench', 'put/%d' % i,
+                            len(data), 'application/octet-stream', hashmap,
+                            '', 'pithos')
+
+
+def copy(b, i):
+    b.copy_object(ACCOUNT, ACCOUNT, 'bench', 'dir', ACCOUNT, 'bench',
+                  'copy%d' % i, 'application/directory', domain='pithos',
+                  delimiter='/')
+
+
+def delete(b, i):
+    b.delete_object(ACCOUNT, ACCOUNT, 'bench', 'copy%d' % i,
+                    delimiter='/')
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', dest='requests', type='int', default=50,
+                      help='number of requests of each kind')
+    parser.add_option('-o', dest='objects', type='int', default=20,
+                      help='number of objects copied and deleted per request')
+    parser.add_option('-l', dest='latency', type='float', default=5,
+                      help='emulated Astakos latency per call in ms')
+    options, args = parser.parse_args()
+
+    Astakos.latency = options.latency / 1000.0
+    server = HTTPServer(('127.0.0.1', 0), Astakos)
+    t = Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+    url = 'http://127.0.0.1:%d/identity/v2.0' % server.server_address[1]
+
+    print '%10s %10s %14s %14s' % ('request', 'aggregate', 'latency ms',
+                                   'Astakos calls')
+    for aggregate in (False, True):
+        path = tempfile.mkdtemp()
+        try:
+            b = setup(path, url, aggregate, options.objects)
+            for name, func in (('put', put), ('copy dir', copy),
+                               ('delete dir', delete)):
+                Astakos.calls = 0
+                elapsed = 0
+                for i in xrange(options.requests):
+                    t = time()
+                    b.pre_exec()
+                    func(b, i)
+                    b.post_exec()
+                    elapsed += time() - t
+                print '%10s %10s %14.1f %14.1f' % (
+                    name, aggregate, elapsed * 1000 / options.requests,
+                    float(Astakos.calls) / options.requests)
+            b.close()
+        finally:
+            shutil.rmtree(path)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark access checks on shared objects.
+
+An object nested the given number of folders deep below a folder shared
+with a group is read by a member of the group, the way the API serves a
+GET request: the object metadata and its permissions are fetched in a
+single transaction. Every GET is served by the previous implementation
+(one lookup per ancestor path, separate queries for the read and write
+permissions, the groups of the member queried for every check) and by the
+current one (the permissions of the closest ancestor are resolved in a
+single query and the groups of the member are queried once per
+transaction). The number of SQL statements and the latency per GET are
+reported. The SQLite backend module is used on a temporary database.
+
+Usage: shared_object_access.py [-d DEPTH] [-g GROUPS] [-n GETS]
+"""
+
+from optparse import OptionParser
+from time import time
+
+import os
+import shutil
+import tempfile
+import types
+
+from pithos.backends import connect_backend
+from pithos.backends.modular import CLUSTER_NORMAL, inf
+from pithos.backends.exceptions import NotAllowedError
+
+OWNER = 'owner'
+READER = 'reader'
+CONTAINER = 'bench'
+
+
+class Counter(object):
+    def __init__(self):
+        self.statements = 0
+
+    def wrap(self, worker):
+        execute = worker.execute
+
+        def counted(*args):
+            self.statements += 1
+            return execute(*args)
+        worker.execute = counted
+
+
+def setup(b, depth, groups):
+    b.pre_exec()
+    b.put_container(OWNER, OWNER, CONTAINER)
+    b.update_account_groups(OWNER, OWNER, dict(
+        ('group%d' % i, [READER]) for i in xrange(groups)))
+    name = 'shared'
+    b.update_object_hashmap(
+        OWNER, OWNER, CONTAINER, name, 0, 'application/directory', [], '',
+        'pithos', permissions={'read': ['%s:group%d' % (OWNER, groups - 1)]})
+    for i in xrange(depth):
+        name += '/folder%d' % i
+        b.update_object_hashmap(OWNER, OWNER, CONTAINER, name, 0,
+                                'application/directory', [], '', 'pithos')
+    name += '/object'
+    b.update_object_hashmap(OWNER, OWNER, CONTAINER, name, 0,
+                            'application/octet-stream', [], '', 'pithos')
+    b.post_exec()
+    return name
+
+
+def legacy_group_parents(self, member):
+    q = "select owner, name from groups where member = ?"
+    self.execute(q, (member,))
+    return self.fetchall()
+
+
+def legacy_access_inherit(self, path):
+    parts = path.rstrip('/').split('/')
+    valid = []
+    for i in range(1, len(parts)):
+        subp = '/'.join(parts[:i + 1])
+        valid.append(subp)
+        if subp != path:
+            valid.append(subp + '/')
+    return [x for x in valid if self.xfeature_get(x)]
+
+
+def legacy_access_check(self, path, access, member):
+    feature = self.xfeature_get(path)
+    if not feature:
+        return False
+    members = self.feature_get(feature, access)
+    if member in members or '*' in members:
+        return True
+    for owner, group in legacy_group_parents(self, member):
+        if owner + ':' + group in members:
+            return True
+    return False
+
+
+def legacy_get_permissions_path(self, account, container, name):
+    path = '/'.join((account, container, name))
+    permission_paths = legacy_access_inherit(self.permissions, path)
+    permission_paths.sort()
+    permission_paths.reverse()
+    for p in permission_paths:
+        if p == path:
+            return p
+        else:
+            if p.count('/') < 2:
+                continue
+            node = self.node.node_lookup(p)
+            props = None
+            if node is not None:
+                props = self.node.version_lookup(node, inf, CLUSTER_NORMAL)
+            if props is not None:
+                if props[self.TYPE].split(';', 1)[0].strip() in (
+                        'application/directory', 'application/folder'):
+                    return p
+    return None
+
+
+def legacy_can_read_object(self, user, account, container, name):
+    if user == account:
+        return
+    path = '/'.join((account, container, name))
+    if self.permissions.public_get(path) is not None:
+        return
+    path = legacy_get_permissions_path(self, account, container, name)
+    if not path:
+        raise NotAllowedError("User does not have access to the object")
+    if (not legacy_access_check(self.permissions, path, self.READ, user) and
+            not legacy_access_check(self.permissions, path, self.WRITE,
+                                    user)):
+        raise NotAllowedError("User does not have read access "
+                              "to the object")
+
+
+def legacy_get_object_permissions(self, user, account, container, name):
+    allowed = 'write'
+    permissions_path = legacy_get_permissions_path(self, account, container,
+                                                   name)
+    if user != account:
+        if legacy_access_check(self.permissions, permissions_path,
+                               self.WRITE, user):
+            allowed = 'write'
+        elif legacy_access_check(self.permissions, permissions_path,
+                                 self.READ, user):
+            allowed = 'read'
+        else:
+            raise NotAllowedError("User does not have access to the path")
+    self._lookup_object(account, container, name)
+    return (allowed,
+            permissions_path,
+            self.permissions.access_get(permissions_path))
+
+
+def legacy(b):
+    b._can_read_object = types.MethodType(legacy_can_read_object, b)
+    b.get_object_permissions = types.MethodType(
+        legacy_get_object_permissions, b)
+
+
+def get(b, name):
+    b.pre_exec()
+    b.get_object_meta(READER, OWNER, CONTAINER, name, 'pithos')
+    permissions = b.get_object_permissions(READER, OWNER, CONTAINER, name)
+    b.post_exec()
+    return permissions
+
+
+def run(path, name, patch, gets):
+    b = connect_backend(db_module='pithos.backends.lib.sqlite',
+                        db_connection=os.path.join(path, 'db'),
+                        block_module='pithos.backends.lib.filestore',
+                        block_params={'path': os.path.join(path, 'data')})
+    if patch is not None:
+        patch(b)
+    counter = Counter()
+    for worker in (b.node, b.permissions):
+        counter.wrap(worker)
+    permissions = get(b, name)
+    counter.statements = 0
+    t = time()
+    for i in xrange(gets):
+        get(b, name)
+    t = time() - t
+    b.close()
+    return float(counter.statements) / gets, t / gets * 1000, permissions
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-d', dest='depth', type='int', default=5,
+                      help='number of folders below the shared folder')
+    parser.add_option('-g', dest='groups', type='int', default=10,
+                      help='number of groups of the reader')
+    parser.add_option('-n', dest='gets', type='int', default=1000,
+                      help='number of GETs per run')
+    options, args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    try:
+        b = connect_backend(db_module='pithos.backends.lib.sqlite',
+                            db_connection=os.path.join(path, 'db'),
+                            block_module='pithos.backends.lib.filestore',
+                            block_params={'path': os.path.join(path, 'data')})
+        name = setup(b, options.depth, options.groups)
+        b.close()
+        print '%6s %6s %10s %14s %14s' % ('depth', 'groups', 'path',
+                                          'queries/GET', 'ms/GET')
+        results = []
+        for label, patch in (('legacy', legacy), ('current', None)):
+            statements, latency, permissions = run(path, name, patch,
+                                                   options.gets)
+            results.append(permissions)
+            print '%6d %6d %10s %14.1f %14.3f' % (
+                options.depth, options.groups, label, statements, latency)
+        assert results[0] == results[1]
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark updating the statistics of the ancestors of a node.
+
+A chain of nodes of the given depth is created with the SQLAlchemy backend
+module and the statistics of the ancestors of its deepest node are updated
+repeatedly, as every object write does, with the previous implementation
+(one lookup, select and update per ancestor) and the current one (one
+query for the ancestors and one upsert). By default a temporary SQLite
+database is used; pass a connection string to benchmark another one.
+
+Usage: statistics_update.py [-d 3,10,30] [-n UPDATES] [-c CONNECTION]
+"""
+
+from optparse import OptionParser
+from time import time
+
+import os
+import shutil
+import tempfile
+
+from sqlalchemy.sql import and_, select
+
+from pithos.backends.lib.sqlalchemy.dbwrapper import DBWrapper
+from pithos.backends.lib.sqlalchemy.node import Node, ROOTNODE
+from pithos.backends.modular import _props, _propnames
+
+
+def legacy_update(n, node, population, size, mtime, cluster=0):
+    st = n.statistics
+    while node != ROOTNODE:
+        props = n.node_get_properties(node)
+        if props is None:
+            break
+        node = props[0]
+        where = and_(st.c.node == node, st.c.cluster == cluster)
+        r = n.conn.execute(select([st.c.population, st.c.size], where))
+        row = r.fetchone()
+        r.close()
+        prepopulation, presize = row if row else (0, 0)
+        u = st.update().where(where).values(
+            population=max(population + prepopulation, 0),
+            size=size + presize, mtime=mtime)
+        rp = n.conn.execute(u)
+        rp.close()
+        if rp.rowcount == 0:
+            n.conn.execute(st.insert().values(
+                node=node, population=max(population, 0), size=size,
+                mtime=mtime, cluster=cluster)).close()
+        population = 0
+
+
+def current_update(n, node, population, size, mtime, cluster=0):
+    n.statistics_update_ancestors(node, population, size, mtime, cluster)
+
+
+def run(n, func, node, updates):
+    t = time()
+    for i in xrange(updates):
+        n.wrapper.execute()
+        func(n, node, 1, 1024, time())
+        n.wrapper.commit()
+    return updates / (time() - t)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-d', dest='depths', default='3,10,30',
+                      help='comma separated depths of the node chains')
+    parser.add_option('-n', dest='updates', type='int', default=2000,
+                      help='number of updates per run')
+    parser.add_option('-c', dest='connection', default=None,
+                      help='SQLAlchemy connection string')
+    options, args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    try:
+        db = options.connection or 'sqlite:///%s' % os.path.join(path, 'db')
+        n = Node(wrapper=DBWrapper(db), props=_props(_propnames))
+        print '%8s %16s %16s' % ('depth', 'legacy upd/s', 'current upd/s')
+        for depth in [int(x) for x in options.depths.split(',')]:
+            node = ROOTNODE
+            for i in xrange(depth):
+                node = n.node_create(node, '%s/%d' % (time(), i))
+            results = [run(n, func, node, options.updates)
+                       for func in (legacy_update, current_update)]
+            print '%8d %16.1f %16.1f' % (depth, results[0], results[1])
+        n.wrapper.close()
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
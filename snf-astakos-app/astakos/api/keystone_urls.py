@@ -31,6 +31,8 @@ if settings.ADMIN_API_ENABLED:
 
 urlpatterns += patterns(
     'astakos.api.tokens',
+    url(r'^v2.0/tokens/introspect/?$', 'introspect_token',
+        name='introspect_token'),
     url(r'^v2.0/tokens/(?P<token_id>.+?)/?$', 'validate_token',
         name='validate_token'),
     url(r'^v2.0/tokens/?$', 'authenticate', name='tokens_authenticate'),
@@ -14,6 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from collections import defaultdict
+from datetime import datetime
 
 from django.views.decorators.csrf import csrf_exempt
 
@@ -21,7 +22,8 @@ from snf_django.lib.api import faults, utils, api_method
 from django.core.cache import cache
 
 from astakos.im import settings
-from astakos.im.models import Service, AstakosUser
+from astakos.im.models import Service, AstakosUser, \
+    token_introspection_key
 from astakos.oa2.backends.base import OA2Error
 from astakos.oa2.backends.djangobackend import DjangoBackend
 from .util import json_response, xml_response, validate_user,\
@@ -124,6 +126,52 @@ def authenticate(request):
         return json_response(d)
 
 
+def compute_introspection(token_id):
+    """Return the uuid, expiration and roles of the user of the token.
+
+    A single query fetches both the user and the groups that are the roles.
+    """
+    rows = AstakosUser.objects.filter(auth_token=token_id).values_list(
+        "uuid", "is_active", "has_signed_terms", "auth_token_expires",
+        "groups__id", "groups__name")
+    if not rows:
+        raise faults.Unauthorized('Invalid token')
+
+    uuid, is_active, signed_terms, expires = rows[0][:4]
+    if not is_active:
+        raise faults.Unauthorized('User inactive')
+    if expires < datetime.now():
+        raise faults.Unauthorized('Authentication expired')
+    if not signed_terms:
+        raise faults.Unauthorized('Pending approval terms')
+
+    return {"uuid": uuid,
+            "expires": utils.isoformat(expires),
+            "roles": [dict(id=str(r[4]), name=r[5]) for r in rows
+                      if r[4] is not None]}, expires
+
+
+@api_method(http_method="GET", token_required=True, user_required=False,
+            logger=logger, serializations=["json"])
+def introspect_token(request):
+    """Return only the uuid, expiration and roles of the request token.
+
+    Unlike POST /tokens, no service catalog is returned. Results are cached
+    for up to ASTAKOS_TOKEN_INTROSPECTION_CACHE_TIMEOUT seconds, but not
+    past the token expiration.
+    """
+    key = token_introspection_key(request.x_auth_token)
+    result = cache.get(key)
+    if result is None:
+        result, expires = compute_introspection(request.x_auth_token)
+        delta = expires - datetime.now()
+        timeout = min(settings.TOKEN_INTROSPECTION_CACHE_TIMEOUT,
+                      delta.days * 86400 + delta.seconds)
+        if timeout > 0:
+            cache.set(key, result, timeout)
+    return json_response(result)
+
+
 @api_method(http_method="GET", token_required=False, user_required=False,
             logger=logger)
 def validate_token(request, token_id):
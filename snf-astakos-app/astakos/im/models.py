@@ -15,6 +15,7 @@
 
 import uuid
 import logging
+import hashlib
 import json
 import copy
 
@@ -25,6 +26,7 @@ from random import randint
 import os
 
 from django.db import models
+from django.core.cache import cache
 from astakos.im import transaction
 from django.contrib.auth.models import User, UserManager, Group, Permission
 from django.utils.translation import ugettext as _
@@ -368,6 +370,11 @@ class AstakosUserManager(UserManager):
         return dict(values)
 
 
+def token_introspection_key(token):
+    """Return the cache key of the introspection of an auth token."""
+    return "token_introspection_%s" % hashlib.sha256(token).hexdigest()
+
+
 class AstakosUser(User):
     """
     Extends ``django.contrib.auth.models.User`` by defining additional fields.
@@ -569,6 +576,8 @@ class AstakosUser(User):
         else:
             raise ValueError('Could not generate a token')
 
+        if self.auth_token:
+            cache.delete(token_introspection_key(self.auth_token))
         self.auth_token = new_token
         self.auth_token_created = datetime.now()
         self.auth_token_expires = self.auth_token_created + \
@@ -232,6 +232,9 @@ ENDPOINT_CACHE_TIMEOUT = getattr(settings,
                                  'ASTAKOS_ENDPOINT_CACHE_TIMEOUT',
                                  60)
 
+TOKEN_INTROSPECTION_CACHE_TIMEOUT = getattr(
+    settings, 'ASTAKOS_TOKEN_INTROSPECTION_CACHE_TIMEOUT', 60)
+
 RESOURCE_CACHE_TIMEOUT = getattr(settings,
                                  'ASTAKOS_RESOURCE_CACHE_TIMEOUT',
                                  60)
@@ -657,6 +657,45 @@ class TokensApiTest(TestCase):
         r = client.post(url, post_data, content_type='application/json')
         self.assertEqual(r.status_code, 401)
 
+    def test_introspect_token(self):
+        client = Client()
+        url = reverse('astakos.api.tokens.introspect_token')
+
+        # Check missing and invalid tokens
+        r = client.get(url)
+        self.assertEqual(r.status_code, 401)
+        r = client.get(url, HTTP_X_AUTH_TOKEN='invalid')
+        self.assertEqual(r.status_code, 401)
+        body = json.loads(r.content)
+        self.assertEqual(body['unauthorized']['message'], 'Invalid token')
+
+        r = client.get(url, HTTP_X_AUTH_TOKEN=self.user1.auth_token)
+        self.assertEqual(r.status_code, 200)
+        body = json.loads(r.content)
+        self.assertEqual(sorted(body.keys()), ['expires', 'roles', 'uuid'])
+        self.assertEqual(body['uuid'], self.user1.uuid)
+        self.assertEqual(body['roles'],
+                         [dict(id=str(g.id), name=g.name)
+                          for g in self.user1.groups.all()])
+
+        # Renewing the token drops the cached result
+        old_token = self.user1.auth_token
+        self.user1.renew_token()
+        self.user1.save()
+        r = client.get(url, HTTP_X_AUTH_TOKEN=old_token)
+        self.assertEqual(r.status_code, 401)
+        r = client.get(url, HTTP_X_AUTH_TOKEN=self.user1.auth_token)
+        self.assertEqual(r.status_code, 200)
+
+        # Expired tokens are rejected
+        self.user2.auth_token_expires = datetime.now() - timedelta(seconds=1)
+        self.user2.save()
+        r = client.get(url, HTTP_X_AUTH_TOKEN=self.user2.auth_token)
+        self.assertEqual(r.status_code, 401)
+        body = json.loads(r.content)
+        self.assertEqual(body['unauthorized']['message'],
+                         'Authentication expired')
+
 
 class UserCatalogsTest(TestCase):
     def test_get_uuid_displayname_catalogs(self):
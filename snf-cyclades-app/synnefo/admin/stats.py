@@ -25,7 +25,8 @@ from django.db.models import Count, Sum
 from snf_django.lib.astakos import UserCache
 from synnefo.plankton.backend import PlanktonBackend
 from synnefo.db.models import (VirtualMachine, Network, Backend, VolumeType,
-                               pooled_rapi_client, Flavor)
+                               Flavor)
+from synnefo.logic.backend import get_nodes, map_backends
 
 
 def get_cyclades_stats(backend=None, clusters=True, servers=True,
@@ -44,7 +45,7 @@ def get_cyclades_stats(backend=None, clusters=True, servers=True,
     return stats
 
 
-def _get_cluster_stats(bend):
+def _get_cluster_stats(bend, nodes, error=None):
     """Get information about a Ganeti cluster and all of it's nodes."""
     bend_vms = bend.virtual_machines.filter(deleted=False)
     vm_stats = bend_vms.aggregate(Sum("flavor__cpu"),
@@ -61,10 +62,8 @@ def _get_cluster_stats(bend):
         "virtual_disk": (vm_stats["flavor__disk__sum"] or 0) << 30,
         "nodes": {},
     }
-    nodes = []
-    if not bend.offline:
-        with pooled_rapi_client(bend) as c:
-            nodes = c.GetNodes(bulk=True)
+    if error is not None:
+        cluster_info["error"] = str(error)
     for node in nodes:
         _node_stats = {
             "drained": node["drained"],
@@ -91,7 +90,13 @@ def get_cluster_stats(backend=None):
         backends = Backend.objects.all()
     else:
         backends = [backend]
-    return dict([_get_cluster_stats(bend) for bend in backends])
+    # Query the online backends concurrently, so that a slow or unreachable
+    # backend does not hold back the statistics of the rest
+    nodes, errors = map_backends(get_nodes,
+                                 [b for b in backends if not b.offline])
+    return dict([_get_cluster_stats(bend, nodes.get(bend, []),
+                                    errors.get(bend))
+                 for bend in backends])
 
 
 def _get_total_servers(backend=None):
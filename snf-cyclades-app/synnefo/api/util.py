@@ -266,7 +266,7 @@ def get_floating_ip_by_id(userid, floating_ip_id, for_update=False):
 
 def backend_has_free_public_ip(backend):
     """Check if a backend has a free public IPv4 address."""
-    ip_pool_rows = IPPoolTable.objects.select_for_update()\
+    ip_pool_rows = IPPoolTable.objects\
         .filter(subnet__network__public=True)\
         .filter(subnet__network__drained=False)\
         .filter(subnet__deleted=False)\
@@ -41,6 +41,24 @@ GANETI_USE_OPPORTUNISTIC_LOCKING = True
 # (--no-wait-for-sync option in Ganeti). Useful only for DRBD template.
 GANETI_DISKS_WAIT_FOR_SYNC = False
 
+# Timeout in seconds of the requests to the Ganeti RAPI. None means no
+# timeout.
+GANETI_RAPI_TIMEOUT = 60
+
+# How many times to retry the GET requests to the Ganeti RAPI that fail to
+# connect or time out. Other requests are never retried.
+GANETI_RAPI_RETRIES = 1
+
+# Maximum number of Ganeti backends that are queried concurrently by
+# operations that contact all backends, like the statistics of
+# 'snf-manage stats-cyclades', the status check of snf-dispatcher and
+# 'snf-manage backend-update-status'.
+GANETI_RAPI_FANOUT_WORKERS = 10
+
+# Timeout in seconds of each backend in these operations. A backend that does
+# not reply in time is reported as failed, without holding back the rest.
+GANETI_RAPI_FANOUT_TIMEOUT = 30
+
 # This module implements the strategy for allocating a vm to a backend
 BACKEND_ALLOCATOR_MODULE = "synnefo.logic.allocators.default_allocator"
 # Refresh backend statistics timeout, in minutes, used in backend allocation
@@ -7,6 +7,10 @@
 BACKEND_DB_CONNECTION = 'sqlite:////usr/share/synnefo/pithos/backend.db'
 PITHOS_BACKEND_POOL_SIZE = 8
 
+# Block storage of the Pithos backend. Must match the Pithos settings.
+PITHOS_BACKEND_BLOCK_MODULE = 'pithos.backends.lib.hashfiler'
+PITHOS_BACKEND_BLOCK_PATH = '/tmp/pithos-data/'
+
 # The Pithos container where images will be stored by default
 DEFAULT_PLANKTON_CONTAINER = 'images'
 
@@ -28,5 +32,9 @@ PITHOS_BACKEND_XSEG_POOL_SIZE = 8
 # The maximum interval (in seconds) for consequent backend object map checks
 PITHOS_BACKEND_MAP_CHECK_INTERVAL = 1
 
+# The maximum number of unavailable snapshots whose maps are checked while
+# listing images. The rest are checked in the following listings.
+PITHOS_BACKEND_MAP_CHECK_BATCH_SIZE = 100
+
 #The maximum allowed number of image metadata
 PITHOS_RESOURCE_MAX_METADATA = 32
@@ -17,7 +17,7 @@ import datetime
 
 from copy import deepcopy
 from django.conf import settings
-from django.db import models
+from django.db import models, connection, transaction, DatabaseError
 
 import utils
 from contextlib import contextmanager
@@ -701,10 +701,11 @@ class Subnet(models.Model):
         return msg % (self.id, self.network_id, self.cidr)
 
     def get_ip_pools(self, locked=True):
-        ip_pools = self.ip_pools
+        ip_pools = map(lambda ip_pool: ip_pool.pool, self.ip_pools.all())
         if locked:
-            ip_pools = ip_pools.select_for_update()
-        return map(lambda ip_pool: ip_pool.pool, ip_pools.all())
+            for ip_pool in ip_pools:
+                ip_pool.lock()
+        return ip_pools
 
 
 class BackendNetwork(models.Model):
@@ -945,13 +946,17 @@ class PoolTable(models.Model):
     base = models.CharField(null=True, max_length=32)
     offset = models.IntegerField(null=True)
 
+    # The bitarrays of the pool are stored in the 'chunks' of the pool
+    # instead of the available_map and reserved_map fields.
+    segmented = True
+
     class Meta:
         abstract = True
 
     @classmethod
     def get_pool(cls):
         try:
-            pool_row = cls.objects.select_for_update().get()
+            pool_row = cls.objects.get()
             return pool_row.pool
         except cls.DoesNotExist:
             raise pools.EmptyPool
@@ -960,6 +965,99 @@ class PoolTable(models.Model):
     def pool(self):
         return self.manager(self)
 
+    def has_chunks(self):
+        """Return whether the chunks of the pool have been created.
+
+        If not, the row of the pool is locked, so that the chunks are created
+        by a single transaction.
+
+        """
+        if self.pk is None:
+            return False
+        if self.chunks.exists():
+            return True
+        self.__class__.objects.select_for_update().get(pk=self.pk)
+        return self.chunks.exists()
+
+    def get_chunks(self, indexes=None, exclude=()):
+        """Lock and return the chunks of the pool, ordered by index."""
+        chunks = self.chunks.select_for_update().order_by("index")
+        if indexes is not None:
+            chunks = chunks.filter(index__in=indexes)
+        if exclude:
+            chunks = chunks.exclude(index__in=exclude)
+        return list(chunks)
+
+    def get_free_chunk(self, exclude=()):
+        """Lock and return the first chunk of the pool with free values.
+
+        Where the database supports it, chunks that are locked by other
+        transactions are skipped, so that concurrent allocations use
+        different chunks. Return None if no chunk has free values.
+
+        """
+        chunks = self.chunks.filter(free__gt=0).order_by("index")
+        if exclude:
+            chunks = chunks.exclude(index__in=exclude)
+        if connection.features.has_select_for_update_nowait:
+            for index in list(chunks.values_list("index", flat=True)):
+                sid = transaction.savepoint()
+                try:
+                    chunk = list(chunks.select_for_update(nowait=True)
+                                       .filter(index=index))
+                except DatabaseError:
+                    transaction.savepoint_rollback(sid)
+                    continue
+                transaction.savepoint_commit(sid)
+                if chunk:
+                    return chunk[0]
+        while True:
+            chunk = list(chunks.select_for_update()[:1])
+            if chunk:
+                return chunk[0]
+            if not chunks.exists():
+                return None
+
+    def count_free(self, exclude=()):
+        """Return the number of free values in the chunks of the pool."""
+        chunks = self.chunks.all()
+        if exclude:
+            chunks = chunks.exclude(index__in=exclude)
+        return chunks.aggregate(free=models.Sum("free"))["free"] or 0
+
+    def save_chunk(self, chunk, index, available_map, reserved_map, free):
+        """Create or update a chunk of the pool and return it."""
+        if chunk is None:
+            return self.chunks.create(index=index, available_map=available_map,
+                                      reserved_map=reserved_map, free=free)
+        self.chunks.filter(id=chunk.id).update(available_map=available_map,
+                                               reserved_map=reserved_map,
+                                               free=free)
+        chunk.available_map = available_map
+        chunk.reserved_map = reserved_map
+        chunk.free = free
+        return chunk
+
+    def delete_chunks(self, chunks):
+        self.chunks.filter(id__in=[chunk.id for chunk in chunks]).delete()
+
+
+class PoolChunk(models.Model):
+    index = models.IntegerField(null=False)
+    available_map = models.TextField(default="", null=False)
+    reserved_map = models.TextField(default="", null=False)
+    free = models.IntegerField(null=False)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return self.__unicode__()
+
+    def __unicode__(self):
+        return u"<%s pool:%s index:%s>" % (self.__class__.__name__,
+                                           self.pool_id, self.index)
+
 
 class BridgePoolTable(PoolTable):
     manager = pools.BridgePool
@@ -971,6 +1069,14 @@ class BridgePoolTable(PoolTable):
         return u"<BridgePool id:%s>" % self.id
 
 
+class BridgePoolChunk(PoolChunk):
+    pool = models.ForeignKey(BridgePoolTable, related_name="chunks",
+                             on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ("pool", "index")
+
+
 class MacPrefixPoolTable(PoolTable):
     manager = pools.MacPrefixPool
 
@@ -981,6 +1087,14 @@ class MacPrefixPoolTable(PoolTable):
         return u"<MACPrefixPool id:%s>" % self.id
 
 
+class MacPrefixPoolChunk(PoolChunk):
+    pool = models.ForeignKey(MacPrefixPoolTable, related_name="chunks",
+                             on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ("pool", "index")
+
+
 class IPPoolTable(PoolTable):
     manager = pools.IPPool
 
@@ -995,6 +1109,14 @@ class IPPoolTable(PoolTable):
         return u"<IPv4AdressPool, Subnet: %s>" % self.subnet_id
 
 
+class IPPoolChunk(PoolChunk):
+    pool = models.ForeignKey(IPPoolTable, related_name="chunks",
+                             on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ("pool", "index")
+
+
 @contextmanager
 def pooled_rapi_client(obj):
         if isinstance(obj, (VirtualMachine, BackendNetwork)):
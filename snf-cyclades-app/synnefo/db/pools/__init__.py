@@ -20,6 +20,10 @@ import ipaddr
 AVAILABLE = True
 UNAVAILABLE = False
 
+# Number of values stored in each chunk of a segmented pool. It must be a
+# multiple of 8, since the maps of the chunks are stored as bytes.
+CHUNK_SIZE = 1024
+
 
 class PoolManager(object):
     """PoolManager for DB PoolTable models.
@@ -32,6 +36,14 @@ class PoolManager(object):
     two string attributes (available_map and reserved_map) and the size of the
     pool.
 
+    If the object has a true 'segmented' attribute, the bitarrays are not
+    stored in the object, but split in chunks of CHUNK_SIZE values. Each chunk
+    is stored in a separate row, along with the number of its free values, and
+    is loaded, locked and saved through the methods of the object (see
+    synnefo.db.models.PoolTable). Getting, reserving or releasing a value only
+    locks and rewrites the chunk of the value, while the whole pool is loaded
+    only when the 'available', 'reserved' or 'pool' bitarrays are accessed.
+
     Subclasses of PoolManager must implement value_to_index and index_to_value
     method's in order to denote how the value will be mapped to the index in
     the bitarray.
@@ -43,40 +55,155 @@ class PoolManager(object):
     def __init__(self, pool_table):
         self.pool_table = pool_table
         self.pool_size = pool_table.size
-        if pool_table.available_map:
-            self.available = _bitarray_from_string(pool_table.available_map)
-            self.reserved = _bitarray_from_string(pool_table.reserved_map)
+        self.segmented = getattr(pool_table, "segmented", False)
+        self.chunks = {}
+        self.deleted_chunks = []
+        self.resized = False
+        if self.segmented:
+            self.created = not pool_table.has_chunks()
+            self.loaded = self.created
         else:
-            self.available = self._create_empty_pool(self.pool_size)
-            self.reserved = self._create_empty_pool(self.pool_size)
-            self.add_padding(self.pool_size)
+            self.created = not pool_table.available_map
+            self.loaded = True
+            if not self.created:
+                self.chunks[0] = PoolChunk(
+                    0, _bitarray_from_string(pool_table.available_map),
+                    _bitarray_from_string(pool_table.reserved_map))
+        if self.created:
+            available = self._create_empty_pool(self.pool_size)
+            reserved = self._create_empty_pool(self.pool_size)
+            padding = self._find_padding(self.pool_size)
+            available.extend([UNAVAILABLE] * padding)
+            reserved.extend([UNAVAILABLE] * padding)
+            self._set_maps(available, reserved)
 
     def _create_empty_pool(self, size):
         ba = bitarray(size)
         ba.setall(AVAILABLE)
         return ba
 
-    def add_padding(self, pool_size):
-        bits = find_padding(pool_size)
-        self.available.extend([UNAVAILABLE] * bits)
-        self.reserved.extend([UNAVAILABLE] * bits)
+    def _find_padding(self, pool_size):
+        if self.segmented:
+            return -pool_size % CHUNK_SIZE
+        return find_padding(pool_size)
+
+    def _chunk_size(self):
+        if self.segmented:
+            return CHUNK_SIZE
+        return self.pool_size + find_padding(self.pool_size)
+
+    def _load_chunk(self, row):
+        chunk = PoolChunk(row.index, _bitarray_from_string(row.available_map),
+                          _bitarray_from_string(row.reserved_map), row)
+        self.chunks[row.index] = chunk
+        return chunk
+
+    def _get_chunk(self, index):
+        """Return the chunk of an index and the offset of the index in it."""
+        size = self._chunk_size()
+        number = index // size
+        chunk = self.chunks.get(number)
+        if chunk is None:
+            rows = self.pool_table.get_chunks(indexes=[number])
+            if not rows:
+                raise InvalidValue("Index %s does not belong to pool." % index)
+            chunk = self._load_chunk(rows[0])
+        return chunk, index - number * size
+
+    def lock(self):
+        """Load and lock all the chunks of the pool."""
+        if not self.loaded:
+            exclude = self.chunks.keys()
+            for row in self.pool_table.get_chunks(exclude=exclude):
+                self._load_chunk(row)
+            self.loaded = True
+
+    def _get_maps(self):
+        self.lock()
+        available = bitarray()
+        reserved = bitarray()
+        for number in sorted(self.chunks):
+            available.extend(self.chunks[number].available)
+            reserved.extend(self.chunks[number].reserved)
+        return available, reserved
+
+    def _set_maps(self, available, reserved):
+        """Split the bitarrays of the pool in chunks.
+
+        The length of the bitarrays must be a multiple of the size of the
+        chunks. Only the chunks that change are marked for saving.
 
-    def cut_padding(self, pool_size):
-        bits = find_padding(pool_size)
-        self.available = self.available[:-bits]
-        self.reserved = self.reserved[:-bits]
+        """
+        self.lock()
+        size = self._chunk_size()
+        count = len(available) // size if size else 0
+        for number in xrange(count):
+            chunk_available = available[number * size:(number + 1) * size]
+            chunk_reserved = reserved[number * size:(number + 1) * size]
+            chunk = self.chunks.get(number)
+            if chunk is None:
+                self.chunks[number] = PoolChunk(number, chunk_available,
+                                                chunk_reserved)
+            elif (chunk.available != chunk_available or
+                  chunk.reserved != chunk_reserved):
+                chunk.update(chunk_available, chunk_reserved)
+        for number in self.chunks.keys():
+            if number >= count:
+                chunk = self.chunks.pop(number)
+                if chunk.row is not None:
+                    self.deleted_chunks.append(chunk.row)
+
+    def _get_available(self):
+        return self._get_maps()[0]
+
+    def _set_available(self, available):
+        self._set_maps(available, self.reserved)
+
+    available = property(_get_available, _set_available)
+
+    def _get_reserved(self):
+        return self._get_maps()[1]
+
+    def _set_reserved(self, reserved):
+        self._set_maps(self.available, reserved)
+
+    reserved = property(_get_reserved, _set_reserved)
 
     @property
     def pool(self):
-        return (self.available & self.reserved)
+        self.lock()
+        pool = bitarray()
+        for number in sorted(self.chunks):
+            pool.extend(self.chunks[number].pool)
+        return pool
+
+    def _find_available(self):
+        """Return the first available index, or None if the pool is empty.
+
+        Chunks that are already loaded are searched first, so that a
+        transaction keeps allocating from the chunks it has locked.
+
+        """
+        size = self._chunk_size()
+        while True:
+            for number in sorted(self.chunks):
+                chunk = self.chunks[number]
+                if chunk.free:
+                    return number * size + chunk.first_free()
+            if self.loaded:
+                return None
+            row = self.pool_table.get_free_chunk(exclude=self.chunks.keys())
+            if row is None:
+                return None
+            self._load_chunk(row)
 
     def get(self, value=None):
         """Get a value from the pool."""
         if value is None:
-            if self.empty():
-                raise EmptyPool
             # Get the first available index
-            index = int(self.pool.index(AVAILABLE))
+            index = self._find_available()
+            if index is None:
+                raise EmptyPool
             assert(index < self.pool_size)
             self._reserve(index)
             return self.index_to_value(index)
@@ -107,31 +234,51 @@ class PoolManager(object):
         return True
 
     def save(self, db=True):
-        """Save changes to the DB."""
-        self.pool_table.available_map = _bitarray_to_string(self.available)
-        self.pool_table.reserved_map = _bitarray_to_string(self.reserved)
-        if db:
+        """Save changes to the DB.
+
+        For segmented pools, only the chunks that have changed are written,
+        and the row of the pool only if it has been resized.
+
+        """
+        if not self.segmented:
+            chunk = self.chunks[0]
+            self.pool_table.available_map = \
+                _bitarray_to_string(chunk.available)
+            self.pool_table.reserved_map = _bitarray_to_string(chunk.reserved)
+            if db:
+                self.pool_table.save()
+            return
+        if not db:
+            return
+        if self.resized:
             self.pool_table.save()
+            self.resized = False
+        if self.deleted_chunks:
+            self.pool_table.delete_chunks(self.deleted_chunks)
+            self.deleted_chunks = []
+        for number in sorted(self.chunks):
+            chunk = self.chunks[number]
+            if chunk.dirty:
+                chunk.row = self.pool_table.save_chunk(
+                    chunk.row, number, _bitarray_to_string(chunk.available),
+                    _bitarray_to_string(chunk.reserved), chunk.free)
+                chunk.dirty = False
 
     def empty(self):
         """Return True when pool is empty."""
-        return not self.pool.any()
+        return self.count_available() == 0
 
     def size(self):
         """Return the size of the bitarray(original size + padding)."""
         return self.pool.length()
 
     def _reserve(self, index, external=False):
-        if external:
-            self.reserved[index] = UNAVAILABLE
-        else:
-            self.available[index] = UNAVAILABLE
+        chunk, offset = self._get_chunk(index)
+        chunk.set(offset, UNAVAILABLE, external)
 
     def _release(self, index, external=False):
-        if external:
-            self.reserved[index] = AVAILABLE
-        else:
-            self.available[index] = AVAILABLE
+        chunk, offset = self._get_chunk(index)
+        chunk.set(offset, AVAILABLE, external)
 
     def contains(self, value, index=False):
         if index is False:
@@ -139,16 +286,21 @@ class PoolManager(object):
         return index >= 0 and index < self.pool_size
 
     def count_available(self):
-        return self.pool.count(AVAILABLE)
+        count = sum(chunk.free for chunk in self.chunks.itervalues())
+        if not self.loaded:
+            count += self.pool_table.count_free(exclude=self.chunks.keys())
+        return count
 
     def count_unavailable(self):
         return self.pool_size - self.count_available()
 
     def count_reserved(self):
-        return self.reserved[:self.pool_size].count(UNAVAILABLE)
+        return self.pool_size - self.count_unreserved()
 
     def count_unreserved(self):
-        return self.pool_size - self.count_reserved()
+        # The padding values are always reserved
+        self.lock()
+        return sum(chunk.unreserved for chunk in self.chunks.itervalues())
 
     def is_available(self, value, index=False):
         if not self.contains(value, index=index):
@@ -157,7 +309,8 @@ class PoolManager(object):
             idx = self.value_to_index(value)
         else:
             idx = value
-        return self.pool[idx] == AVAILABLE
+        chunk, offset = self._get_chunk(idx)
+        return chunk.pool[offset] == AVAILABLE
 
     def is_reserved(self, value, index=False):
         if not self.contains(value, index=index):
@@ -166,7 +319,8 @@ class PoolManager(object):
             idx = self.value_to_index(value)
         else:
             idx = value
-        return self.reserved[idx] == UNAVAILABLE
+        chunk, offset = self._get_chunk(idx)
+        return chunk.reserved[offset] == UNAVAILABLE
 
     def to_01(self):
         return self.pool[:self.pool_size].to01()
@@ -189,19 +343,25 @@ class PoolManager(object):
     def resize(self, bits_num):
         if bits_num == 0:
             return
+        available, reserved = self._get_maps()
         # Cut old padding
-        self.cut_padding(self.pool_size)
+        available = available[:self.pool_size]
+        reserved = reserved[:self.pool_size]
         # Do the resize
         if bits_num > 0:
-            self.available.extend([AVAILABLE] * bits_num)
-            self.reserved.extend([AVAILABLE] * bits_num)
+            available.extend([AVAILABLE] * bits_num)
+            reserved.extend([AVAILABLE] * bits_num)
         else:
-            self.available = self.available[:bits_num]
-            self.reserved = self.reserved[:bits_num]
+            available = available[:bits_num]
+            reserved = reserved[:bits_num]
         # Add new padding
         self.pool_size = self.pool_size + bits_num
-        self.add_padding(self.pool_size)
+        padding = self._find_padding(self.pool_size)
+        available.extend([UNAVAILABLE] * padding)
+        reserved.extend([UNAVAILABLE] * padding)
+        self._set_maps(available, reserved)
         self.pool_table.size = self.pool_size
+        self.resized = True
 
     def index_to_value(self, index):
         raise NotImplementedError
@@ -213,6 +373,61 @@ class PoolManager(object):
         return repr(self.pool_table)
 
 
+class PoolChunk(object):
+    """A chunk of the bitarrays of a pool, loaded in memory.
+
+    Along with the available and reserved bitarrays, the chunk keeps their
+    intersection (the free values), the number of free and unreserved values
+    and a cursor below which no value is free. They are updated on every
+    change of a value, so that getting the first free value or counting them
+    does not scan the chunk.
+
+    """
+    def __init__(self, index, available, reserved, row=None):
+        self.index = index
+        self.row = row
+        self.update(available, reserved)
+        self.dirty = row is None
+
+    def update(self, available, reserved):
+        self.available = available
+        self.reserved = reserved
+        self.pool = available & reserved
+        self.free = self.pool.count(AVAILABLE)
+        self.unreserved = reserved.count(AVAILABLE)
+        self.cursor = 0
+        self.dirty = True
+
+    def first_free(self):
+        """Return the offset of the first free value, or None."""
+        if not self.free:
+            return None
+        self.cursor = int(self.pool.index(AVAILABLE, self.cursor))
+        return self.cursor
+
+    def set(self, offset, value, external=False):
+        """Set the available or the reserved bit of an offset."""
+        if external:
+            if self.reserved[offset] == value:
+                return
+            self.reserved[offset] = value
+            self.unreserved += 1 if value == AVAILABLE else -1
+            free = value and self.available[offset]
+        else:
+            if self.available[offset] == value:
+                return
+            self.available[offset] = value
+            free = value and self.reserved[offset]
+        if self.pool[offset] != free:
+            self.pool[offset] = free
+            if free == AVAILABLE:
+                self.free += 1
+                self.cursor = min(self.cursor, offset)
+            else:
+                self.free -= 1
+        self.dirty = True
+
+
 class EmptyPool(Exception):
     pass
 
@@ -263,9 +478,8 @@ class BridgePool(PoolManager):
 
 class MacPrefixPool(PoolManager):
     def __init__(self, pool_table):
-        do_init = False if pool_table.available_map else True
         super(MacPrefixPool, self).__init__(pool_table)
-        if do_init:
+        if self.created:
             for i in xrange(1, self.pool_size):
                 if not self.validate_mac(self.index_to_value(i)):
                     self._reserve(i, external=True)
@@ -296,12 +510,8 @@ class IPPool(PoolManager):
         self.net = ipaddr.IPNetwork(subnet.cidr)
         self.offset = pool_table.offset
         self.base = pool_table.base
-        if pool_table.available_map:
-            initialized_pool = True
-        else:
-            initialized_pool = False
         super(IPPool, self).__init__(pool_table)
-        if not initialized_pool:
+        if self.created:
             self.check_pool_integrity()
 
     def check_pool_integrity(self):
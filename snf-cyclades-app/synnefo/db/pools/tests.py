@@ -138,6 +138,28 @@ class PoolManagerTestCase(TestCase):
         self.assertEqual(pool.count_reserved(), 1)
         self.assertEqual(pool.count_unreserved(), 9)
 
+    def test_running_counts(self):
+        obj = DummyObject(100)
+        pool = DummyPool(obj)
+        values = [pool.get() for i in range(50)]
+        pool.reserve(70, external=True)
+        pool.reserve(70)
+        pool.put(10)
+        pool.put(10)
+        pool.reserve(20, external=True)
+        pool.put(20)
+        self.assertEqual(pool.count_available(), pool.pool.count(True))
+        self.assertEqual(pool.count_available(), 50)
+        self.assertEqual(pool.count_reserved(), 2)
+        # The first free value is returned after releasing a lower one
+        self.assertEqual(pool.get(), 10)
+        self.assertEqual(pool.get(), 50)
+        pool.save()
+        pool = DummyPool(obj)
+        self.assertEqual(pool.count_available(), 48)
+        self.assertEqual(pool.count_reserved(), 2)
+        self.assertEqual(pool.get(), 51)
+
 
 class HelpersTestCase(TestCase):
     def test_find_padding(self):
@@ -26,7 +26,7 @@ from synnefo.db.pools.tests import *
 from synnefo.db.models import *
 
 from synnefo.db import models_factory as mfact
-from synnefo.db.pools import IPPool, EmptyPool
+from synnefo.db.pools import IPPool, EmptyPool, CHUNK_SIZE
 from synnefo.db import transaction as cyclades_transaction
 
 from django.db import IntegrityError
@@ -198,6 +198,28 @@ class NetworkTest(TestCase):
         pool = net1.get_ip_pools()[0]
         self.assertTrue(pool.is_available('192.168.2.12'))
 
+    def test_pool_chunks(self):
+        subnet = mfact.IPv4SubnetFactory(cidr='10.0.0.0/21')
+        pool_row = mfact.IPPoolTableFactory(subnet=subnet, base=subnet.cidr,
+                                            offset=0, size=2 * CHUNK_SIZE)
+        pool = pool_row.pool
+        pool.save()
+        # network and gateway address in the first chunk, broadcast address
+        # in the second one
+        self.assertEqual(list(pool_row.chunks.order_by('index')
+                                      .values_list('index', 'free')),
+                         [(0, CHUNK_SIZE - 2), (1, CHUNK_SIZE - 1)])
+        pool = pool_row.pool
+        pool.reserve(pool.index_to_value(CHUNK_SIZE))
+        pool.save()
+        self.assertEqual(pool_row.chunks.get(index=1).free, CHUNK_SIZE - 2)
+        pool = pool_row.pool
+        self.assertEqual(pool.count_available(), 2 * CHUNK_SIZE - 4)
+        self.assertEqual(pool.get(), '10.0.0.2')
+        self.assertFalse(pool.is_available(pool.index_to_value(CHUNK_SIZE)))
+        pool.save()
+        self.assertEqual(pool_row.chunks.get(index=0).free, CHUNK_SIZE - 3)
+
 
 class BackendNetworkTest(TestCase):
     def test_mac_prefix(self):
@@ -13,10 +13,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 from django.conf import settings
+from django.db import close_connection
 from synnefo.db import transaction
 from django.utils import simplejson as json
 from datetime import datetime, timedelta
 
+import time
+import Queue
+import threading
+
 from synnefo.db.models import (VirtualMachine, Network, Volume,
                                BackendNetwork, BACKEND_STATUSES,
                                pooled_rapi_client, VirtualMachineDiagnostic,
@@ -1283,6 +1288,96 @@ def snapshot_instance(vm, volume, snapshot_name, snapshot_id):
                                        reason=reason)
 
 
+class BackendTimeout(Exception):
+    pass
+
+
+def map_backends(func, backends, timeout=None, workers=None):
+    """Call a function for each of the given backends concurrently.
+
+    At most 'workers' backends are contacted at the same time, each one from
+    its own thread. A backend that does not reply within 'timeout' seconds
+    from the time the call started is reported as failed with a
+    'BackendTimeout' error, so that a slow Ganeti master does not hold back
+    the rest of the backends. Its call is abandoned, but keeps its worker
+    until it returns, so that no more than 'workers' calls are ever in
+    flight. If all the workers are held by abandoned calls for 'timeout'
+    seconds, the backends that have not been contacted yet are reported as
+    failed too.
+
+    Return a tuple of two dictionaries, mapping the backends to the value
+    returned by 'func' and to the exception raised by 'func' respectively.
+
+    """
+    if timeout is None:
+        timeout = settings.GANETI_RAPI_FANOUT_TIMEOUT
+    if workers is None:
+        workers = settings.GANETI_RAPI_FANOUT_WORKERS
+
+    pending = list(backends)
+    running = {}
+    abandoned = set()
+    results, errors = {}, {}
+    done = Queue.Queue()
+
+    def call(backend):
+        try:
+            done.put((backend, func(backend), None))
+        except Exception as e:
+            done.put((backend, None, e))
+        finally:
+            close_connection()
+
+    while pending or running:
+        while pending and len(running) + len(abandoned) < workers:
+            backend = pending.pop(0)
+            thread = threading.Thread(target=call, args=(backend,))
+            thread.daemon = True
+            thread.start()
+            running[backend] = time.time() + timeout if timeout else None
+
+        if running:
+            deadlines = filter(lambda d: d is not None, running.values())
+            wait = max(min(deadlines) - time.time(), 0) if deadlines else None
+        else:
+            # All the workers are held by abandoned calls
+            wait = timeout
+        try:
+            backend, result, error = done.get(True, wait)
+        except Queue.Empty:
+            if not running:
+                for backend in pending:
+                    log.error("No worker became free for backend %s within"
+                              " %s seconds", backend, timeout)
+                    errors[backend] = BackendTimeout(
+                        "No worker became free for backend %s within %s"
+                        " seconds" % (backend, timeout))
+                pending = []
+                continue
+            now = time.time()
+            for backend, deadline in running.items():
+                if deadline is not None and deadline <= now:
+                    log.error("Backend %s did not reply within %s seconds",
+                              backend, timeout)
+                    del running[backend]
+                    abandoned.add(backend)
+                    errors[backend] = BackendTimeout(
+                        "Backend %s did not reply within %s seconds"
+                        % (backend, timeout))
+            continue
+
+        if backend in abandoned:
+            # Late reply of a backend that has already timed out
+            abandoned.remove(backend)
+            continue
+        del running[backend]
+        if error is None:
+            results[backend] = result
+        else:
+            errors[backend] = error
+    return results, errors
+
+
 def get_instances(backend, bulk=True):
     with pooled_rapi_client(backend) as c:
         return c.GetInstances(bulk=bulk)
@@ -1371,8 +1466,9 @@ def get_available_disk_templates(backend):
         return ipolicy_disk_templates
 
 
-def update_backend_disk_templates(backend):
-    disk_templates = get_available_disk_templates(backend)
+def update_backend_disk_templates(backend, disk_templates=None):
+    if disk_templates is None:
+        disk_templates = get_available_disk_templates(backend)
     backend.disk_templates = disk_templates
     backend.save()
 
@@ -51,7 +51,9 @@ import setproctitle
 
 from synnefo.lib.amqp import AMQPClient
 from synnefo.logic import callbacks
+from synnefo.logic import backend as backend_mod
 from synnefo.logic import queues
+from synnefo.logic.worker_pool import WorkerPool
 from synnefo.db.models import Backend, pooled_rapi_client
 
 import logging
@@ -69,6 +71,13 @@ LOGGERS = [log, log_amqp, log_logic]
 DISPATCHER_RECONNECT_TIMEOUT = 600
 
 
+# Seconds for which snf-dispatcher will wait on a queue when running with
+# workers, before sending the acknowledgments of the processed messages.
+WORKER_POLL_TIMEOUT = 0.1
+# Seconds for which snf-dispatcher will wait for the workers to finish the
+# messages they are processing before exiting.
+WORKER_STOP_TIMEOUT = 10
+
 # Time out after S Seconds while waiting messages from Ganeti clusters to
 # arrive. Warning: During this period snf-dispatcher will not consume any other
 # messages.
@@ -90,13 +99,17 @@ def get_hostname():
 class Dispatcher:
     debug = False
 
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, workers=0):
         self.debug = debug
+        self.workers = workers
+        self.pool = None
         self._init()
 
     def wait(self):
         log.info("Waiting for messages..")
         timeout = DISPATCHER_RECONNECT_TIMEOUT
+        poll = timeout if self.pool is None else WORKER_POLL_TIMEOUT
+        idle = 0
         while True:
             try:
                 # Close the Django DB connection before processing
@@ -105,8 +118,15 @@ class Dispatcher:
                 # the dispatcher to recover from broken connections
                 # gracefully.
                 close_connection()
-                msg = self.client.basic_wait(timeout=timeout)
-                if not msg:
+                if self.pool is not None:
+                    self.pool.flush()
+                msg = self.client.basic_wait(timeout=poll)
+                if msg:
+                    idle = 0
+                    continue
+                idle += poll
+                if idle >= timeout:
+                    idle = 0
                     log.warning("Idle connection for %d seconds. Will connect"
                                 " to a different host. Verify that"
                                 " snf-ganeti-eventd is running!!", timeout)
@@ -121,6 +141,9 @@ class Dispatcher:
             except Exception as e:
                 log.exception("Caught unexpected exception: %s", e)
 
+        if self.pool is not None:
+            log.info("Waiting for the workers to finish")
+            self.pool.close(timeout=WORKER_STOP_TIMEOUT)
         log.info("Clean up AMQP connection before exit")
         self.client.basic_cancel(timeout=1)
         self.client.close(timeout=1)
@@ -133,6 +156,10 @@ class Dispatcher:
         # Connect to AMQP host
         self.client.connect()
 
+        if self.workers:
+            log.info("Processing messages with %d workers", self.workers)
+            self.pool = WorkerPool(self.client, self.workers)
+
         # Declare queues and exchanges
         exchange = settings.EXCHANGE_GANETI
         exchange_dl = queues.convert_exchange_to_dead(exchange)
@@ -162,9 +189,12 @@ class Dispatcher:
             self.client.queue_bind(queue=queue, exchange=exchange,
                                    routing_key=routing_key)
 
+            if self.pool is not None:
+                callback = self.pool.wrap(callback)
+            # Keep enough unacknowledged messages to feed all the workers
             self.client.basic_consume(queue=binding[0],
                                       callback=callback,
-                                      prefetch_count=5)
+                                      prefetch_count=max(5, 2 * self.workers))
 
             queue_dl = queues.convert_queue_to_dead(queue)
             exchange_dl = queues.convert_exchange_to_dead(exchange)
@@ -224,22 +254,26 @@ def handle_request(client, msg):
                       routing_key=routing_key)
     log.debug("Binding %s(%s) to queue %s", exchange, routing_key, queue)
 
-    backends = Backend.objects.filter(offline=False)
+    backends = list(Backend.objects.filter(offline=False))
     status = {}
 
     _OK = "ok"
     _FAIL = "fail"
     # Add cluster tag to trigger snf-ganeti-eventd
     tag = "snf:eventd:heartbeat:%s:%s" % (hostname, pid)
+
+    def add_tag(backend):
+        with pooled_rapi_client(backend) as rapi:
+            rapi.AddClusterTags(tags=[tag], dry_run=True)
+
+    for backend in backends:
+        status[backend.clustername] = {"RAPI": _FAIL, "eventd": _FAIL}
+    results, errors = backend_mod.map_backends(add_tag, backends)
     for backend in backends:
         cluster = backend.clustername
-        status[cluster] = {"RAPI": _FAIL, "eventd": _FAIL}
-        try:
-            with pooled_rapi_client(backend) as rapi:
-                rapi.AddClusterTags(tags=[tag], dry_run=True)
-        except:
-            log.exception("Failed to send job to Ganeti cluster '%s' during"
-                          " status check" % cluster)
+        if backend in errors:
+            log.error("Failed to send job to Ganeti cluster '%s' during"
+                      " status check: %s", cluster, errors[backend])
             continue
         status[cluster]["RAPI"] = _OK
 
@@ -288,6 +322,13 @@ def parse_arguments(args):
                             " first (DANGEROUS!)"))
     parser.add_option("--drain-queue", dest="drain_queue",
                       help="Drain a queue from all outstanding messages")
+    parser.add_option("-w", "--workers", dest="workers", type="int",
+                      default=settings.DISPATCHER_WORKERS,
+                      help=("Number of workers that process messages"
+                            " concurrently, keeping the order of the messages"
+                            " of each server and network. 0 processes one"
+                            " message at a time (default: %s)"
+                            % settings.DISPATCHER_WORKERS))
     parser.add_option("--status-check", dest="status_check",
                       default=False, action="store_true",
                       help="Trigger a status check for a running"
@@ -450,13 +491,13 @@ def get_user_confirmation():
     return True
 
 
-def debug_mode():
-    disp = Dispatcher(debug=True)
+def debug_mode(opts):
+    disp = Dispatcher(debug=True, workers=opts.workers)
     disp.wait()
 
 
 def daemon_mode(opts):
-    disp = Dispatcher(debug=False)
+    disp = Dispatcher(debug=False, workers=opts.workers)
     disp.wait()
 
 
@@ -508,7 +549,7 @@ def main():
 
     # Debug mode, process messages without daemonizing
     if opts.debug:
-        debug_mode()
+        debug_mode(opts)
         return
 
     # Create pidfile,
@@ -125,7 +125,7 @@ def allocate_ip(network, userid, address=None, floating_ip=False):
         raise faults.Conflict("Can not allocate IP while network '%s' is in"
                               " 'SNF:DRAINED' status" % network.id)
 
-    ip_pools = IPPoolTable.objects.select_for_update()\
+    ip_pools = IPPoolTable.objects\
         .filter(subnet__network=network).order_by('id')
     try:
         return allocate_ip_from_pools(ip_pools, userid, address=address,
@@ -150,7 +150,7 @@ def allocate_public_ip(userid, floating_ip=False, backend=None, networks=None):
     be used.
 
     """
-    ip_pool_rows = IPPoolTable.objects.select_for_update()\
+    ip_pool_rows = IPPoolTable.objects\
         .prefetch_related("subnet__network")\
         .filter(subnet__deleted=False)\
         .filter(subnet__network__deleted=False)\
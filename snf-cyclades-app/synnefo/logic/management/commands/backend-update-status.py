@@ -30,8 +30,22 @@ class Command(SynnefoCommand):
     help = HELP_MSG
 
     def handle(self, **options):
-        for backend in Backend.objects.select_for_update()\
-                                      .filter(offline=False):
-            backend_mod.update_backend_disk_templates(backend)
-            backend_mod.update_backend_resources(backend)
+        backends = list(Backend.objects.select_for_update()
+                                       .filter(offline=False))
+        # Query all backends concurrently and update the DB afterwards
+        results, errors = backend_mod.map_backends(get_backend_status,
+                                                   backends)
+        for backend in backends:
+            if backend in errors:
+                self.stderr.write("Failed to update backend '%s': %s\n"
+                                  % (backend, errors[backend]))
+                continue
+            disk_templates, resources = results[backend]
+            backend_mod.update_backend_disk_templates(backend, disk_templates)
+            backend_mod.update_backend_resources(backend, resources)
             self.stdout.write("Successfully updated backend '%s'\n" % backend)
+
+
+def get_backend_status(backend):
+    return (backend_mod.get_available_disk_templates(backend),
+            backend_mod.get_physical_resources(backend))
@@ -68,7 +68,7 @@ class Command(SynnefoCommand):
             released = remove_reserved.split(',')
             for value in released:
                 pool.put(value, external=True)
-        pool.save(db=False)
+        pool.save()
 
         if offset:
             pool_row.offset = offset
@@ -174,6 +174,8 @@ def pprint_clusters(clusters, stdout, detail=True):
             state = "offline"
         if c_info["drained"]:
             state += " (drained)"
+        if "error" in c_info:
+            state += " (unreachable: %s)" % c_info["error"]
         virtual_cpu = c_info["virtual_cpu"]
         virtual_ram = c_info["virtual_ram"]
         virtual_disk = c_info["virtual_disk"]
@@ -204,7 +206,8 @@ def pprint_clusters(clusters, stdout, detail=True):
             ("Instances", c_info["virtual_servers"]),
             ("Virtual CPUs", virtual_cpu),
             ("Physical CPUs", c_cpu),
-            ("V/P CPUs", ("%.2f%%" % (100 * virtual_cpu / c_cpu))),
+            ("V/P CPUs", ("%.2f%%" % (100 * virtual_cpu / c_cpu)
+                          if c_cpu != 0 else "-")),
             ("Virtual RAM", units.show(virtual_ram, "bytes")),
             ("Physical RAM (used/total)",
                 "%s/%s %s%%" % (units.show(c_mused, "bytes"),
@@ -240,7 +243,8 @@ def pprint_clusters(clusters, stdout, detail=True):
         ("Instances", t_vms),
         ("Virtual CPUs", t_vcpu),
         ("Physical CPUs", t_cpu),
-        ("V/P CPUs", ("%.2f%%" % (100 * t_vcpu / t_cpu))),
+        ("V/P CPUs", ("%.2f%%" % (100 * t_vcpu / t_cpu)
+                      if t_cpu != 0 else "-")),
         ("Virtual RAM", units.show(t_vram, "bytes")),
         ("Physical RAM (used/total)", "%s/%s %s%%" %
             (units.show(t_mused, "bytes"), units.show(t_mtotal, "bytes"),
@@ -30,6 +30,12 @@ import logging
 import simplejson
 import time
 
+try:
+  from requests.adapters import HTTPAdapter
+except ImportError:
+  # Sessions of requests < 1.0 keep their connections alive without adapters
+  HTTPAdapter = None
+
 GANETI_RAPI_PORT = 5080
 GANETI_RAPI_VERSION = 2
 
@@ -167,7 +173,8 @@ class GanetiRapiClient(object): # pylint: disable=R0904
   _json_encoder = simplejson.JSONEncoder(sort_keys=True)
 
   def __init__(self, host, port=GANETI_RAPI_PORT,
-               username=None, password=None, logger=logging):
+               username=None, password=None, logger=logging,
+               session=None, timeout=None, retries=0, stats=None):
     """Initializes this class.
 
     @type host: string
@@ -179,11 +186,33 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     @type password: string
     @param password: the password to connect with
     @param logger: Logging object
+    @type session: requests.Session
+    @param session: the session used to send the requests, which keeps the
+        connections to the master alive (a new one with a single connection
+        by default)
+    @type timeout: float
+    @param timeout: timeout of the requests in seconds (none by default)
+    @type retries: int
+    @param retries: how many times to retry GET requests that fail to
+        connect or time out
+    @param stats: object whose C{record(method, elapsed, error)} method is
+        called after every request
 
     """
     self._logger = logger
     self._base_url = "https://%s:%s" % (host, port)
 
+    if session is None:
+      session = requests.session()
+      if HTTPAdapter is not None:
+        # A client sends one request at a time
+        session.mount("https://", HTTPAdapter(pool_connections=1,
+                                              pool_maxsize=1))
+    self._session = session
+    self._timeout = timeout
+    self._retries = retries
+    self._stats = stats
+
     if username is not None:
       if password is None:
         raise Error("Password not specified")
@@ -231,12 +260,25 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     self._logger.debug("Sending request %s %s (query=%r) (content=%r)",
                        method, url, query, encoded_content)
 
-    req_method = getattr(requests, method.lower())
-    r = req_method(url, auth=self._auth, headers=headers, params=query,
-                   data=encoded_content, verify=False)
-
+    # Only GET requests are retried, since the others may have been
+    # received by the master before failing
+    attempts = 1 + (self._retries if method == HTTP_GET else 0)
+    start = time.time()
+    for attempt in range(attempts):
+      try:
+        r = self._session.request(method, url, auth=self._auth,
+                                  headers=headers, params=query,
+                                  data=encoded_content, verify=False,
+                                  timeout=self._timeout)
+        break
+      except (requests.ConnectionError, requests.Timeout), err:
+        if attempt == attempts - 1:
+          self._RecordRequest(method, start, True)
+          raise
+        self._logger.warning("Retrying request %s %s: %s", method, url, err)
 
     http_code = r.status_code
+    self._RecordRequest(method, start, http_code != HTTP_OK)
     if r.content is not None:
         response_content = simplejson.loads(r.content)
     else:
@@ -255,6 +297,13 @@ class GanetiRapiClient(object): # pylint: disable=R0904
 
     return response_content
 
+  def _RecordRequest(self, method, start, error):
+    """Records the latency of a request to the stats of the client.
+
+    """
+    if self._stats is not None:
+      self._stats.record(method, time.time() - start, error)
+
   def GetVersion(self):
     """Gets the Remote API version running on the cluster.
 
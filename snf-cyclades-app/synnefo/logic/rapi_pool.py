@@ -13,6 +13,9 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from threading import Lock
+
+from django.conf import settings
 from objpool import ObjectPool
 from synnefo.logic.rapi import GanetiRapiClient
 
@@ -21,8 +24,60 @@ log = getLogger(__name__)
 
 _pools = {}
 _hashes = {}
+_stats = {}
 pool_size = 8
 
+# Log the statistics of a cluster every that many requests.
+STATS_LOG_INTERVAL = 1000
+
+
+class RapiStats(object):
+    """Count the requests of the RAPI clients of a cluster and their latency.
+
+    The statistics are kept per process and shared by all the pools of the
+    cluster.
+    """
+
+    def __init__(self, host):
+        self.host = host
+        self.lock = Lock()
+        self.requests = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.methods = {}
+
+    def record(self, method, elapsed, error):
+        with self.lock:
+            self.requests += 1
+            if error:
+                self.errors += 1
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+            self.methods[method] = self.methods.get(method, 0) + 1
+            if self.requests % STATS_LOG_INTERVAL == 0:
+                log.info("RAPI statistics of %s: %s", self.host,
+                         self._stats())
+
+    def _stats(self):
+        return {'requests': self.requests,
+                'errors': self.errors,
+                'methods': dict(self.methods),
+                'total_time': self.total_time,
+                'max_time': self.max_time,
+                'avg_time': (self.total_time / self.requests
+                             if self.requests else 0.0)}
+
+    def stats(self):
+        """Return a dictionary with the request statistics."""
+        with self.lock:
+            return self._stats()
+
+
+def get_rapi_stats():
+    """Return the request statistics of the clusters of this process."""
+    return dict((host, stats.stats()) for host, stats in _stats.items())
+
 
 class GanetiRapiClientPool(ObjectPool):
     """Pool of Ganeti RAPI Clients."""
@@ -35,10 +90,15 @@ class GanetiRapiClientPool(ObjectPool):
         self.port = port
         self.user = user
         self.passwd = passwd
+        self.stats = _stats.setdefault(host, RapiStats(host))
 
     def _pool_create(self):
         log.debug("CREATE: Creating new client from pool %r", self)
-        client = GanetiRapiClient(self.host, self.port, self.user, self.passwd)
+        # Every client keeps its own connection to the master alive
+        client = GanetiRapiClient(self.host, self.port, self.user, self.passwd,
+                                  timeout=settings.GANETI_RAPI_TIMEOUT,
+                                  retries=settings.GANETI_RAPI_RETRIES,
+                                  stats=self.stats)
         client._pool = self
         return client
 
@@ -44,6 +44,7 @@ import logging
 import itertools
 import bitarray
 import simplejson as json
+from copy import copy
 from datetime import datetime, timedelta
 
 from synnefo.db import transaction
@@ -782,6 +783,7 @@ class PoolReconciler(object):
             self.log.info("There is no available pool for bridges.")
             return
 
+        pool.lock()
         # Since pool is locked, no new networks may be created
         used_bridges = set(networks.values_list('link', flat=True))
         check_pool_consistent(pool=pool, pool_class=pools.BridgePool,
@@ -799,6 +801,7 @@ class PoolReconciler(object):
             self.log.info("There is no available pool for MAC prefixes.")
             return
 
+        pool.lock()
         # Since pool is locked, no new network may be created
         used_mac_prefixes = set(networks.values_list('mac_prefix', flat=True))
         check_pool_consistent(pool=pool, pool_class=pools.MacPrefixPool,
@@ -858,7 +861,10 @@ def check_pool_consistent(pool, pool_class, used_values, fix, logger):
 
 
 def create_empty_pool(pool, pool_class):
-    pool_row = pool.pool_table
+    # Build the pool on an unsaved copy of the row, so that it is created
+    # empty, without touching the chunks of the pool
+    pool_row = copy(pool.pool_table)
+    pool_row.pk = None
     pool_row.available_map = ""
     pool_row.reserved_map = ""
     return pool_class(pool_row)
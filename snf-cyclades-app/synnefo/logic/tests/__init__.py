@@ -4,5 +4,6 @@ from .ips import *
 from .servers import *
 from .utils_tests import *
 from .rapi_pool_tests import *
+from .worker_pool_tests import *
 from .reconciliation import *
 from .callbacks import *
@@ -13,11 +13,22 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import requests
+
+from django.conf import settings
 from django.test import TestCase
 
 from synnefo.logic import rapi_pool
+from synnefo.logic.rapi import GanetiRapiClient
+
+from mock import Mock, patch
+
 
-from mock import patch
+def assert_created(rclient, host, password="pass"):
+    rclient.assert_called_once_with(host, "5080", "user", password,
+                                    timeout=settings.GANETI_RAPI_TIMEOUT,
+                                    retries=settings.GANETI_RAPI_RETRIES,
+                                    stats=rapi_pool._stats[host])
 
 
 @patch('synnefo.logic.rapi_pool.GanetiRapiClient', spec=True)
@@ -25,7 +36,7 @@ class GanetiRapiPoolTest(TestCase):
     def test_new_client(self, rclient):
         cl = rapi_pool.get_rapi_client(1, 'amxixa', 'cluster0', '5080', 'user',
                                        'pass')
-        rclient.assert_called_once_with("cluster0", "5080", "user", "pass")
+        assert_created(rclient, "cluster0")
         self.assertTrue('amxixa' in rapi_pool._pools)
         self.assertTrue(cl._pool is rapi_pool._pools[rapi_pool._hashes[1]])
 
@@ -38,7 +49,7 @@ class GanetiRapiPoolTest(TestCase):
     def test_get_from_pool(self, rclient):
         cl = rapi_pool.get_rapi_client(1, 'dummyhash', 'cluster1', '5080',
                                        'user', 'pass')
-        rclient.assert_called_once_with("cluster1", "5080", "user", "pass")
+        assert_created(rclient, "cluster1")
         rapi_pool.put_rapi_client(cl)
         rclient.reset_mock()
         cl2 = rapi_pool.get_rapi_client(1, 'dummyhash', 'cluster1', '5080',
@@ -49,12 +60,12 @@ class GanetiRapiPoolTest(TestCase):
     def test_changed_credentials(self, rclient):
         cl = rapi_pool.get_rapi_client(1, 'dummyhash2', 'cluster2', '5080',
                                        'user', 'pass')
-        rclient.assert_called_once_with("cluster2", "5080", "user", "pass")
+        assert_created(rclient, "cluster2")
         rapi_pool.put_rapi_client(cl)
         rclient.reset_mock()
         rapi_pool.get_rapi_client(1, 'dummyhash3', 'cluster2', '5080',
                                   'user', 'new_pass')
-        rclient.assert_called_once_with("cluster2", "5080", "user", "new_pass")
+        assert_created(rclient, "cluster2", "new_pass")
         self.assertFalse('dummyhash2' in rapi_pool._pools)
 
     def test_no_pool(self, rclient):
@@ -63,3 +74,25 @@ class GanetiRapiPoolTest(TestCase):
         cl._pool = None
         rapi_pool.put_rapi_client(cl)
         self.assertTrue(cl not in rapi_pool._pools.values())
+
+
+class GanetiRapiClientTest(TestCase):
+    def test_retries(self):
+        session = Mock()
+        response = Mock(status_code=200, content='2')
+        session.request.side_effect = [requests.ConnectionError(), response]
+        stats = rapi_pool.RapiStats("cluster")
+        client = GanetiRapiClient("cluster", session=session, retries=1,
+                                  stats=stats)
+        self.assertEqual(client.GetVersion(), 2)
+        self.assertEqual(session.request.call_count, 2)
+        # Only GET requests are retried
+        session.request.reset_mock()
+        session.request.side_effect = requests.ConnectionError()
+        self.assertRaises(requests.ConnectionError, client.AddClusterTags,
+                          ["tag"])
+        self.assertEqual(session.request.call_count, 1)
+        stats = stats.stats()
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(stats["methods"], {"GET": 1, "PUT": 1})
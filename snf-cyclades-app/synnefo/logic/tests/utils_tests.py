@@ -16,9 +16,12 @@
 from django.test import TestCase
 
 from synnefo.logic import utils
+from synnefo.logic.backend import map_backends, BackendTimeout
 from django.conf import settings
 from synnefo.db.models import VirtualMachine, Network
-from synnefo.db.models_factory import VirtualMachineFactory
+from synnefo.db.models_factory import VirtualMachineFactory, BackendFactory
+from threading import Event, Timer
+from time import sleep
 
 
 class NameConversionTest(TestCase):
@@ -69,3 +72,78 @@ class HidePass(TestCase):
         foo = {'osparams': {'img_passwd': 'pass'}, 'bar': 'foo'}
         after = {'osparams': {'img_passwd': 'xxxxxxxx'}, 'bar': 'foo'}
         self.assertEqual(after, utils.hide_pass(foo))
+
+
+class MapBackendsTest(TestCase):
+    def test_partial_results(self):
+        ok, failed, slow = [BackendFactory() for i in range(3)]
+        unblock = Event()
+
+        def call(backend):
+            if backend == failed:
+                raise ValueError(backend.clustername)
+            if backend == slow:
+                unblock.wait(5)
+            return backend.clustername
+
+        try:
+            results, errors = map_backends(call, [ok, failed, slow],
+                                           timeout=0.5, workers=2)
+        finally:
+            unblock.set()
+        self.assertEqual(results, {ok: ok.clustername})
+        self.assertEqual(set(errors.keys()), set([failed, slow]))
+        self.assertTrue(isinstance(errors[failed], ValueError))
+        self.assertTrue(isinstance(errors[slow], BackendTimeout))
+
+    def test_bounded_concurrency(self):
+        backends = [BackendFactory() for i in range(6)]
+        running = []
+
+        def call(backend):
+            running.append(backend)
+            count = len(running)
+            sleep(0.05)
+            running.remove(backend)
+            return count
+
+        results, errors = map_backends(call, backends, timeout=5, workers=2)
+        self.assertEqual(errors, {})
+        self.assertEqual(set(results.keys()), set(backends))
+        self.assertTrue(max(results.values()) <= 2)
+
+    def test_abandoned_calls(self):
+        slow, other, last = [BackendFactory() for i in range(3)]
+        unblock = Event()
+        running = []
+        concurrent = []
+
+        def call(backend):
+            running.append(backend)
+            concurrent.append(len(running))
+            if backend == slow:
+                unblock.wait(5)
+            elif backend == last:
+                sleep(5)
+            running.remove(backend)
+            return backend.clustername
+
+        # The abandoned call of 'slow' keeps its worker until it returns
+        timer = Timer(0.5, unblock.set)
+        timer.start()
+        try:
+            results, errors = map_backends(call, [slow, other],
+                                           timeout=0.3, workers=1)
+        finally:
+            timer.cancel()
+            unblock.set()
+        self.assertEqual(results, {other: other.clustername})
+        self.assertTrue(isinstance(errors[slow], BackendTimeout))
+        self.assertEqual(max(concurrent), 1)
+
+        # Backends that find no free worker in time fail too
+        results, errors = map_backends(call, [last, other],
+                                       timeout=0.2, workers=1)
+        self.assertEqual(results, {})
+        self.assertTrue(isinstance(errors[last], BackendTimeout))
+        self.assertTrue(isinstance(errors[other], BackendTimeout))
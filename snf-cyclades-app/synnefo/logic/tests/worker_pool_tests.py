@@ -0,0 +1,106 @@
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import time
+
+from django.test import TestCase
+
+from synnefo.logic.worker_pool import WorkerPool, get_message_key
+
+from mock import Mock
+
+
+def message(tag, **body):
+    return {"delivery_tag": tag, "body": json.dumps(body)}
+
+
+def wait(pool, timeout=5):
+    start = time.time()
+    while pool.flush() and time.time() - start < timeout:
+        time.sleep(0.01)
+
+
+class WorkerPoolTest(TestCase):
+    def setUp(self):
+        self.client = Mock()
+        self.pool = WorkerPool(self.client, 4)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_message_key(self):
+        self.assertEqual(get_message_key(message(1, instance="snf-1",
+                                                 network="snf-net-1")),
+                         ("instance", "snf-1"))
+        self.assertEqual(get_message_key(message(1, network="snf-net-1",
+                                                 cluster="cluster")),
+                         ("network", "snf-net-1"))
+        self.assertEqual(get_message_key({"body": "invalid"}), None)
+
+    def test_order_per_object(self):
+        processed = []
+
+        def callback(client, msg):
+            body = json.loads(msg["body"])
+            # Let the messages of the other objects overtake this one
+            time.sleep(0.01 * (body["seq"] % 3))
+            processed.append((body["instance"], body["seq"]))
+            client.basic_ack(msg)
+
+        messages = [message(i, instance="snf-%d" % (i % 5), seq=i)
+                    for i in range(50)]
+        callback = self.pool.wrap(callback)
+        for msg in messages:
+            callback(self.client, msg)
+        wait(self.pool)
+
+        self.assertEqual(len(processed), 50)
+        for i in range(5):
+            seqs = [seq for name, seq in processed if name == "snf-%d" % i]
+            self.assertEqual(seqs, range(i, 50, 5))
+        self.assertEqual(self.client.basic_ack.call_count, 50)
+        # Only the thread that owns the connection sends the acknowledgments
+        acked = [args[0] for args, kwargs in
+                 self.client.basic_ack.call_args_list]
+        self.assertEqual(sorted(m["delivery_tag"] for m in acked), range(50))
+
+    def test_reject_and_failure(self):
+        def callback(client, msg):
+            body = json.loads(msg["body"])
+            if body["fail"]:
+                raise ValueError
+            client.basic_reject(msg)
+
+        callback = self.pool.wrap(callback)
+        callback(self.client, message(1, instance="snf-1", fail=False))
+        callback(self.client, message(2, instance="snf-2", fail=True))
+        wait(self.pool)
+        self.assertEqual(self.pool.pending, 0)
+        self.client.basic_reject.assert_called_once_with(
+            message(1, instance="snf-1", fail=False), requeue=False)
+        # A failed message is left unacknowledged
+        self.assertFalse(self.client.basic_ack.called)
+
+    def test_reconnect(self):
+        def callback(client, msg):
+            client.basic_ack(msg)
+
+        self.pool.wrap(callback)(self.client, message(1, instance="snf-1"))
+        # The delivery tags of the old connection are not valid anymore
+        self.client.client = Mock()
+        wait(self.pool)
+        self.assertEqual(self.pool.pending, 0)
+        self.assertFalse(self.client.basic_ack.called)
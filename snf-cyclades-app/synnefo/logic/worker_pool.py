@@ -0,0 +1,171 @@
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Process the messages of the dispatcher concurrently.
+
+The messages are sharded among the workers by the object they refer to (the
+instance, the network or the cluster), so that the messages of an object are
+processed one at a time and in the order they were received, while the
+messages of different objects are processed in parallel. Each worker is a
+thread with its own DB connection.
+
+The AMQP client is not thread-safe, so the workers do not acknowledge the
+messages themselves. Their acknowledgments are handed over to the thread that
+owns the connection, which sends them with 'flush'.
+
+"""
+
+import json
+import Queue
+import threading
+
+from django.db import close_connection
+
+from logging import getLogger
+log = getLogger(__name__)
+
+# Fields of the messages of snf-ganeti-eventd that name the object a message
+# refers to, in order of precedence.
+KEY_FIELDS = ("instance", "network", "cluster")
+
+
+def get_message_key(message):
+    """Return the object an AMQP message refers to, or None."""
+    try:
+        body = json.loads(message["body"])
+        for field in KEY_FIELDS:
+            if field in body:
+                return (field, body[field])
+    except (KeyError, TypeError, ValueError):
+        # Let the callback reject the message
+        pass
+    return None
+
+
+def get_connection(client):
+    """Return the connection of an AMQP client.
+
+    The delivery tags of the messages are valid only on the connection the
+    messages were received from, and the clients replace their connection
+    when they reconnect.
+
+    """
+    return getattr(client, "client", None)
+
+
+class WorkerClient(object):
+    """The AMQP client that is passed to the callbacks of the workers."""
+
+    def __init__(self, replies, connection):
+        self.replies = replies
+        self.connection = connection
+
+    def basic_ack(self, message):
+        self.replies.put((self.connection, "basic_ack", message, {}))
+
+    def basic_nack(self, message):
+        self.replies.put((self.connection, "basic_nack", message, {}))
+
+    def basic_reject(self, message, requeue=False):
+        self.replies.put((self.connection, "basic_reject", message,
+                          {"requeue": requeue}))
+
+
+class WorkerPool(object):
+    """A fixed number of workers that process the messages of a client."""
+
+    def __init__(self, client, size):
+        self.client = client
+        self.size = size
+        self.replies = Queue.Queue()
+        self.queues = [Queue.Queue() for i in range(size)]
+        self.pending = 0
+        self.stopping = False
+        self.workers = []
+        for queue in self.queues:
+            worker = threading.Thread(target=self._work, args=(queue,))
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def wrap(self, callback):
+        """Wrap a callback of 'basic_consume' to run in the workers."""
+        def submit(client, message):
+            self.submit(callback, message)
+        return submit
+
+    def submit(self, callback, message):
+        key = get_message_key(message)
+        queue = self.queues[hash(key) % self.size]
+        self.pending += 1
+        queue.put((callback, message, get_connection(self.client)))
+
+    def _work(self, queue):
+        while True:
+            item = queue.get()
+            if item is None:
+                break
+            callback, message, connection = item
+            try:
+                if self.stopping:
+                    # Leave the message unacknowledged, to be redelivered
+                    continue
+                callback(WorkerClient(self.replies, connection), message)
+            except Exception as e:
+                # Leave the message unacknowledged, as the dispatcher does
+                # when a callback fails
+                log.exception("Caught unexpected exception: %s", e)
+            finally:
+                # Every worker uses its own DB connection, which is closed
+                # after every message as in the main loop of the dispatcher
+                close_connection()
+                self.replies.put((connection, None, message, {}))
+
+    def flush(self):
+        """Send the acknowledgments of the processed messages.
+
+        Return the number of messages that are still being processed.
+
+        """
+        current = get_connection(self.client)
+        while True:
+            try:
+                connection, method, message, kwargs = self.replies.get_nowait()
+            except Queue.Empty:
+                break
+            if method is None:
+                # The worker is done with the message
+                self.pending -= 1
+                continue
+            if connection is not current:
+                log.warning("Not sending %s for message received before"
+                            " reconnecting: %s", method, message)
+                continue
+            getattr(self.client, method)(message, **kwargs)
+        return self.pending
+
+    def close(self, timeout=None):
+        """Stop the workers after the messages they are processing.
+
+        The messages that have not been processed yet are left
+        unacknowledged, to be redelivered by the broker.
+
+        """
+        self.stopping = True
+        for queue in self.queues:
+            queue.put(None)
+        for worker in self.workers:
+            worker.join(timeout)
+        self.flush()
@@ -81,9 +81,13 @@ def get_pithos_backend():
             service_token=settings.CYCLADES_SERVICE_TOKEN,
             astakosclient_poolsize=settings.CYCLADES_ASTAKOSCLIENT_POOLSIZE,
             db_connection=settings.BACKEND_DB_CONNECTION,
+            block_module=settings.PITHOS_BACKEND_BLOCK_MODULE,
+            block_params={'mappool': None, 'blockpool': None,
+                          'path': settings.PITHOS_BACKEND_BLOCK_PATH},
             archipelago_conf_file=settings.PITHOS_BACKEND_ARCHIPELAGO_CONF,
             xseg_pool_size=settings.PITHOS_BACKEND_XSEG_POOL_SIZE,
             map_check_interval=settings.PITHOS_BACKEND_MAP_CHECK_INTERVAL,
+            map_check_batch_size=settings.PITHOS_BACKEND_MAP_CHECK_BATCH_SIZE,
             resource_max_metadata=settings.PITHOS_RESOURCE_MAX_METADATA)
     return _pithos_backend_pool.pool_get()
 
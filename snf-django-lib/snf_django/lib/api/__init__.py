@@ -29,8 +29,8 @@ from astakosclient import AstakosClient
 from astakosclient.errors import AstakosClientException
 from django.conf import settings
 from snf_django.lib.api import faults
+from snf_django.lib.astakos import get_token_cache
 
-import itertools
 
 log = getLogger(__name__)
 django_logger = getLogger("django.request")
@@ -101,11 +101,16 @@ def api_method(http_method=None, token_required=True, user_required=True,
                             logger.error("Cannot authenticate without having"
                                          " an Astakos Authentication URL")
                             raise
-                    astakos = AstakosClient(token, astakos_url,
-                                            use_pool=True,
-                                            retry=2,
-                                            logger=logger)
-                    user_info = astakos.authenticate()
+                    token_cache = get_token_cache()
+                    if token_cache is not None:
+                        user_info = token_cache.authenticate(
+                            token, astakos_url, logger=logger)
+                    else:
+                        astakos = AstakosClient(token, astakos_url,
+                                                use_pool=True,
+                                                retry=2,
+                                                logger=logger)
+                        user_info = astakos.authenticate()
                     request.user_uniq = user_info["access"]["user"]["id"]
                     request.user = user_info
 
@@ -202,15 +207,10 @@ def update_response_headers(request, response):
     if not response.has_header("Content-Length"):
         _base_content_is_iter = getattr(response, '_base_content_is_iter',
                                         None)
+        # Responses with an iterator as content are streamed without a
+        # Content-Length, which would require consuming the iterator.
         if (_base_content_is_iter is not None and not _base_content_is_iter):
             response["Content-Length"] = len(response.content)
-        else:
-            if not (response.has_header('Content-Type') and
-                    response['Content-Type'].startswith(
-                        'multipart/byteranges')):
-                # save response content from been consumed if it is an iterator
-                response._container, data = itertools.tee(response._container)
-                response["Content-Length"] = len(str(data))
 
     cache.add_never_cache_headers(response)
     # Fix Vary and Cache-Control Headers. Issue: #3448
@@ -14,6 +14,16 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import hashlib
+import calendar
+
+from collections import OrderedDict
+from threading import Lock
+from time import time
+
+from dateutil.parser import parse as parse_date
+from django.conf import settings
+from django.core.cache import get_cache
 
 from astakosclient import AstakosClient
 from astakosclient.errors import (Unauthorized, NoUUID, NoUserName,
@@ -64,11 +74,17 @@ class UserCache(object):
         self.astakos = AstakosClient(astakos_token, astakos_auth_url,
                                      retry=2, use_pool=True, logger=logger)
         self.users = {}
+        self.catalog = get_user_catalog_cache()
 
         self.split = split
         assert(self.split > 0), "split must be positive"
 
     def fetch_names(self, uuid_list):
+        if self.catalog is not None:
+            cached = self.catalog.get_names(uuid_list)
+            self.users.update(cached)
+            uuid_list = [u for u in uuid_list if u not in cached]
+
         total = len(uuid_list)
         split = self.split
         count = 0
@@ -81,6 +97,8 @@ class UserCache(object):
                 count += len(names)
 
                 self.users.update(names)
+                if self.catalog is not None:
+                    self.catalog.set_names(names)
             except AstakosClientException:
                 pass
             except Exception as err:
@@ -96,9 +114,14 @@ class UserCache(object):
     def get_uuid(self, name):
         uuid = name
 
-        if not name in self.users:
+        if name not in self.users and self.catalog is not None:
+            self.users.update(self.catalog.get_uuids([name]))
+
+        if name not in self.users:
             try:
                 uuid = self.astakos.service_get_uuid(name)
+                if self.catalog is not None:
+                    self.catalog.set_uuids({name: uuid})
             except NoUUID:
                 self.logger.debug("Failed to fetch uuid for %s", name)
             except AstakosClientException:
@@ -114,9 +137,14 @@ class UserCache(object):
     def get_name(self, uuid):
         name = "-"
 
-        if not uuid in self.users:
+        if uuid not in self.users and self.catalog is not None:
+            self.users.update(self.catalog.get_names([uuid]))
+
+        if uuid not in self.users:
             try:
                 name = self.astakos.service_get_username(uuid)
+                if self.catalog is not None:
+                    self.catalog.set_names({uuid: name})
             except NoUserName:
                 self.logger.debug("Failed to fetch display name for %s", uuid)
             except AstakosClientException:
@@ -129,3 +157,230 @@ class UserCache(object):
                 self.users[uuid] = name
 
         return self.users[uuid]
+
+
+class TTLCache(object):
+    """Bounded in-process cache of entries that expire after a TTL.
+
+    When full, the least recently used entry is evicted.
+    """
+
+    def __init__(self, size, ttl):
+        assert(size > 0), "size must be positive"
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None or entry[0] <= time():
+                self.misses += 1
+                return None
+            self.entries[key] = entry
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self.lock:
+            self.entries.pop(key, None)
+            while len(self.entries) >= self.size:
+                self.entries.popitem(last=False)
+            self.entries[key] = (time() + ttl, value)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+                'entries': len(self.entries)}
+
+
+class UserCatalogCache(object):
+    """Cache of the uuid<->displayname mappings of users.
+
+    Mappings are kept for up to ``ttl`` seconds in both directions. Only
+    users known to Astakos are cached.
+    """
+
+    def __init__(self, size, ttl):
+        self.names = TTLCache(size, ttl)
+        self.uuids = TTLCache(size, ttl)
+
+    def _get(self, cache, keys):
+        found = {}
+        for key in keys:
+            value = cache.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def get_names(self, uuids):
+        """Return a dict with the cached displaynames of the uuids."""
+        return self._get(self.names, uuids)
+
+    def get_uuids(self, names):
+        """Return a dict with the cached uuids of the displaynames."""
+        return self._get(self.uuids, names)
+
+    def set_names(self, names):
+        """Cache a dict of uuids to displaynames."""
+        for uuid, name in names.iteritems():
+            self.names.set(uuid, name)
+            self.uuids.set(name, uuid)
+
+    def set_uuids(self, uuids):
+        """Cache a dict of displaynames to uuids."""
+        for name, uuid in uuids.iteritems():
+            self.uuids.set(name, uuid)
+            self.names.set(uuid, name)
+
+    def stats(self):
+        return {'names': self.names.stats(), 'uuids': self.uuids.stats()}
+
+
+class TokenCache(object):
+    """Cache of the user info of authentication tokens.
+
+    User info is kept for up to ``ttl`` seconds, but never past the
+    expiration of the token. Tokens rejected by Astakos are remembered for
+    ``negative_ttl`` seconds. Entries are kept per process and, if
+    ``backend`` is set, in that Django cache too, to be shared among
+    processes. Tokens are stored hashed.
+    """
+
+    KEY_PREFIX = 'snf_token_'
+    # Log the statistics of the cache every that many lookups.
+    STATS_LOG_INTERVAL = 1000
+
+    def __init__(self, size, ttl, negative_ttl=0, backend=None,
+                 logger=None):
+        self.cache = TTLCache(size, ttl)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.backend = get_cache(backend) if backend else None
+        self.logger = logger or logging.getLogger(__name__)
+        self.shared_hits = 0
+        self.negative_hits = 0
+
+    def _key(self, token):
+        return self.KEY_PREFIX + hashlib.sha256(token).hexdigest()
+
+    def _lookup(self, key):
+        entry = self.cache.get(key)
+        if entry is None and self.backend is not None:
+            entry = self.backend.get(key)
+            if entry is not None:
+                self.shared_hits += 1
+                self.cache.set(key, entry, entry[2] - time())
+        return entry
+
+    def _store(self, key, entry, ttl):
+        ttl = min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        entry = entry + (time() + ttl,)
+        self.cache.set(key, entry, ttl)
+        if self.backend is not None and int(ttl) > 0:
+            self.backend.set(key, entry, int(ttl))
+
+    def authenticate(self, token, astakos_auth_url, logger=None):
+        """Return the user info of the token, asking Astakos on a miss.
+
+        Raise Unauthorized if Astakos rejects the token.
+        """
+        key = self._key(token)
+        entry = self._lookup(key)
+        lookups = self.cache.hits + self.cache.misses
+        if lookups % self.STATS_LOG_INTERVAL == 0:
+            self.logger.info("Token cache statistics: %s", self.stats())
+        if entry is not None:
+            if entry[0] is None:
+                self.negative_hits += 1
+                raise Unauthorized(*entry[1])
+            return entry[0]
+
+        astakos = AstakosClient(token, astakos_auth_url, use_pool=True,
+                                retry=2, logger=logger or self.logger)
+        try:
+            user_info = astakos.authenticate()
+        except Unauthorized as err:
+            self._store(key, (None, (err.message, err.details)),
+                        self.negative_ttl)
+            raise
+        self._store(key, (user_info, None), self._token_ttl(user_info))
+        return user_info
+
+    def _token_ttl(self, user_info):
+        try:
+            expires = parse_date(user_info["access"]["token"]["expires"])
+            return calendar.timegm(expires.utctimetuple()) - time()
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return self.ttl
+
+    def invalidate(self, token):
+        key = self._key(token)
+        self.cache.delete(key)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats.update({'shared_hits': self.shared_hits,
+                      'negative_hits': self.negative_hits})
+        return stats
+
+
+_token_cache = None
+_token_cache_lock = Lock()
+
+
+def get_token_cache():
+    """Return the token cache of this process, or None if it is disabled.
+
+    The cache is configured with the AUTH_TOKEN_CACHE_* settings.
+    """
+    global _token_cache
+    ttl = getattr(settings, "AUTH_TOKEN_CACHE_TTL", 0)
+    if ttl <= 0:
+        return None
+    with _token_cache_lock:
+        if _token_cache is None:
+            _token_cache = TokenCache(
+                getattr(settings, "AUTH_TOKEN_CACHE_SIZE", 10000), ttl,
+                getattr(settings, "AUTH_TOKEN_CACHE_NEGATIVE_TTL", 10),
+                getattr(settings, "AUTH_TOKEN_CACHE_BACKEND", None))
+        return _token_cache
+
+
+_user_catalog_cache = None
+_user_catalog_cache_lock = Lock()
+
+
+def get_user_catalog_cache():
+    """Return the user catalog cache of this process, or None if disabled.
+
+    The cache is configured with the USER_CATALOG_CACHE_* settings.
+    """
+    global _user_catalog_cache
+    ttl = getattr(settings, "USER_CATALOG_CACHE_TTL", 0)
+    if ttl <= 0:
+        return None
+    with _user_catalog_cache_lock:
+        if _user_catalog_cache is None:
+            _user_catalog_cache = UserCatalogCache(
+                getattr(settings, "USER_CATALOG_CACHE_SIZE", 10000), ttl)
+        return _user_catalog_cache
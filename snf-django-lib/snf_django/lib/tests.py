@@ -0,0 +1,124 @@
+import sys
+from mock import patch
+from snf_django.lib.astakos import (TTLCache, TokenCache, UserCatalogCache,
+                                    UserCache)
+from astakosclient.errors import Unauthorized
+
+# Use backported unittest functionality if Python < 2.7
+try:
+    import unittest2 as unittest
+except ImportError:
+    if sys.version_info < (2, 7):
+        raise Exception("The unittest2 package is required for Python < 2.7")
+    import unittest
+
+
+def user_info(user, expires="2100-01-01T00:00:00.000000+00:00"):
+    return {"access": {"token": {"expires": expires, "id": "token"},
+                       "user": {"id": user}}}
+
+
+class TTLCacheTestCase(unittest.TestCase):
+    def test_get_set(self):
+        c = TTLCache(2, 60)
+        self.assertEqual(c.get("a"), None)
+        c.set("a", 1)
+        self.assertEqual(c.get("a"), 1)
+        self.assertEqual((c.hits, c.misses), (1, 1))
+
+    def test_expiration(self):
+        c = TTLCache(2, 60)
+        c.set("a", 1, ttl=-1)
+        self.assertEqual(c.get("a"), None)
+        with patch("snf_django.lib.astakos.time") as time:
+            time.return_value = 0
+            c.set("a", 1, ttl=120)
+            time.return_value = 59
+            self.assertEqual(c.get("a"), 1)
+            time.return_value = 61
+            self.assertEqual(c.get("a"), None)
+
+    def test_eviction(self):
+        c = TTLCache(2, 60)
+        c.set("a", 1)
+        c.set("b", 2)
+        c.get("a")  # b is now the least recently used
+        c.set("c", 3)
+        self.assertEqual(c.get("b"), None)
+        self.assertEqual(c.get("a"), 1)
+        self.assertEqual(len(c), 2)
+
+
+@patch("astakosclient.AstakosClient.authenticate")
+class TokenCacheTestCase(unittest.TestCase):
+    def test_cached(self, authenticate):
+        authenticate.return_value = user_info("user")
+        c = TokenCache(10, 60)
+        for i in range(3):
+            info = c.authenticate("token", "http://astakos/")
+            self.assertEqual(info["access"]["user"]["id"], "user")
+        self.assertEqual(authenticate.call_count, 1)
+        self.assertEqual(c.stats()["hits"], 2)
+        c.invalidate("token")
+        c.authenticate("token", "http://astakos/")
+        self.assertEqual(authenticate.call_count, 2)
+
+    def test_expired_token(self, authenticate):
+        authenticate.return_value = user_info(
+            "user", expires="2000-01-01T00:00:00+00:00")
+        c = TokenCache(10, 60)
+        c.authenticate("token", "http://astakos/")
+        c.authenticate("token", "http://astakos/")
+        self.assertEqual(authenticate.call_count, 2)
+
+    def test_negative(self, authenticate):
+        authenticate.side_effect = Unauthorized("Invalid token")
+        c = TokenCache(10, 60, negative_ttl=10)
+        for i in range(2):
+            self.assertRaises(Unauthorized, c.authenticate, "token",
+                              "http://astakos/")
+        self.assertEqual(authenticate.call_count, 1)
+        self.assertEqual(c.stats()["negative_hits"], 1)
+
+        c = TokenCache(10, 60)
+        for i in range(2):
+            self.assertRaises(Unauthorized, c.authenticate, "token",
+                              "http://astakos/")
+        self.assertEqual(authenticate.call_count, 3)
+
+    def test_shared(self, authenticate):
+        authenticate.return_value = user_info("user")
+        c1 = TokenCache(10, 60, backend="locmem://")
+        c2 = TokenCache(10, 60, backend="locmem://")
+        c2.backend = c1.backend
+        c1.authenticate("token", "http://astakos/")
+        c2.authenticate("token", "http://astakos/")
+        self.assertEqual(authenticate.call_count, 1)
+        self.assertEqual(c2.stats()["shared_hits"], 1)
+
+
+class UserCatalogCacheTestCase(unittest.TestCase):
+    def test_both_directions(self):
+        c = UserCatalogCache(10, 60)
+        c.set_names({"uuid1": "user1"})
+        c.set_uuids({"user2": "uuid2"})
+        self.assertEqual(c.get_names(["uuid1", "uuid2", "uuid3"]),
+                         {"uuid1": "user1", "uuid2": "user2"})
+        self.assertEqual(c.get_uuids(["user1", "user3"]), {"user1": "uuid1"})
+
+    @patch("astakosclient.AstakosClient.service_get_usernames")
+    def test_shared_with_user_cache(self, service_get_usernames):
+        service_get_usernames.return_value = {"uuid1": "user1"}
+        catalog = UserCatalogCache(10, 60)
+        with patch("snf_django.lib.astakos.get_user_catalog_cache") as get:
+            get.return_value = catalog
+            for i in range(2):
+                c = UserCache("http://astakos/", "token")
+                c.fetch_names(["uuid1"])
+                self.assertEqual(c.get_name("uuid1"), "user1")
+                self.assertEqual(c.get_uuid("user1"), "uuid1")
+        self.assertEqual(service_get_usernames.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
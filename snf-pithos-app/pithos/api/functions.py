@@ -34,8 +34,9 @@ from pithos.api.util import (
     copy_or_move_object, get_int_parameter, get_content_length,
     get_content_range, socket_read_iterator, SaveToBackendHandler,
     object_data_response, put_object_block, hashmap_md5, simple_list_response,
-    api_method, is_uuid, retrieve_uuid, retrieve_uuids,
-    retrieve_displaynames, Checksum, NoChecksum
+    listing_iterator, api_method, is_uuid, retrieve_uuid, retrieve_uuids,
+    retrieve_displaynames, get_user_catalog, Checksum, NoChecksum,
+    BlockWriter, HashmapParser
 )
 
 from pithos.api.settings import (UPDATE_MD5, TRANSLATE_UUIDS,
@@ -43,7 +44,8 @@ from pithos.api.settings import (UPDATE_MD5, TRANSLATE_UUIDS,
 
 from pithos.api import settings
 
-from pithos.backends.exceptions import ItemNotExists, ContainerExists
+from pithos.backends.exceptions import (ItemNotExists, ContainerExists,
+                                        InvalidHash)
 
 from pithos.backends.filter import parse_filters
 
@@ -238,12 +240,8 @@ def account_list(request):
         for meta in account_meta:
             meta['name'] = catalog.get(meta.get('name'))
 
-    if request.serialization == 'xml':
-        data = render_to_string('accounts.xml', {'accounts': account_meta})
-    elif request.serialization == 'json':
-        data = json.dumps(account_meta)
     response.status_code = 200
-    response.content = data
+    response.content = listing_iterator(request, 'account', account_meta)
     return response
 
 
@@ -383,13 +381,9 @@ def container_list(request, v_account):
                 meta['X-Container-Policy'] = printable_header_dict(
                     dict([(k, v) for k, v in policy.iteritems()]))
             container_meta.append(printable_header_dict(meta))
-    if request.serialization == 'xml':
-        data = render_to_string('containers.xml', {'account':
-                                v_account, 'containers': container_meta})
-    elif request.serialization == 'json':
-        data = json.dumps(container_meta)
     response.status_code = 200
-    response.content = data
+    response.content = listing_iterator(request, 'container', container_meta,
+                                        account=v_account)
     return response
 
 
@@ -517,6 +511,52 @@ def container_delete(request, v_account, v_container):
     return HttpResponse(status=204)
 
 
+def _object_list_meta(request, v_account, v_container, until, objects,
+                      object_permissions, object_public):
+    """Format the listed objects for printing out one at a time.
+
+    Each object is removed from the list as it is formatted, so that the
+    listing is not kept in memory twice while it is sent.
+    """
+
+    catalog = get_user_catalog(request)
+    objects.reverse()
+    while objects:
+        meta = objects.pop()
+        if TRANSLATE_UUIDS:
+            modified_by = meta.get('modified_by')
+            if modified_by:
+                meta['modified_by'] = catalog.get_displayname(modified_by)
+
+        if len(meta) == 1:
+            # Virtual objects/directories.
+            yield meta
+        else:
+            rename_meta_key(
+                meta, 'hash', 'x_object_hash')  # Will be replaced by checksum.
+            rename_meta_key(meta, 'checksum', 'hash')
+            rename_meta_key(meta, 'type', 'content_type')
+            rename_meta_key(meta, 'uuid', 'x_object_uuid')
+            if until is not None and 'modified' in meta:
+                del(meta['modified'])
+            else:
+                rename_meta_key(meta, 'modified', 'last_modified')
+            rename_meta_key(meta, 'modified_by', 'x_object_modified_by')
+            rename_meta_key(meta, 'version', 'x_object_version')
+            rename_meta_key(
+                meta, 'version_timestamp', 'x_object_version_timestamp')
+            permissions = object_permissions.get(meta['name'], None)
+            if permissions:
+                update_sharing_meta(request, permissions, v_account,
+                                    v_container, meta['name'], meta)
+            public_url = object_public.get(meta['name'], None)
+            if request.user_uniq == v_account:
+                # Return public information only if the request user
+                # is the object owner
+                update_public_meta(public_url, meta)
+            yield printable_header_dict(meta)
+
+
 @api_method('GET', format_allowed=True, user_required=True, logger=logger,
             serializations=["text", "xml", "json"])
 def object_list(request, v_account, v_container):
@@ -636,51 +676,22 @@ def object_list(request, v_account, v_container):
                     v_container, prefix).iteritems():
                     object_public[k[name_idx:]] = v
 
-    object_meta = []
-    for meta in objects:
-        if TRANSLATE_UUIDS:
-            modified_by = meta.get('modified_by')
-            if modified_by:
-                l = retrieve_displaynames(
-                    getattr(request, 'token', None), [meta['modified_by']])
-                if l is not None and len(l) == 1:
-                    meta['modified_by'] = l[0]
-
-        if len(meta) == 1:
-            # Virtual objects/directories.
-            object_meta.append(meta)
-        else:
-            rename_meta_key(
-                meta, 'hash', 'x_object_hash')  # Will be replaced by checksum.
-            rename_meta_key(meta, 'checksum', 'hash')
-            rename_meta_key(meta, 'type', 'content_type')
-            rename_meta_key(meta, 'uuid', 'x_object_uuid')
-            if until is not None and 'modified' in meta:
-                del(meta['modified'])
-            else:
-                rename_meta_key(meta, 'modified', 'last_modified')
-            rename_meta_key(meta, 'modified_by', 'x_object_modified_by')
-            rename_meta_key(meta, 'version', 'x_object_version')
-            rename_meta_key(
-                meta, 'version_timestamp', 'x_object_version_timestamp')
-            permissions = object_permissions.get(meta['name'], None)
-            if permissions:
-                update_sharing_meta(request, permissions, v_account,
-                                    v_container, meta['name'], meta)
-            public_url = object_public.get(meta['name'], None)
-            if request.user_uniq == v_account:
-                # Return public information only if the request user
-                # is the object owner
-                update_public_meta(public_url, meta)
-            object_meta.append(printable_header_dict(meta))
+    if TRANSLATE_UUIDS:
+        # Translate all the uuids of the listing with a single call,
+        # before the listing is streamed.
+        catalog = get_user_catalog(request)
+        catalog.add(meta['modified_by'] for meta in objects
+                    if meta.get('modified_by'))
+        for permissions in object_permissions.itervalues():
+            catalog.add_permissions(permissions[2])
+        catalog.resolve()
 
-    if request.serialization == 'xml':
-        data = render_to_string(
-            'objects.xml', {'container': v_container, 'objects': object_meta})
-    elif request.serialization == 'json':
-        data = json.dumps(object_meta, default=json_encode_decimal)
     response.status_code = 200
-    response.content = data
+    response.content = listing_iterator(
+        request, 'object',
+        _object_list_meta(request, v_account, v_container, until, objects,
+                          object_permissions, object_public),
+        container=v_container)
     return response
 
 
@@ -923,31 +934,33 @@ def object_write(request, v_account, v_container, v_object):
         raise faults.LengthRequired('Missing Content-Type header')
 
     if 'hashmap' in request.GET:
-        data = ''
-        for block in socket_read_iterator(request, content_length,
-                                          request.backend.block_size):
-            data = ''.join([data, block])
-
+        parser = HashmapParser(request.backend.hash_algorithm)
         try:
-            d = json.loads(data)
-            hashmap = d['hashes']
-            size = int(d['bytes'])
-        except:
+            for block in socket_read_iterator(request, content_length,
+                                              request.backend.block_size):
+                parser.feed(block)
+            hashmap, size = parser.close()
+        except InvalidHash:
+            # Reported as such by api_method
+            raise
+        except (ValueError, TypeError):
             raise faults.BadRequest('Invalid data formatting')
         checksum = ''  # Do not set to None (will copy previous value).
     else:
         etag = request.META.get('HTTP_ETAG')
         checksum_compute = Checksum() if etag or UPDATE_MD5 else NoChecksum()
         size = 0
-        hashmap = []
+        writer = BlockWriter(request.backend,
+                             settings.UPLOAD_BLOCKS_IN_FLIGHT)
         for data in socket_read_iterator(request, content_length,
                                          request.backend.block_size):
             # TODO: Raise 408 (Request Timeout) if this takes too long.
             # TODO: Raise 499 (Client Disconnect) if a length is defined
             #       and we stop before getting this much data.
             size += len(data)
-            hashmap.append(request.backend.put_block(data))
+            writer.put_block(data)
             checksum_compute.update(data)
+        hashmap = writer.get_hashmap()
 
         checksum = checksum_compute.hexdigest()
         if etag and parse_etags(etag)[0].lower() != checksum:
@@ -111,6 +111,14 @@ BACKEND_DB_MODULE = getattr(
     settings, 'PITHOS_BACKEND_DB_MODULE', 'pithos.backends.lib.sqlalchemy')
 BACKEND_DB_CONNECTION = getattr(settings, 'PITHOS_BACKEND_DB_CONNECTION',
                                 'sqlite:////tmp/pithos-backend.db')
+# Database connections kept open per process (0 opens one per backend).
+BACKEND_DB_POOL_SIZE = getattr(settings, 'PITHOS_BACKEND_DB_POOL_SIZE', 0)
+BACKEND_DB_POOL_MAX_OVERFLOW = getattr(
+    settings, 'PITHOS_BACKEND_DB_POOL_MAX_OVERFLOW', 10)
+BACKEND_DB_POOL_PRE_PING = getattr(
+    settings, 'PITHOS_BACKEND_DB_POOL_PRE_PING', False)
+BACKEND_DB_POOL_RECYCLE = getattr(
+    settings, 'PITHOS_BACKEND_DB_POOL_RECYCLE', -1)
 
 # Block storage.
 BACKEND_BLOCK_MODULE = getattr(
@@ -118,6 +126,16 @@ BACKEND_BLOCK_MODULE = getattr(
 BACKEND_BLOCK_PATH = getattr(
     settings, 'PITHOS_BACKEND_BLOCK_PATH', '/tmp/pithos-data/')
 BACKEND_BLOCK_UMASK = getattr(settings, 'PITHOS_BACKEND_BLOCK_UMASK', 0o022)
+BACKEND_BLOCK_CACHE_SIZE = getattr(
+    settings, 'PITHOS_BACKEND_BLOCK_CACHE_SIZE', 0)
+
+# Issue one quota commission per request instead of one per object change.
+BACKEND_AGGREGATE_COMMISSIONS = getattr(
+    settings, 'PITHOS_BACKEND_AGGREGATE_COMMISSIONS', False)
+
+# Number of objects deleted per transaction by container and directory deletes.
+BACKEND_DELETE_CHUNK_SIZE = getattr(
+    settings, 'PITHOS_BACKEND_DELETE_CHUNK_SIZE', 1000)
 
 
 # Default setting for new accounts.
@@ -138,6 +156,16 @@ BACKEND_POOL_SIZE = getattr(settings, 'PITHOS_BACKEND_POOL_SIZE', 5)
 # Update object checksums.
 UPDATE_MD5 = getattr(settings, 'PITHOS_UPDATE_MD5', False)
 
+# Number of blocks read ahead while serving object data. Each download holds
+# at most this many blocks in memory besides the one being sent.
+PREFETCH_BLOCKS = getattr(settings, 'PITHOS_PREFETCH_BLOCKS', 0)
+
+# Number of uploaded blocks hashed and stored concurrently, while the next
+# ones are read from the client. Each upload holds at most this many blocks
+# in memory besides the one being read.
+UPLOAD_BLOCKS_IN_FLIGHT = getattr(
+    settings, 'PITHOS_UPLOAD_BLOCKS_IN_FLIGHT', 0)
+
 RADOS_STORAGE = getattr(settings, 'PITHOS_RADOS_STORAGE', False)
 RADOS_POOL_BLOCKS = getattr(settings, 'PITHOS_RADOS_POOL_BLOCKS', 'blocks')
 RADOS_POOL_MAPS = getattr(settings, 'PITHOS_RADOS_POOL_MAPS', 'maps')
@@ -184,6 +212,12 @@ BACKEND_ARCHIPELAGO_CONF = getattr(settings, 'PITHOS_BACKEND_ARCHIPELAGO_CONF',
 # Archipelagp xseg pool size
 BACKEND_XSEG_POOL_SIZE = getattr(settings, 'PITHOS_BACKEND_XSEG_POOL_SIZE', 8)
 
+BACKEND_ARCHIPELAGO_BATCH_SIZE = getattr(
+    settings, 'PITHOS_BACKEND_ARCHIPELAGO_BATCH_SIZE', 32)
+
+BACKEND_ARCHIPELAGO_WRITE_DEPTH = getattr(
+    settings, 'PITHOS_BACKEND_ARCHIPELAGO_WRITE_DEPTH', 8)
+
 # The maximum interval (in seconds) for consequent backend object map checks
 BACKEND_MAP_CHECK_INTERVAL = getattr(settings,
                                      'PITHOS_BACKEND_MAP_CHECK_INTERVAL', 5)
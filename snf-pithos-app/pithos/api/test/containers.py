@@ -630,6 +630,8 @@ class ContainerGet(PithosAPITest):
             self.fail('json format expected')
         self.assertEqual(objects[0]['subdir'], 'photos/animals/cats/')
         self.assertEqual(objects[1]['subdir'], 'photos/animals/dogs/')
+        # the listing is streamed
+        self.assertFalse(r.has_header('Content-Length'))
 
     def test_extended_list_xml(self):
         url = join_urls(self.pithos_path, self.user, 'apples')
@@ -406,6 +406,54 @@ class ObjectGet(PithosAPITest):
             self.assertEquals(fdata, sdata)
             i += 1
 
+    @pithos_test_settings(PREFETCH_BLOCKS=3)
+    def test_get_prefetch(self):
+        cname = self.containers[0]
+        oname, odata = self.upload_object(
+            cname, length=8 * TEST_BLOCK_SIZE + 300)[:-1]
+        url = join_urls(self.pithos_path, self.user, cname, oname)
+
+        r = self.get(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.content, odata)
+
+        r = self.get(url, HTTP_RANGE='bytes=1000-5000')
+        self.assertEqual(r.status_code, 206)
+        self.assertEqual(r.content, odata[1000:5001])
+
+        l = [(100, 200), (2000, 7000), (6000, 6100), (8000, None)]
+        ranges = 'bytes=%s' % ','.join(
+            '%d-%s' % (start, '' if end is None else end)
+            for start, end in l)
+        r = self.get(url, HTTP_RANGE=ranges)
+        self.assertEqual(r.status_code, 206)
+        boundary = r['content-type'].split('boundary=')[1]
+        cparts = r.content.split('--%s' % boundary)[1:-1]
+        self.assertEqual(len(cparts), len(l))
+        for (start, end), cpart in zip(l, cparts):
+            end = len(odata) if end is None else end + 1
+            sdata = cpart.split('\r\n', 4)[4][:-2]
+            self.assertEqual(sdata, odata[start:end])
+
+    def test_multiple_small_ranges(self):
+        cname = self.containers[0]
+        oname, odata = self.upload_object(
+            cname, length=4 * TEST_BLOCK_SIZE)[:-1]
+        url = join_urls(self.pithos_path, self.user, cname, oname)
+
+        # many parts, merged in fewer writes, and ranges crossing blocks
+        l = [(i, i + 9) for i in range(0, len(odata), 100)]
+        l.append((TEST_BLOCK_SIZE - 10, 3 * TEST_BLOCK_SIZE + 10))
+        ranges = 'bytes=%s' % ','.join('%d-%d' % r for r in l)
+        r = self.get(url, HTTP_RANGE=ranges)
+        self.assertEqual(r.status_code, 206)
+        boundary = r['content-type'].split('boundary=')[1]
+        cparts = r.content.split('--%s' % boundary)[1:-1]
+        self.assertEqual(len(cparts), len(l))
+        for (start, end), cpart in zip(l, cparts):
+            sdata = cpart.split('\r\n', 4)[4][:-2]
+            self.assertEqual(sdata, odata[start:end + 1])
+
     def test_multiple_range_not_satisfiable(self):
         # perform get with multiple range
         cname = self.containers[0]
@@ -727,6 +775,27 @@ class ObjectPut(PithosAPITest):
         r = self.put(url, data=data)
         self.assertEqual(r.status_code, 413)
 
+    @pithos_test_settings(UPLOAD_BLOCKS_IN_FLIGHT=3)
+    def test_upload_pipelined(self):
+        cname = self.container
+        oname = get_random_name()
+        data = get_random_data(length=10 * TEST_BLOCK_SIZE + 100)
+        url = join_urls(self.pithos_path, self.user, cname, oname)
+        r = self.put(url, data=data)
+        self.assertEqual(r.status_code, 201)
+        if not pithos_settings.UPDATE_MD5:
+            self.assertEqual(r['ETag'], merkle(data))
+
+        hashes = HashMap(TEST_BLOCK_SIZE, TEST_HASH_ALGORITHM)
+        hashes.load(data)
+        r = self.get('%s?hashmap=&format=json' % url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.content)['hashes'],
+                         [hexlify(h) for h in hashes])
+
+        r = self.get(url)
+        self.assertEqual(r.content, data)
+
     def test_upload_with_name_containing_slash(self):
         cname = self.container
         oname = '/%s' % get_random_name()
@@ -926,6 +995,56 @@ class ObjectPut(PithosAPITest):
         hashmap['hashes'] = [get_random_name()]
         r = self.put('%s?hashmap=' % url, data=json.dumps(hashmap))
         self.assertEqual(r.status_code, 400)
+        self.assertTrue('Invalid hash' in r.content)
+
+        # valid hex, but not a digest of the hash algorithm
+        hashmap['hashes'] = ['abcd']
+        r = self.put('%s?hashmap=' % url, data=json.dumps(hashmap))
+        self.assertEqual(r.status_code, 400)
+        self.assertTrue('Invalid hash' in r.content)
+
+    def test_create_object_by_hashmap_missing_blocks(self):
+        cname = self.container
+        block_size = pithos_settings.BACKEND_BLOCK_SIZE
+        block_hash = pithos_settings.BACKEND_HASH_ALGORITHM
+
+        oname, data = self.upload_object(cname, length=2 * block_size)[:-1]
+        stored = HashMap(block_size, block_hash)
+        stored.load(data)
+        absent = HashMap(block_size, block_hash)
+        absent.load(get_random_data(length=3 * block_size))
+        stored = [hexlify(h) for h in stored]
+        absent = [hexlify(h) for h in absent]
+
+        # duplicates are reported once, in the order of the hashmap
+        hashes = [absent[2], stored[0], absent[0], absent[2], stored[1],
+                  stored[0], absent[1], absent[0]]
+        hashmap = json.dumps({'hashes': hashes,
+                              'bytes': len(hashes) * block_size})
+        url = join_urls(self.pithos_path, self.user, cname, get_random_name())
+        r = self.put('%s?hashmap=' % url, data=hashmap)
+        self.assertEqual(r.status_code, 409)
+        self.assertEqual(json.loads(r.content),
+                         [absent[2], absent[0], absent[1]])
+
+    def test_create_object_by_long_hashmap(self):
+        cname = self.container
+        block_size = pithos_settings.BACKEND_BLOCK_SIZE
+
+        # the hashmap spans many reads of the request body
+        oname, data = self.upload_object(cname,
+                                         length=30 * block_size + 1)[:-1]
+        url = join_urls(self.pithos_path, self.user, cname, oname)
+        r = self.get('%s?hashmap=&format=json' % url)
+        self.assertTrue(len(r.content) > 2 * block_size)
+
+        oname = get_random_name()
+        url = join_urls(self.pithos_path, self.user, cname, oname)
+        r = self.put('%s?hashmap=' % url, data=r.content)
+        self.assertEqual(r.status_code, 201)
+        r = self.get(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.content, data)
 
 
 class ObjectPutCopy(PithosAPITest):
@@ -20,7 +20,8 @@ from urlparse import urlunsplit, urlsplit, parse_qsl
 
 from django.http import (HttpResponse, Http404, HttpResponseRedirect,
                          HttpResponseNotAllowed)
-from django.template.loader import render_to_string
+from django.template import Context
+from django.template.loader import render_to_string, get_template
 from django.utils import simplejson as json
 from django.utils.http import http_date, parse_etags
 from django.utils.encoding import smart_unicode, smart_str
@@ -35,9 +36,17 @@ from django.core.exceptions import PermissionDenied
 from snf_django.lib.api.parsedate import parse_http_date_safe, parse_http_date
 from snf_django.lib import api
 from snf_django.lib.api import faults, utils
+from snf_django.lib.astakos import get_user_catalog_cache
 
 from pithos.api.settings import (BACKEND_DB_MODULE, BACKEND_DB_CONNECTION,
-                                 BACKEND_BLOCK_MODULE,
+                                 BACKEND_DB_POOL_SIZE,
+                                 BACKEND_DB_POOL_MAX_OVERFLOW,
+                                 BACKEND_DB_POOL_PRE_PING,
+                                 BACKEND_DB_POOL_RECYCLE,
+                                 BACKEND_BLOCK_MODULE, BACKEND_BLOCK_PATH,
+                                 BACKEND_BLOCK_UMASK, BACKEND_BLOCK_CACHE_SIZE,
+                                 BACKEND_AGGREGATE_COMMISSIONS,
+                                 BACKEND_DELETE_CHUNK_SIZE,
                                  ASTAKOSCLIENT_POOLSIZE,
                                  SERVICE_TOKEN,
                                  ASTAKOS_AUTH_URL,
@@ -48,6 +57,8 @@ from pithos.api.settings import (BACKEND_DB_MODULE, BACKEND_DB_CONNECTION,
                                  BACKEND_BLOCK_SIZE, BACKEND_HASH_ALGORITHM,
                                  BACKEND_ARCHIPELAGO_CONF,
                                  BACKEND_XSEG_POOL_SIZE,
+                                 BACKEND_ARCHIPELAGO_BATCH_SIZE,
+                                 BACKEND_ARCHIPELAGO_WRITE_DEPTH,
                                  BACKEND_MAP_CHECK_INTERVAL,
                                  BACKEND_MAPFILE_PREFIX,
                                  RADOS_STORAGE, RADOS_POOL_BLOCKS,
@@ -57,6 +68,7 @@ from pithos.api.settings import (BACKEND_DB_MODULE, BACKEND_DB_CONNECTION,
                                  OAUTH2_CLIENT_CREDENTIALS, UNSAFE_DOMAIN,
                                  RESOURCE_MAX_METADATA, ACC_MAX_GROUPS,
                                  ACC_MAX_GROUP_MEMBERS)
+from pithos.api import settings
 
 from pithos.backends import connect_backend
 from pithos.backends.exceptions import (NotAllowedError, QuotaError,
@@ -71,9 +83,13 @@ from synnefo.lib import join_urls
 from astakosclient import AstakosClient
 from astakosclient.errors import NoUserName, NoUUID, AstakosClientException
 
+from collections import deque
+from threading import Thread, Event
+
 import logging
 import re
 import hashlib
+import sys
 import uuid
 import decimal
 
@@ -306,6 +322,12 @@ def is_uuid(str):
 ##########################
 
 def retrieve_displayname(token, uuid, fail_silently=True):
+    cache = get_user_catalog_cache()
+    if cache is not None:
+        displayname = cache.get_names([uuid]).get(uuid)
+        if displayname is not None:
+            return displayname
+
     astakos = AstakosClient(token, ASTAKOS_AUTH_URL,
                             retry=2, use_pool=True,
                             logger=logger)
@@ -317,15 +339,24 @@ def retrieve_displayname(token, uuid, fail_silently=True):
         else:
             # just return the uuid
             return uuid
+    if cache is not None:
+        cache.set_names({uuid: displayname})
     return displayname
 
 
 def retrieve_displaynames(token, uuids, return_dict=False, fail_silently=True):
-    astakos = AstakosClient(token, ASTAKOS_AUTH_URL,
-                            retry=2, use_pool=True,
-                            logger=logger)
-    catalog = astakos.get_usernames(uuids) or {}
+    cache = get_user_catalog_cache()
+    catalog = cache.get_names(uuids) if cache is not None else {}
     missing = list(set(uuids) - set(catalog))
+    if missing:
+        astakos = AstakosClient(token, ASTAKOS_AUTH_URL,
+                                retry=2, use_pool=True,
+                                logger=logger)
+        names = astakos.get_usernames(missing) or {}
+        if cache is not None:
+            cache.set_names(names)
+        catalog.update(names)
+        missing = list(set(missing) - set(names))
     if missing and not fail_silently:
         raise ItemNotExists('Unknown displaynames: %s' %
                             ', '.join(map(smart_str, missing)))
@@ -336,6 +367,12 @@ def retrieve_uuid(token, displayname):
     if is_uuid(displayname):
         return displayname
 
+    cache = get_user_catalog_cache()
+    if cache is not None:
+        uuid = cache.get_uuids([displayname]).get(displayname)
+        if uuid is not None:
+            return uuid
+
     astakos = AstakosClient(token, ASTAKOS_AUTH_URL,
                             retry=2, use_pool=True,
                             logger=logger)
@@ -343,15 +380,24 @@ def retrieve_uuid(token, displayname):
         uuid = astakos.get_uuid(displayname)
     except NoUUID:
         raise ItemNotExists(displayname)
+    if cache is not None:
+        cache.set_uuids({displayname: uuid})
     return uuid
 
 
 def retrieve_uuids(token, displaynames, return_dict=False, fail_silently=True):
-    astakos = AstakosClient(token, ASTAKOS_AUTH_URL,
-                            retry=2, use_pool=True,
-                            logger=logger)
-    catalog = astakos.get_uuids(displaynames) or {}
+    cache = get_user_catalog_cache()
+    catalog = cache.get_uuids(displaynames) if cache is not None else {}
     missing = list(set(displaynames) - set(catalog))
+    if missing:
+        astakos = AstakosClient(token, ASTAKOS_AUTH_URL,
+                                retry=2, use_pool=True,
+                                logger=logger)
+        uuids = astakos.get_uuids(missing) or {}
+        if cache is not None:
+            cache.set_uuids(uuids)
+        catalog.update(uuids)
+        missing = list(set(missing) - set(uuids))
     if missing and not fail_silently:
         raise ItemNotExists('Unknown uuids: %s' %
                             ', '.join(map(smart_str, missing)))
@@ -370,16 +416,62 @@ def replace_permissions_displayname(token, holder):
         return ':'.join([retrieve_uuid(token, account), group])
 
 
-def replace_permissions_uuid(token, holder):
+def replace_permissions_uuid(catalog, holder):
     if holder == '*':
         return holder
     try:
         # check first for a group permission
         account, group = holder.split(':', 1)
     except ValueError:
-        return retrieve_displayname(token, holder)
+        return catalog.get_displayname(holder) or holder
     else:
-        return ':'.join([retrieve_displayname(token, account), group])
+        return ':'.join([catalog.get_displayname(account) or account, group])
+
+
+class UserCatalog(object):
+    """Request-scoped translation of uuids to displaynames.
+
+    The uuids of a response are collected with add() or add_permissions()
+    and translated, on the first lookup, with a single call to Astakos for
+    those missing from the user catalog cache of the process.
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self.names = {}
+        self.pending = set()
+
+    def add(self, uuids):
+        self.pending.update(u for u in uuids if u not in self.names)
+
+    def add_permissions(self, perms):
+        holders = perms.get('read', []) + perms.get('write', [])
+        self.add(h.split(':', 1)[0] for h in holders if h != '*')
+
+    def resolve(self):
+        if not self.pending:
+            return
+        uuids = list(self.pending)
+        self.pending = set()
+        names = retrieve_displaynames(self.token, uuids, return_dict=True)
+        for uuid in uuids:
+            self.names[uuid] = names.get(uuid)
+
+    def get_displayname(self, uuid):
+        """Return the displayname of the uuid, or None if it is unknown."""
+        if uuid not in self.names:
+            self.pending.add(uuid)
+            self.resolve()
+        return self.names[uuid]
+
+
+def get_user_catalog(request):
+    """Return the UserCatalog of the request."""
+    catalog = getattr(request, 'user_catalog', None)
+    if catalog is None:
+        catalog = UserCatalog(getattr(request, 'token', None))
+        request.user_catalog = catalog
+    return catalog
 
 
 def update_sharing_meta(request, permissions, v_account,
@@ -392,12 +484,12 @@ def update_sharing_meta(request, permissions, v_account,
 
     # replace uuid with displayname
     if TRANSLATE_UUIDS:
-        perms['read'] = [replace_permissions_uuid(
-            getattr(request, 'token', None), x)
-            for x in perms.get('read', [])]
-        perms['write'] = [replace_permissions_uuid(
-            getattr(request, 'token', None), x)
-            for x in perms.get('write', [])]
+        catalog = get_user_catalog(request)
+        catalog.add_permissions(perms)
+        perms['read'] = [replace_permissions_uuid(catalog, x)
+                         for x in perms.get('read', [])]
+        perms['write'] = [replace_permissions_uuid(catalog, x)
+                          for x in perms.get('write', [])]
 
     ret = []
 
@@ -769,6 +861,133 @@ def socket_read_iterator(request, length=0, blocksize=4096):
             yield data
 
 
+_JSON_TOKEN = re.compile(r'''\s*(?:
+    (?P<punct>[{}\[\]:,])|
+    (?P<string>"(?:[^"\\]|\\.)*")|
+    (?P<scalar>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?|true|false|null))''',
+                         re.VERBOSE)
+_JSON_PARTIAL = re.compile(r'"|[-+.\w]+$')
+_JSON_SCALAR_TAIL = re.compile(r'[-+.\w]*$')
+_JSON_MAX_PARTIAL = 64 * 1024
+_HEX = re.compile('[0-9a-fA-F]*$')
+
+# States of the hashmap parser.
+(_VALUE, _ITEM_OR_END, _KEY_OR_END, _KEY, _COLON, _NEXT, _DONE) = range(7)
+
+
+class HashmapParser(object):
+    """Parse a JSON hashmap incrementally, as its data arrives.
+
+    Only the size of the object and its hashes are kept, and the hashes are
+    validated as soon as they are read. Any other data of the hashmap, like
+    the block size, is checked for syntax and dropped. Raise ValueError on
+    malformed data and InvalidHash on a hash that is not a hexadecimal
+    digest of ``hash_algorithm``.
+    """
+
+    def __init__(self, hash_algorithm):
+        self.hash_length = hashlib.new(hash_algorithm).digest_size * 2
+        # A run of valid hashes, parsed at once.
+        self.hash_run = re.compile(
+            r'\s*"[0-9a-fA-F]{%d}"(?:\s*,\s*"[0-9a-fA-F]{%d}")*' % (
+                self.hash_length, self.hash_length))
+        self.hashes = None
+        self.size = None
+        self.partial = ''
+        self.state = _VALUE
+        self.stack = []
+
+    def feed(self, data):
+        if self.partial:
+            data = self.partial + data
+        self.partial = self._parse(data, False)
+
+    def close(self):
+        """Finish parsing and return the hashes and the size."""
+        self._parse(self.partial, True)
+        if self.state != _DONE or self.hashes is None or self.size is None:
+            raise ValueError('Invalid data formatting')
+        return self.hashes, int(self.size)
+
+    def _parse(self, data, final):
+        pos = 0
+        while True:
+            if self.state in (_VALUE, _ITEM_OR_END) and self._in_hashes():
+                m = self.hash_run.match(data, pos)
+                if m is not None:
+                    self.hashes.extend(m.group().split('"')[1::2])
+                    pos = m.end()
+                    self.state = _NEXT
+                    continue
+            m = _JSON_TOKEN.match(data, pos)
+            if m is None or (not final and m.lastgroup == 'scalar' and
+                             _JSON_SCALAR_TAIL.match(data, m.end())):
+                # Keep an incomplete token for the next data.
+                rest = data[pos:].lstrip()
+                if not rest:
+                    return ''
+                if (final or len(rest) > _JSON_MAX_PARTIAL or
+                        not _JSON_PARTIAL.match(rest)):
+                    raise ValueError('Invalid data formatting')
+                return rest
+            pos = m.end()
+            self._token(m.lastgroup, m.group(m.lastgroup))
+
+    def _in_hashes(self):
+        return (len(self.stack) == 2 and self.stack[0][1] == 'hashes' and
+                self.stack[1][0] == '[')
+
+    def _token(self, kind, token):
+        state = self.state
+        if state == _VALUE or (state == _ITEM_OR_END and token != ']'):
+            if self._in_hashes():
+                self._hash(kind, token)
+            elif len(self.stack) == 1 and self.stack[0][1] == 'hashes':
+                if token != '[':
+                    raise ValueError('Invalid data formatting')
+                self.hashes = []
+            elif len(self.stack) == 1 and self.stack[0][1] == 'bytes':
+                if kind == 'punct':
+                    raise ValueError('Invalid data formatting')
+                self.size = json.loads(token)
+            if token in ('{', '['):
+                self.stack.append([token, None])
+                self.state = _KEY_OR_END if token == '{' else _ITEM_OR_END
+            elif kind == 'punct':
+                raise ValueError('Invalid data formatting')
+            else:
+                self._end_value()
+        elif state in (_KEY_OR_END, _KEY) and kind == 'string':
+            self.stack[-1][1] = json.loads(token)
+            self.state = _COLON
+        elif state == _COLON and token == ':':
+            self.state = _VALUE
+        elif ((state == _KEY_OR_END and token == '}') or
+              (state == _ITEM_OR_END and token == ']')):
+            self._end_container()
+        elif state == _NEXT and token == ',':
+            self.state = _KEY if self.stack[-1][0] == '{' else _VALUE
+        elif state == _NEXT and token == {'{': '}', '[': ']'}[
+                self.stack[-1][0]]:
+            self._end_container()
+        else:
+            raise ValueError('Invalid data formatting')
+
+    def _end_container(self):
+        self.stack.pop()
+        self._end_value()
+
+    def _end_value(self):
+        self.state = _NEXT if self.stack else _DONE
+
+    def _hash(self, kind, token):
+        hash = token[1:-1]
+        if (kind != 'string' or len(hash) != self.hash_length or
+                not _HEX.match(hash)):
+            raise InvalidHash('Invalid hash: %s' % token)
+        self.hashes.append(hash)
+
+
 class SaveToBackendHandler(FileUploadHandler):
     """Handle a file from an HTML form the django way."""
 
@@ -806,14 +1025,121 @@ class SaveToBackendHandler(FileUploadHandler):
         return self.file
 
 
+class BackgroundCall(object):
+    """Call a function in the background and wait for its result.
+
+    The call runs in a thread, which is a greenlet when running in a gevent
+    worker.
+    """
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+        self.value = None
+        self.exc_info = None
+        self.done = Event()
+        t = Thread(target=self.run)
+        t.daemon = True
+        t.start()
+
+    def run(self):
+        try:
+            self.value = self.func(*self.args)
+        except:
+            self.exc_info = sys.exc_info()
+        finally:
+            self.done.set()
+
+    def result(self):
+        self.done.wait()
+        if self.exc_info is not None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.value
+
+
+class BlockPrefetcher(object):
+    """Read ahead the blocks that will be requested next.
+
+    Up to ``depth`` blocks of the ``hashes`` sequence are fetched
+    concurrently, in the background. At most ``depth`` blocks are held ahead
+    of the consumer, so the memory used by a response is bounded by
+    ``(depth + 1) * block_size``.
+    """
+
+    def __init__(self, backend, hashes, depth):
+        self.backend = backend
+        self.hashes = iter(hashes)
+        self.depth = depth
+        self.pending = deque()
+
+    def fill(self):
+        while len(self.pending) < self.depth:
+            try:
+                hash = next(self.hashes)
+            except StopIteration:
+                return
+            self.pending.append(
+                (hash, BackgroundCall(self.backend.get_block, hash)))
+
+    def get_block(self, hash):
+        self.fill()
+        while self.pending:
+            fetched, call = self.pending.popleft()
+            if fetched == hash:
+                self.fill()
+                return call.result()
+        # Out of sequence, fetch the block directly.
+        return self.backend.get_block(hash)
+
+    def close(self):
+        self.pending.clear()
+        self.hashes = iter(())
+
+
+class BlockWriter(object):
+    """Hash and store blocks in the background, keeping their order.
+
+    Up to ``depth`` blocks are stored concurrently while the next ones are
+    read, so the memory used by an upload is bounded by
+    ``(depth + 1) * block_size``. With a ``depth`` of 0, each block is stored
+    before returning.
+    """
+
+    def __init__(self, backend, depth):
+        self.backend = backend
+        self.depth = depth
+        self.pending = deque()
+        self.hashmap = []
+
+    def put_block(self, data):
+        if self.depth <= 0:
+            self.hashmap.append(self.backend.put_block(data))
+            return
+        if len(self.pending) >= self.depth:
+            self.hashmap.append(self.pending.popleft().result())
+        self.pending.append(BackgroundCall(self.backend.put_block, data))
+
+    def get_hashmap(self):
+        """Wait for the pending blocks and return the hashes of all."""
+        while self.pending:
+            self.hashmap.append(self.pending.popleft().result())
+        return self.hashmap
+
+
 class ObjectWrapper(object):
     """Return the object's data block-per-block in each iteration.
 
     Read from the object using the offset and length provided
-    in each entry of the range list.
+    in each entry of the range list. If ``prefetch`` is positive, up to that
+    many of the following blocks of the ranges are read ahead concurrently.
+
+    Whole blocks are returned as they come from the backend, without
+    copying. Smaller pieces, like the parts of a multiple range response,
+    are merged into writes of up to a block each.
     """
 
-    def __init__(self, backend, ranges, sizes, hashmaps, boundary, meta):
+    def __init__(self, backend, ranges, sizes, hashmaps, boundary, meta,
+                 prefetch=0):
         self.backend = backend
         self.ranges = ranges
         self.sizes = sizes
@@ -830,6 +1156,51 @@ class ObjectWrapper(object):
         self.range_index = -1
         self.offset, self.length = self.ranges[0]
 
+        self.write_size = backend.block_size
+        self.pending = None
+
+        self.prefetcher = None
+        if prefetch > 0:
+            self.prefetcher = BlockPrefetcher(backend, self.block_hashes(),
+                                              prefetch)
+
+    def block_hashes(self):
+        """Yield the hashes of the blocks to be read, in order.
+
+        Follows the traversal of part_iterator, which reads a block only
+        when it differs from the previous one.
+        """
+        bs = self.backend.block_size
+        last = -1
+        for offset, length in self.ranges:
+            file_index = 0
+            while length > 0:
+                file_size = self.sizes[file_index]
+                while offset >= file_size:
+                    offset -= file_size
+                    file_index += 1
+                    file_size = self.sizes[file_index]
+                hashmap = self.hashmaps[file_index]
+                block_index = int(offset / bs)
+                if hashmap[block_index] != last:
+                    last = hashmap[block_index]
+                    yield last
+                bl = bs
+                if block_index == len(hashmap) - 1 and file_size % bs:
+                    bl = file_size % bs
+                bl = min(length, bl - offset % bs)
+                offset += bl
+                length -= bl
+
+    def get_block(self, hash):
+        if self.prefetcher is not None:
+            return self.prefetcher.get_block(hash)
+        return self.backend.get_block(hash)
+
+    def close(self):
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+
     def __iter__(self):
         return self
 
@@ -849,7 +1220,7 @@ class ObjectWrapper(object):
                 self.block_hash = self.hashmaps[
                     self.file_index][self.block_index]
                 try:
-                    self.block = self.backend.get_block(self.block_hash)
+                    self.block = self.get_block(self.block_hash)
                 except ItemNotExists:
                     raise faults.ItemNotFound('Block does not exist')
 
@@ -868,6 +1239,28 @@ class ObjectWrapper(object):
             raise StopIteration
 
     def next(self):
+        if self.pending is not None:
+            chunk, self.pending = self.pending, None
+        else:
+            chunk = self.next_chunk()
+        chunks = [chunk]
+        length = len(chunk)
+        while length < self.write_size:
+            try:
+                chunk = self.next_chunk()
+            except StopIteration:
+                break
+            if length + len(chunk) > self.write_size:
+                # Keep it for the next write, instead of copying it.
+                self.pending = chunk
+                break
+            chunks.append(chunk)
+            length += len(chunk)
+        if len(chunks) == 1:
+            return chunks[0]
+        return ''.join(chunks)
+
+    def next_chunk(self):
         if len(self.ranges) == 1:
             return self.part_iterator()
         if self.range_index == len(self.ranges):
@@ -936,7 +1329,7 @@ def object_data_response(request, sizes, hashmaps, meta, public=False):
     else:
         boundary = ''
     wrapper = ObjectWrapper(request.backend, ranges, sizes, hashmaps,
-                            boundary, meta)
+                            boundary, meta, prefetch=settings.PREFETCH_BLOCKS)
     response = HttpResponse(wrapper, status=ret)
     put_object_headers(
         response, meta, restricted=public,
@@ -997,6 +1390,32 @@ def simple_list_response(request, l):
         return json.dumps(l)
 
 
+def listing_iterator(request, name, items, **context):
+    """Serialize the dictionaries of a listing one at a time.
+
+    In XML, the template of the listing (e.g. 'objects.xml') is rendered
+    without items for the enclosing element and the template of an item
+    (e.g. 'object.xml') for each item in between.
+    """
+
+    if request.serialization == 'xml':
+        context[name + 's'] = []
+        data = render_to_string(name + 's.xml', context)
+        idx = data.rfind('</')
+        yield data[:idx]
+        t = get_template(name + '.xml')
+        for item in items:
+            yield t.render(Context({name: item}))
+        yield data[idx:]
+    elif request.serialization == 'json':
+        yield '['
+        sep = ''
+        for item in items:
+            yield sep + json.dumps(item, default=json_encode_decimal)
+            sep = ', '
+        yield ']'
+
+
 from pithos.backends.util import PithosBackendPool
 
 if RADOS_STORAGE:
@@ -1005,6 +1424,11 @@ if RADOS_STORAGE:
 else:
     BLOCK_PARAMS = {'mappool': None,
                     'blockpool': None, }
+BLOCK_PARAMS.update({
+    'path': BACKEND_BLOCK_PATH,
+    'umask': BACKEND_BLOCK_UMASK,
+    'archipelago_batch_size': BACKEND_ARCHIPELAGO_BATCH_SIZE,
+    'archipelago_write_depth': BACKEND_ARCHIPELAGO_WRITE_DEPTH})
 
 BACKEND_KWARGS = dict(
     db_module=BACKEND_DB_MODULE,
@@ -1028,7 +1452,14 @@ BACKEND_KWARGS = dict(
     mapfile_prefix=BACKEND_MAPFILE_PREFIX,
     resource_max_metadata=RESOURCE_MAX_METADATA,
     acc_max_groups=ACC_MAX_GROUPS,
-    acc_max_group_members=ACC_MAX_GROUP_MEMBERS)
+    acc_max_group_members=ACC_MAX_GROUP_MEMBERS,
+    block_cache_size=BACKEND_BLOCK_CACHE_SIZE,
+    db_pool_params={'pool_size': BACKEND_DB_POOL_SIZE,
+                    'max_overflow': BACKEND_DB_POOL_MAX_OVERFLOW,
+                    'pool_pre_ping': BACKEND_DB_POOL_PRE_PING,
+                    'pool_recycle': BACKEND_DB_POOL_RECYCLE},
+    aggregate_commissions=BACKEND_AGGREGATE_COMMISSIONS,
+    delete_chunk_size=BACKEND_DELETE_CHUNK_SIZE)
 
 _pithos_backend_pool = PithosBackendPool(size=BACKEND_POOL_SIZE,
                                          **BACKEND_KWARGS)
@@ -1122,8 +1553,12 @@ def api_method(http_method=None, token_required=True, user_required=True,
             finally:
                 # Always close PithosBackend connection
                 if getattr(request, "backend", None) is not None:
-                    request.backend.post_exec(success_status)
-                    request.backend.close()
+                    try:
+                        # Aggregated commissions are issued here and may
+                        # fail, e.g. with QuotaLimit.
+                        request.backend.post_exec(success_status)
+                    finally:
+                        request.backend.close()
         return wrapper
     return decorator
 
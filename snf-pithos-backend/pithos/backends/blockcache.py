@@ -0,0 +1,98 @@
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import OrderedDict
+from threading import Lock
+
+
+class BlockCache(object):
+    """A size-bounded LRU cache of blocks, keyed by block hash.
+
+    Blocks are content-addressed, so a cached block never becomes stale and
+    entries are only ever dropped to respect the size limit.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._blocks = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """Return the cached block or None."""
+        with self._lock:
+            block = self._blocks.pop(key, None)
+            if block is None:
+                self.misses += 1
+                return None
+            self._blocks[key] = block  # most recently used
+            self.hits += 1
+            return block
+
+    def put(self, key, block):
+        length = len(block)
+        if length > self.size:
+            return
+        with self._lock:
+            old = self._blocks.pop(key, None)
+            if old is not None:
+                self.used -= len(old)
+            while self.used + length > self.size:
+                _, evicted = self._blocks.popitem(last=False)
+                self.used -= len(evicted)
+                self.evictions += 1
+            self._blocks[key] = block
+            self.used += length
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+            self.used = 0
+
+    def __contains__(self, key):
+        return key in self._blocks
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def stats(self):
+        """Return a dictionary with the cache counters."""
+        return {'size': self.size,
+                'used': self.used,
+                'blocks': len(self._blocks),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
+
+
+_caches = {}
+_caches_lock = Lock()
+
+
+def get_block_cache(size, block_size, hash_algorithm):
+    """Return the cache of this process for the given parameters.
+
+    Backend instances created with the same parameters, e.g. the ones of a
+    backend pool, share the same cache.
+    """
+    key = (size, block_size, hash_algorithm)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = BlockCache(size)
+        return cache
@@ -0,0 +1,153 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from hashlib import new as newhasher
+from binascii import hexlify
+
+from util import read_file, write_file
+
+
+class FileBlocker(object):
+    """Blocker storing each block in a file named after its hash.
+       Block files are sharded in directories by the first two bytes of
+       their hash.
+       Required constructor parameters: blocksize, blockpath, hashtype.
+       Optional umask.
+    """
+
+    blocksize = None
+    blockpath = None
+    hashtype = None
+
+    def __init__(self, **params):
+        blocksize = params['blocksize']
+        blockpath = params['blockpath']
+        hashtype = params['hashtype']
+        try:
+            hasher = newhasher(hashtype)
+        except ValueError:
+            msg = "Variable hashtype '%s' is not available from hashlib"
+            raise ValueError(msg % (hashtype,))
+
+        hasher.update("")
+        emptyhash = hasher.digest()
+
+        self.blocksize = blocksize
+        self.blockpath = blockpath
+        self.umask = params.get('umask', 0o022)
+        self.hashtype = hashtype
+        self.hashlen = len(emptyhash)
+        self.emptyhash = emptyhash
+
+    def _pad(self, block):
+        return block + ('\x00' * (self.blocksize - len(block)))
+
+    def _get_path(self, blkhash):
+        name = hexlify(blkhash)
+        return os.path.join(self.blockpath, name[0:2], name[2:4], name)
+
+    def _check_rear_block(self, blkhash):
+        return os.path.exists(self._get_path(blkhash))
+
+    def block_hash(self, data):
+        """Hash a block of data"""
+        hasher = newhasher(self.hashtype)
+        hasher.update(data.rstrip('\x00'))
+        return hasher.digest()
+
+    def block_ping(self, hashes):
+        """Check hashes for existence and
+           return those missing from block storage.
+        """
+        notfound = []
+        append = notfound.append
+        seen = set()
+        unique = []
+        for h in hashes:
+            if h not in seen:
+                seen.add(h)
+                unique.append(h)
+
+        for h, exists in zip(unique, self.block_exists(unique)):
+            if not exists:
+                append(h)
+
+        return notfound
+
+    def block_exists(self, hashes):
+        """Check hashes for existence and return a list of booleans."""
+        return [self._check_rear_block(h) for h in hashes]
+
+    def block_retr(self, hashes):
+        """Retrieve blocks from storage by their hashes."""
+        blocks = []
+        append = blocks.append
+
+        for h in hashes:
+            if h == self.emptyhash:
+                append(self._pad(''))
+                continue
+            block = read_file(self._get_path(h))
+            if not block:
+                break
+            append(self._pad(block))
+
+        return blocks
+
+    def block_stor(self, blocklist):
+        """Store a bunch of blocks and return (hashes, missing).
+           Hashes is a list of the hashes of the blocks,
+           missing is a list of indices in that list indicating
+           which blocks were missing from the store.
+        """
+        block_hash = self.block_hash
+        hashlist = [block_hash(b) for b in blocklist]
+        missing = []
+        written = set()
+        for i, h in enumerate(hashlist):
+            if h in written:
+                missing.append(i)
+            elif not self._check_rear_block(h):
+                missing.append(i)
+                write_file(self._get_path(h), blocklist[i], self.umask)
+                written.add(h)
+
+        return hashlist, missing
+
+    def block_delta(self, blkhash, offset, data):
+        """Construct and store a new block from a given block
+           and a data 'patch' applied at offset. Return:
+           (the hash of the new block, if the block already existed)
+        """
+
+        blocksize = self.blocksize
+        if offset >= blocksize or not data:
+            return None, None
+
+        block = self.block_retr((blkhash,))
+        if not block:
+            return None, None
+
+        block = block[0]
+        newblock = block[:offset] + data
+        if len(newblock) > blocksize:
+            newblock = newblock[:blocksize]
+        elif len(newblock) < blocksize:
+            newblock += block[len(newblock):]
+
+        h, a = self.block_stor((newblock,))
+        return h[0], 1 if a else 0
@@ -0,0 +1,60 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from binascii import hexlify, unhexlify
+from hashlib import md5
+from urllib import quote
+
+from util import read_file, write_file
+
+
+class FileMapper(object):
+    """Mapper storing each map in a file of packed binary hashes.
+       Map files are sharded in directories by a digest of their name.
+       Required constructor parameters: mappath, namelen.
+       Optional umask.
+    """
+
+    mappath = None
+    namelen = None
+
+    def __init__(self, **params):
+        self.params = params
+        self.mappath = params['mappath']
+        self.namelen = params['namelen']
+        self.umask = params.get('umask', 0o022)
+
+    def _get_path(self, maphash):
+        shard = md5(maphash).hexdigest()[:2]
+        return os.path.join(self.mappath, shard, quote(maphash, safe=''))
+
+    def map_retr(self, maphash, size):
+        """Return as a list, part of the hashes map of an object
+           at the given block offset.
+           By default, return the whole hashes map.
+        """
+        data = read_file(self._get_path(maphash))
+        if data is None:
+            raise IOError("Could not retrieve mapfile %s" % maphash)
+        namelen = self.namelen
+        return [hexlify(data[i:i + namelen])
+                for i in xrange(0, len(data), namelen)]
+
+    def map_stor(self, maphash, hashes, size, blocksize):
+        """Store hashes in the given hashes map."""
+        data = ''.join(unhexlify(h) for h in hashes)
+        write_file(self._get_path(maphash), data, self.umask)
@@ -0,0 +1,78 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from binascii import unhexlify
+
+from fileblocker import FileBlocker
+from filemapper import FileMapper
+
+
+class Store(object):
+    """Store keeping blocks and maps in the local filesystem.
+       Required constructor parameters: path, block_size, hash_algorithm.
+       Optional umask.
+    """
+
+    def __init__(self, **params):
+        path = params['path']
+        umask = params.get('umask')
+        if umask is None:
+            umask = 0o022
+        pb = {'blocksize': params['block_size'],
+              'hashtype': params['hash_algorithm'],
+              'blockpath': os.path.join(path, 'blocks'),
+              'umask': umask,
+              }
+        self.blocker = FileBlocker(**pb)
+        pm = {'namelen': self.blocker.hashlen,
+              'mappath': os.path.join(path, 'maps'),
+              'umask': umask,
+              }
+        self.mapper = FileMapper(**pm)
+
+    def map_get(self, name, size):
+        return self.mapper.map_retr(name, size)
+
+    def map_put(self, name, map, size, block_size):
+        self.mapper.map_stor(name, map, size, block_size)
+
+    def map_delete(self, name):
+        pass
+
+    def block_get(self, hash):
+        blocks = self.blocker.block_retr((hash,))
+        if not blocks:
+            return None
+        return blocks[0]
+
+    def block_get_archipelago(self, hash):
+        # Blocks are requested by their hexlified hash, as in Archipelago.
+        return self.block_get(unhexlify(hash))
+
+    def block_put(self, data):
+        hashes, absent = self.blocker.block_stor((data,))
+        return hashes[0]
+
+    def block_update(self, hash, offset, data):
+        h, e = self.blocker.block_delta(hash, offset, data)
+        return h
+
+    def block_search(self, map):
+        return self.blocker.block_ping(map)
+
+    def block_exists(self, hashes):
+        return self.blocker.block_exists(hashes)
@@ -0,0 +1,87 @@
+# Copyright (C) 2010-2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import errno
+import mmap
+import tempfile
+
+
+def ensure_dir(path):
+    """Create the directory path, if it does not exist."""
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_file(path, data, umask=0o022):
+    """Atomically write data to the file path.
+
+       Data is written to a temporary file in the same directory, which is
+       synced and then renamed over path. Readers either see the whole
+       file or no file at all.
+    """
+    dirname = os.path.dirname(path)
+    ensure_dir(dirname)
+    fd, tmppath = tempfile.mkstemp(prefix='.tmp-', dir=dirname)
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                n = os.write(fd, view)
+                view = view[n:]
+            os.fchmod(fd, 0o666 & ~umask)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.rename(tmppath, path)
+    except:
+        try:
+            os.unlink(tmppath)
+        except OSError:
+            pass
+        raise
+    fsync_dir(dirname)
+
+
+def read_file(path):
+    """Return the contents of the file path, or None if it does not exist."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return None
+        raise
+    try:
+        size = os.fstat(fd).st_size
+        if size == 0:
+            return ''
+        m = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+        try:
+            return m[:]
+        finally:
+            m.close()
+    finally:
+        os.close(fd)
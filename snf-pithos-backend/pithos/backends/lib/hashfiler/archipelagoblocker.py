@@ -15,6 +15,7 @@
 
 from hashlib import new as newhasher
 from binascii import hexlify
+from collections import deque
 import ConfigParser
 
 from context_archipelago import ArchipelagoObject, file_sync_read_chunks
@@ -31,15 +32,23 @@ from pithos.workers import (
 
 monkey.patch_Request()
 
+# Number of info requests allowed to be in flight at the same time.
+DEFAULT_BATCH_SIZE = 32
+# Number of write requests allowed to be in flight at the same time.
+DEFAULT_WRITE_DEPTH = 8
+
 
 class ArchipelagoBlocker(object):
     """Blocker.
        Required constructor parameters: blocksize, hashtype.
+       Optional batch_size, write_depth.
     """
 
     blocksize = None
     blockpool = None
     hashtype = None
+    batch_size = DEFAULT_BATCH_SIZE
+    write_depth = DEFAULT_WRITE_DEPTH
 
     def __init__(self, **params):
         cfg = ConfigParser.ConfigParser()
@@ -61,6 +70,13 @@ class ArchipelagoBlocker(object):
         self.hashtype = hashtype
         self.hashlen = len(emptyhash)
         self.emptyhash = emptyhash
+        batch_size = params.get('batch_size') or DEFAULT_BATCH_SIZE
+        write_depth = params.get('write_depth') or DEFAULT_WRITE_DEPTH
+        if batch_size < 1 or write_depth < 1:
+            raise ValueError("Variables batch_size and write_depth "
+                             "must be positive")
+        self.batch_size = batch_size
+        self.write_depth = write_depth
 
     def _pad(self, block):
         return block + ('\x00' * (self.blocksize - len(block)))
@@ -70,18 +86,97 @@ class ArchipelagoBlocker(object):
         return ArchipelagoObject(name, self.ioctx_pool, self.dst_port, create)
 
     def _check_rear_block(self, blkhash):
-        filename = hexlify(blkhash)
+        return self.block_exists((blkhash,))[0]
+
+    def _submit(self, req):
+        try:
+            req.submit()
+        except:
+            req.put()
+            raise
+        return req
+
+    def _drain(self, reqs):
+        """Wait for and release submitted requests that will not be checked,
+           e.g. after an error.
+        """
+        while reqs:
+            req = reqs.popleft()
+            try:
+                req.wait()
+            finally:
+                req.put()
+
+    def block_exists(self, hashes):
+        """Check a list of hashes for existence.
+           Up to batch_size info requests are kept in flight; when the
+           pipeline is full, the oldest request is waited before submitting
+           the next one. Return a list of booleans, in the order of the
+           hashes given.
+        """
+        batch_size = self.batch_size
+        existing = []
+        append = existing.append
+        inflight = deque()
         ioctx = self.ioctx_pool.pool_get()
-        req = Request.get_info_request(ioctx, self.dst_port, filename)
-        req.submit()
-        req.wait()
-        ret = req.success()
-        req.put()
-        self.ioctx_pool.pool_put(ioctx)
-        if ret:
-            return True
-        else:
-            return False
+
+        def complete():
+            req = inflight[0]
+            try:
+                req.wait()
+                append(bool(req.success()))
+            finally:
+                inflight.popleft()
+                req.put()
+
+        try:
+            for h in hashes:
+                if len(inflight) >= batch_size:
+                    complete()
+                req = Request.get_info_request(ioctx, self.dst_port,
+                                               hexlify(h))
+                inflight.append(self._submit(req))
+            while inflight:
+                complete()
+        finally:
+            self._drain(inflight)
+            self.ioctx_pool.pool_put(ioctx)
+        return existing
+
+    def _write_rear_blocks(self, blocks):
+        """Write (hash, data) pairs to storage.
+           Up to write_depth write requests are kept in flight; when the
+           pipeline is full, the oldest request is waited before submitting
+           the next one.
+        """
+        write_depth = self.write_depth
+        inflight = deque()
+        ioctx = self.ioctx_pool.pool_get()
+
+        def complete():
+            req = inflight[0]
+            try:
+                req.wait()
+                ret = req.success()
+            finally:
+                inflight.popleft()
+                req.put()
+            if not ret:
+                raise IOError("archipelago: Write request error")
+
+        try:
+            for h, data in blocks:
+                if len(inflight) >= write_depth:
+                    complete()
+                req = Request.get_write_request(ioctx, self.dst_port,
+                                                hexlify(h), data=data,
+                                                offset=0, datalen=len(data))
+                inflight.append(self._submit(req))
+            while inflight:
+                complete()
+        finally:
+            self._drain(inflight)
+            self.ioctx_pool.pool_put(ioctx)
 
     def block_hash(self, data):
         """Hash a block of data"""
@@ -95,9 +190,15 @@ class ArchipelagoBlocker(object):
         """
         notfound = []
         append = notfound.append
-
+        seen = set()
+        unique = []
         for h in hashes:
-            if h not in notfound and not self._check_rear_block(h):
+            if h not in seen:
+                seen.add(h)
+                unique.append(h)
+
+        for h, exists in zip(unique, self.block_exists(unique)):
+            if not exists:
                 append(h)
 
         return notfound
@@ -171,11 +272,17 @@ class ArchipelagoBlocker(object):
         """
         block_hash = self.block_hash
         hashlist = [block_hash(b) for b in blocklist]
-        missing = [i for i, h in enumerate(hashlist) if not
-                   self._check_rear_block(h)]
+        existing = self.block_exists(hashlist)
+        missing = [i for i, e in enumerate(existing) if not e]
+        # Identical blocks in the same list need to be written only once.
+        written = set()
+        blocks = []
         for i in missing:
-            with self._get_rear_block(hashlist[i], 1) as rbl:
-                rbl.sync_write(blocklist[i])  # XXX: verify?
+            h = hashlist[i]
+            if h not in written:
+                written.add(h)
+                blocks.append((h, blocklist[i]))
+        self._write_rear_blocks(blocks)  # XXX: verify?
 
         return hashlist, missing
 
@@ -38,6 +38,10 @@ class Blocker(object):
         """
         return self.archip_blocker.block_ping(hashes)
 
+    def block_exists(self, hashes):
+        """Check hashes for existence and return a list of booleans."""
+        return self.archip_blocker.block_exists(hashes)
+
     def block_retr(self, hashes):
         """Retrieve blocks from storage by their hashes."""
         return self.archip_blocker.block_retr(hashes)
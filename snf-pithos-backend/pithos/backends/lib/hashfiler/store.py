@@ -13,7 +13,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import os
+from archipelago.common import Segment, Xseg_ctx
+from objpool import ObjectPool
+
+from pithos.workers import glue
 
 from blocker import Blocker
 from mapper import Mapper
@@ -23,12 +26,20 @@ class Store(object):
     """Store.
        Required constructor parameters: path, block_size, hash_algorithm,
        blockpool, mappool.
+       Optional xseg_pool_size, archipelago_batch_size,
+       archipelago_write_depth.
     """
 
     def __init__(self, **params):
+        glue.WorkerGlue.setupXsegPool(ObjectPool, Segment, Xseg_ctx,
+                                      cfile=params['archipelago_cfile'],
+                                      pool_size=params.get('xseg_pool_size',
+                                                           8))
         pb = {'blocksize': params['block_size'],
               'hashtype': params['hash_algorithm'],
               'archipelago_cfile': params['archipelago_cfile'],
+              'batch_size': params.get('archipelago_batch_size'),
+              'write_depth': params.get('archipelago_write_depth'),
               }
         self.blocker = Blocker(**pb)
         pm = {'namelen': self.blocker.hashlen,
@@ -67,3 +78,6 @@ class Store(object):
 
     def block_search(self, map):
         return self.blocker.block_ping(map)
+
+    def block_exists(self, hashes):
+        return self.blocker.block_exists(hashes)
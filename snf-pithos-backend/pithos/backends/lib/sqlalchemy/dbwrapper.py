@@ -13,34 +13,177 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from threading import Lock
+from time import time
+
 from sqlalchemy import create_engine
-from sqlalchemy.pool import NullPool
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import DisconnectionError
+from sqlalchemy.pool import NullPool, QueuePool
 from sqlalchemy.interfaces import PoolListener
 
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Log the statistics of a pool every that many checkouts.
+STATS_LOG_INTERVAL = 1000
+
+
+class ForeignKeysListener(PoolListener):
+    def connect(self, dbapi_con, con_record):
+        dbapi_con.execute('pragma foreign_keys=ON;')
+        dbapi_con.execute('pragma case_sensitive_like=ON;')
+
+
+class PoolStats(PoolListener):
+    """Keep statistics of the connections of an engine.
+
+    If pre_ping is set, connections are also tested as they are checked out
+    of the pool and dead ones are replaced. Only pooled connections are
+    tested, since the rest are new on every checkout.
+    """
+
+    def __init__(self, name, pre_ping=False):
+        self.name = name
+        self.pre_ping = pre_ping
+        self.pool = None
+        self.max_overflow = 0
+        self.connects = 0
+        self.checkouts = 0
+        self.disconnects = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.age_total = 0.0
+        self.max_age = 0.0
+
+    def connect(self, dbapi_con, con_record):
+        self.connects += 1
+        con_record.info['created'] = time()
+
+    def checkout(self, dbapi_con, con_record, con_proxy):
+        if self.pre_ping:
+            try:
+                cursor = dbapi_con.cursor()
+                cursor.execute('SELECT 1')
+                cursor.close()
+            except Exception:
+                self.disconnects += 1
+                raise DisconnectionError()
+        self.checkouts += 1
+        age = time() - con_record.info.get('created', time())
+        self.age_total += age
+        self.max_age = max(self.max_age, age)
+        if self.checkouts % STATS_LOG_INTERVAL == 0:
+            logger.info("Pool statistics of %s: %s", self.name, self.stats())
+
+    def exhausted(self):
+        """Return True if a checkout would have to wait for a connection."""
+        pool = self.pool
+        if not isinstance(pool, QueuePool):
+            return False
+        return (pool.checkedin() == 0 and
+                pool.checkedout() >= pool.size() + self.max_overflow)
+
+    def waited(self, elapsed, exhausted):
+        if exhausted:
+            self.waits += 1
+        self.wait_time += elapsed
+        self.max_wait_time = max(self.max_wait_time, elapsed)
+
+    def stats(self):
+        """Return a dictionary with the pool statistics."""
+        s = {'connects': self.connects,
+             'checkouts': self.checkouts,
+             'disconnects': self.disconnects,
+             'waits': self.waits,
+             'checkout_time': self.wait_time,
+             'max_checkout_time': self.max_wait_time,
+             'max_connection_age': self.max_age,
+             'avg_connection_age': (self.age_total / self.checkouts
+                                    if self.checkouts else 0.0)}
+        if isinstance(self.pool, QueuePool):
+            s.update({'size': self.pool.size(),
+                      'max_overflow': self.max_overflow,
+                      'checkedin': self.pool.checkedin(),
+                      'checkedout': self.pool.checkedout(),
+                      'overflow': self.pool.overflow()})
+        return s
+
+
+_engines = {}
+_engines_lock = Lock()
+
+
+def get_engine(db, pool_size=0, max_overflow=10, pool_pre_ping=False,
+               pool_recycle=-1):
+    """Return the engine of this process for the given parameters.
+
+    With a pool_size of 0, a new connection is opened for every wrapper.
+    Otherwise, connections are kept in a pool of pool_size connections,
+    plus up to max_overflow ones when needed. Engines are shared by all the
+    wrappers created with the same parameters, e.g. by a backend pool.
+    """
+    key = (db, pool_size, max_overflow, pool_pre_ping, pool_recycle)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _engines[key] = _create_engine(*key)
+        return engine
+
+
+def _create_engine(db, pool_size, max_overflow, pool_pre_ping, pool_recycle):
+    url = make_url(db)
+    if url.password:
+        url.password = '***'
+    stats = PoolStats(str(url))
+    if db.startswith('sqlite://'):
+        engine = create_engine(
+            db, connect_args={'check_same_thread': False},
+            poolclass=NullPool, listeners=[ForeignKeysListener(), stats],
+            isolation_level='SERIALIZABLE')
+    #elif db.startswith('mysql://'):
+    #    db = '%s?charset=utf8&use_unicode=0' %db
+    #    engine = create_engine(db, convert_unicode=True)
+    elif pool_size > 0:
+        engine = create_engine(
+            db, poolclass=QueuePool, pool_size=pool_size,
+            max_overflow=max_overflow, pool_recycle=pool_recycle,
+            listeners=[stats], isolation_level='READ COMMITTED')
+    else:
+        engine = create_engine(
+            db, poolclass=NullPool, listeners=[stats],
+            isolation_level='READ COMMITTED')
+    engine.echo = False
+    engine.echo_pool = False
+    stats.pool = engine.pool
+    stats.pre_ping = pool_pre_ping and isinstance(engine.pool, QueuePool)
+    stats.max_overflow = max_overflow
+    engine.pool_stats = stats
+    return engine
+
+
+def pool_stats():
+    """Return the pool statistics of the engines of this process."""
+    with _engines_lock:
+        engines = _engines.values()
+    return dict((e.pool_stats.name, e.pool_stats.stats()) for e in engines)
+
 
 class DBWrapper(object):
-    """Database connection wrapper."""
-
-    def __init__(self, db):
-        if db.startswith('sqlite://'):
-            class ForeignKeysListener(PoolListener):
-                def connect(self, dbapi_con, con_record):
-                    dbapi_con.execute('pragma foreign_keys=ON;')
-                    dbapi_con.execute('pragma case_sensitive_like=ON;')
-            self.engine = create_engine(
-                db, connect_args={'check_same_thread': False},
-                poolclass=NullPool, listeners=[ForeignKeysListener()],
-                isolation_level='SERIALIZABLE')
-        #elif db.startswith('mysql://'):
-        #    db = '%s?charset=utf8&use_unicode=0' %db
-        #    self.engine = create_engine(db, convert_unicode=True)
-        else:
-            #self.engine = create_engine(db, pool_size=0, max_overflow=-1)
-            self.engine = create_engine(
-                db, poolclass=NullPool, isolation_level='READ COMMITTED')
-        self.engine.echo = False
-        self.engine.echo_pool = False
+    """Database connection wrapper.
+
+    The optional pool parameters are passed to get_engine().
+    """
+
+    def __init__(self, db, **pool_params):
+        self.engine = get_engine(db, **pool_params)
+        stats = self.engine.pool_stats
+        exhausted = stats.exhausted()
+        start = time()
         self.conn = self.engine.connect()
+        stats.waited(time() - start, exhausted)
         self.trans = None
 
     def close(self):
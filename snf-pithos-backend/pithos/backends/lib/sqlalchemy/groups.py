@@ -48,6 +48,7 @@ class Groups(DBWorker):
         except NoSuchTableError:
             tables = create_tables(self.engine)
             map(lambda t: self.__setattr__(t.name, t), tables)
+        self.parents = {}
 
     def group_names(self, owner):
         """List all group names belonging to owner."""
@@ -74,6 +75,7 @@ class Groups(DBWorker):
     def group_add(self, owner, group, member):
         """Add a member to a group."""
 
+        self.parents.clear()
         s = self.groups.select()
         s = s.where(self.groups.c.owner == owner)
         s = s.where(self.groups.c.name == group)
@@ -91,6 +93,7 @@ class Groups(DBWorker):
            Receive groups as a mapping object.
         """
 
+        self.parents.clear()
         values = list({'owner': owner,
                        'name': k,
                        'member': m}
@@ -103,6 +106,7 @@ class Groups(DBWorker):
     def group_remove(self, owner, group, member):
         """Remove a member from a group."""
 
+        self.parents.clear()
         s = self.groups.delete().where(and_(self.groups.c.owner == owner,
                                             self.groups.c.name == group,
                                             self.groups.c.member == member))
@@ -112,6 +116,7 @@ class Groups(DBWorker):
     def group_delete(self, owner, group):
         """Delete a group."""
 
+        self.parents.clear()
         s = self.groups.delete().where(and_(self.groups.c.owner == owner,
                                             self.groups.c.name == group))
         r = self.conn.execute(s)
@@ -120,6 +125,7 @@ class Groups(DBWorker):
     def group_destroy(self, owner):
         """Delete all groups belonging to owner."""
 
+        self.parents.clear()
         s = self.groups.delete().where(self.groups.c.owner == owner)
         r = self.conn.execute(s)
         r.close()
@@ -147,11 +153,22 @@ class Groups(DBWorker):
         return bool(l)
 
     def group_parents(self, member):
-        """Return all (owner, group) tuples that contain member."""
+        """Return all (owner, group) tuples that contain member.
 
-        s = select([self.groups.c.owner, self.groups.c.name],
-                   self.groups.c.member == member)
-        r = self.conn.execute(s)
-        l = r.fetchall()
-        r.close()
-        return l
+        Results are kept until group_parents_reset() is called or the
+        groups are modified.
+        """
+
+        if member not in self.parents:
+            s = select([self.groups.c.owner, self.groups.c.name],
+                       self.groups.c.member == member)
+            r = self.conn.execute(s)
+            self.parents[member] = r.fetchall()
+            r.close()
+        return self.parents[member]
+
+    def group_parents_reset(self):
+        """Forget the results of group_parents(), e.g. in a new transaction.
+        """
+
+        self.parents.clear()
@@ -13,6 +13,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import sys
+
 from time import time
 from operator import itemgetter
 from itertools import groupby
@@ -23,12 +25,13 @@ from sqlalchemy import (Table, Integer, BigInteger, DECIMAL, Boolean,
 from sqlalchemy.schema import Index, Sequence
 from sqlalchemy.sql import (func, and_, or_, not_, select, bindparam, exists,
                             functions)
-from sqlalchemy.sql.expression import true, literal, type_coerce
+from sqlalchemy.sql.expression import true, literal, type_coerce, case, text
 from sqlalchemy.exc import NoSuchTableError, IntegrityError
 
 from dbworker import DBWorker, ESCAPE_CHAR
 
-from pithos.backends.modular import MAP_AVAILABLE
+from pithos.backends.modular import (MAP_AVAILABLE, CLUSTER_NORMAL,
+                                      CLUSTER_HISTORY, CLUSTER_DELETED)
 from pithos.backends.filter import parse_filters
 
 DEFAULT_DISKSPACE_RESOURCE = 'pithos.diskspace'
@@ -228,6 +231,11 @@ class Node(DBWorker):
             tables = create_tables(self.engine)
             map(lambda t: self.__setattr__(t.name, t), tables)
 
+        # INSERT ... ON CONFLICT is available since PostgreSQL 9.5.
+        dialect = self.conn.dialect
+        self.native_upsert = (dialect.name == 'postgresql' and
+                              dialect.server_version_info >= (9, 5))
+
         s = self.nodes.select().where(and_(self.nodes.c.node == ROOTNODE,
                                            self.nodes.c.parent == ROOTNODE))
         wrapper = self.wrapper
@@ -508,6 +516,169 @@ class Node(DBWorker):
         self.conn.execute(s).close()
         return True
 
+    def node_delete_bulk(self, parent, prefix='', start='', limit=1000,
+                         muser='', remove_history=False,
+                         update_statistics_ancestors_depth=None):
+        """Delete the current versions of up to limit children of parent,
+           whose path starts with prefix and is greater than start.
+
+           Each current version is moved to the history cluster (or removed,
+           if remove_history is True) and the node gets a new, empty version
+           in the deleted cluster. The statistics are updated once.
+           Return the (paths, hashes, size) of the deleted versions, ordered
+           by path. Deletion can be resumed by passing the last path as start.
+        """
+
+        if not start or start < prefix:
+            start = strprevling(prefix)
+        nextling = strnextling(prefix)
+        s = select([self.nodes.c.node, self.nodes.c.path,
+                    self.versions.c.serial, self.versions.c.hash,
+                    self.versions.c.size])
+        s = s.where(and_(self.nodes.c.parent == parent,
+                         self.nodes.c.path > start,
+                         self.nodes.c.path < nextling,
+                         self.versions.c.serial ==
+                         self.nodes.c.latest_version,
+                         self.versions.c.cluster == CLUSTER_NORMAL))
+        s = s.order_by(self.nodes.c.path).limit(limit)
+        r = self.conn.execute(s)
+        rows = r.fetchall()
+        r.close()
+        if not rows:
+            return [], [], 0
+        nodes = [row.node for row in rows]
+        serials = [row.serial for row in rows]
+        size = sum(row.size for row in rows)
+        count = len(rows)
+
+        # There is no INSERT ... SELECT construct in this SQLAlchemy version.
+        mtime = time()
+        params = dict(('s%d' % i, serial) for i, serial in enumerate(serials))
+        s = text('insert into versions (node, hash, size, type, source, '
+                 'mtime, muser, uuid, checksum, cluster, available, '
+                 'map_check_timestamp, mapfile, is_snapshot) '
+                 'select node, null, 0, \'\', serial, :mtime, :muser, uuid, '
+                 '\'\', :cluster, available, map_check_timestamp, null, '
+                 'is_snapshot from versions where serial in (%s) '
+                 'order by serial' % ', '.join(':s%d' % i
+                                               for i in xrange(count)))
+        self.conn.execute(s, mtime=mtime, muser=muser,
+                          cluster=CLUSTER_DELETED, **params).close()
+        if remove_history:
+            s = self.versions.delete()
+        else:
+            s = self.versions.update().values(cluster=CLUSTER_HISTORY)
+        s = s.where(self.versions.c.serial.in_(serials))
+        self.conn.execute(s).close()
+        latest = select([func.max(self.versions.c.serial)],
+                        self.versions.c.node == self.nodes.c.node)
+        s = self.nodes.update().where(self.nodes.c.node.in_(nodes))
+        s = s.values(latest_version=latest.as_scalar())
+        self.conn.execute(s).close()
+        s = self.attributes.update().where(self.attributes.c.node.in_(nodes))
+        s = s.values(is_latest=False)
+        self.conn.execute(s).close()
+
+        ancestors = self.node_get_ancestors(nodes[0],
+                                            update_statistics_ancestors_depth)
+        self._statistics_upsert(ancestors, -count, -size, mtime,
+                                CLUSTER_NORMAL)
+        if not remove_history:
+            self._statistics_upsert(ancestors, count, size, mtime,
+                                    CLUSTER_HISTORY)
+        self._statistics_upsert(ancestors, count, 0, mtime, CLUSTER_DELETED)
+        return [row.path for row in rows], [row.hash for row in rows], size
+
+    def version_copy_bulk(self, serials, parent, paths, muser, uuids=None,
+                          update_statistics_ancestors_depth=None):
+        """Create a new current version for each of the paths, children of
+           parent, copying the properties and attributes of the respective
+           version in serials. The nodes of the paths are created if needed
+           and must not have a current version. The statistics are updated
+           once.
+
+           If uuids is not None, the new versions get these uuids and new
+           mapfiles. Otherwise, they keep the uuids and mapfiles of the
+           source versions.
+           Return the (serial, mapfile) of the new versions, in order.
+        """
+
+        if not serials:
+            return []
+        s = select([self.nodes.c.path, self.nodes.c.node],
+                   self.nodes.c.path.in_(paths))
+        r = self.conn.execute(s)
+        nodes = dict(r.fetchall())
+        r.close()
+        missing = [path for path in paths if path not in nodes]
+        if missing:
+            self.conn.execute(self.nodes.insert(),
+                              [{'parent': parent, 'path': path}
+                               for path in missing]).close()
+            r = self.conn.execute(s)
+            nodes = dict(r.fetchall())
+            r.close()
+        nodes = [nodes[path] for path in paths]
+
+        # There is no INSERT ... SELECT construct in this SQLAlchemy version.
+        mtime = time()
+        if uuids is None:
+            uuid, mapfile = 'uuid', 'mapfile'
+            params = [{'node': node, 'source': serial}
+                      for node, serial in zip(nodes, serials)]
+        else:
+            uuid = ':uuid'
+            mapfile = ('cast(:prefix as varchar) || '
+                       'cast(nextval(\'mapfile_seq\') as varchar)')
+            params = [{'node': node, 'source': serial, 'uuid': u,
+                       'prefix': self.mapfile_prefix}
+                      for node, serial, u in zip(nodes, serials, uuids)]
+        for p in params:
+            p.update(mtime=mtime, muser=muser, cluster=CLUSTER_NORMAL)
+        s = text('insert into versions (node, hash, size, type, source, '
+                 'mtime, muser, uuid, checksum, cluster, available, '
+                 'map_check_timestamp, mapfile, is_snapshot) '
+                 'select :node, hash, size, type, serial, :mtime, :muser, '
+                 '%s, checksum, :cluster, available, map_check_timestamp, '
+                 'case when size = 0 then null else %s end, is_snapshot '
+                 'from versions where serial = :source' % (uuid, mapfile))
+        self.conn.execute(s, params).close()
+        latest = select([func.max(self.versions.c.serial)],
+                        self.versions.c.node == self.nodes.c.node)
+        s = self.nodes.update().where(self.nodes.c.node.in_(nodes))
+        s = s.values(latest_version=latest.as_scalar())
+        self.conn.execute(s).close()
+
+        s = self.attributes.update().where(self.attributes.c.node.in_(nodes))
+        s = s.values(is_latest=False)
+        self.conn.execute(s).close()
+        params = dict(('n%d' % i, node) for i, node in enumerate(nodes))
+        s = text('insert into attributes '
+                 '(serial, domain, key, value, node, is_latest) '
+                 'select v.serial, a.domain, a.key, a.value, v.node, true '
+                 'from nodes n, versions v, attributes a '
+                 'where n.node in (%s) '
+                 'and v.serial = n.latest_version '
+                 'and a.serial = v.source' % ', '.join(':n%d' % i for i in
+                                                        xrange(len(nodes))))
+        self.conn.execute(s, **params).close()
+
+        s = select([self.nodes.c.node, self.versions.c.serial,
+                    self.versions.c.mapfile, self.versions.c.size])
+        s = s.where(and_(self.nodes.c.node.in_(nodes),
+                         self.versions.c.serial ==
+                         self.nodes.c.latest_version))
+        r = self.conn.execute(s)
+        rows = dict((row[0], row[1:]) for row in r.fetchall())
+        r.close()
+        size = sum(row[2] for row in rows.itervalues())
+        ancestors = self.node_get_ancestors(nodes[0],
+                                            update_statistics_ancestors_depth)
+        self._statistics_upsert(ancestors, len(nodes), size, mtime,
+                                CLUSTER_NORMAL)
+        return [tuple(rows[node][:2]) for node in nodes]
+
     def node_accounts(self, accounts=()):
         s = select([self.nodes.c.path, self.nodes.c.node])
         s = s.where(and_(self.nodes.c.node != 0,
@@ -642,33 +813,7 @@ class Node(DBWorker):
            size of objects and mtime in the node's namespace.
            May be zero or positive or negative numbers.
         """
-        s = select([self.statistics.c.population, self.statistics.c.size],
-                   and_(self.statistics.c.node == node,
-                        self.statistics.c.cluster == cluster))
-        rp = self.conn.execute(s)
-        r = rp.fetchone()
-        rp.close()
-        if not r:
-            prepopulation, presize = (0, 0)
-        else:
-            prepopulation, presize = r
-        population += prepopulation
-        population = max(population, 0)
-        size += presize
-
-        #insert or replace
-        #TODO better upsert
-        u = self.statistics.update().where(and_(
-            self.statistics.c.node == node,
-            self.statistics.c.cluster == cluster))
-        u = u.values(population=population, size=size, mtime=mtime)
-        rp = self.conn.execute(u)
-        rp.close()
-        if rp.rowcount == 0:
-            ins = self.statistics.insert()
-            ins = ins.values(node=node, population=population, size=size,
-                             mtime=mtime, cluster=cluster)
-            self.conn.execute(ins).close()
+        self._statistics_upsert([node], population, size, mtime, cluster)
 
     def statistics_update_ancestors(self, node, population, size, mtime,
                                     cluster=0, recursion_depth=None):
@@ -678,20 +823,81 @@ class Node(DBWorker):
            Population is not recursive.
         """
 
-        i = 0
-        while True:
-            if node == ROOTNODE:
-                break
-            if recursion_depth is not None and recursion_depth <= i:
-                break
-            props = self.node_get_properties(node)
-            if props is None:
-                break
-            parent, path = props
-            self.statistics_update(parent, population, size, mtime, cluster)
-            node = parent
-            population = 0  # Population isn't recursive
-            i += 1
+        ancestors = self.node_get_ancestors(node, recursion_depth)
+        self._statistics_upsert(ancestors, population, size, mtime, cluster)
+
+    def node_get_ancestors(self, node, depth=None):
+        """Return the parent of the node, its parent and so on up to the
+           root, or up to ``depth`` ancestors (if not None).
+        """
+
+        if node == ROOTNODE or (depth is not None and depth <= 0):
+            return []
+        # The recursive query is wrapped in a subquery, so that pysqlite
+        # returns rows even when the result is empty.
+        s = text('select parent from ('
+                 'with recursive chain(node, parent, depth) as ('
+                 'select node, parent, 1 from nodes '
+                 'where node = :node and node != :root '
+                 'union all '
+                 'select n.node, n.parent, c.depth + 1 '
+                 'from nodes as n, chain as c '
+                 'where n.node = c.parent and c.parent != :root '
+                 'and c.depth < :depth) '
+                 'select parent, depth from chain) as ancestors '
+                 'order by depth')
+        r = self.conn.execute(s, node=node, root=ROOTNODE,
+                              depth=depth if depth is not None else sys.maxint)
+        l = r.fetchall()
+        r.close()
+        return [row[0] for row in l]
+
+    def _statistics_upsert(self, nodes, population, size, mtime, cluster):
+        """Add size to the statistics of all nodes and population to the
+           statistics of the first one, creating missing rows.
+        """
+
+        if not nodes:
+            return
+        if self.native_upsert:
+            values = ', '.join('(:n%d, %s, :size, :mtime, :cluster)' %
+                               (i, ':population0' if i == 0 else '0')
+                               for i in range(len(nodes)))
+            s = text('insert into statistics '
+                     '(node, population, size, mtime, cluster) '
+                     'values %s on conflict (node, cluster) do update set '
+                     'population = greatest(statistics.population + '
+                     'case when excluded.node = :n0 then :population '
+                     'else 0 end, 0), '
+                     'size = statistics.size + excluded.size, '
+                     'mtime = excluded.mtime' % values)
+            params = dict(('n%d' % i, n) for i, n in enumerate(nodes))
+            params.update({'population0': max(population, 0),
+                           'population': population, 'size': size,
+                           'mtime': mtime, 'cluster': cluster})
+            self.conn.execute(s, **params).close()
+            return
+
+        st = self.statistics
+        where = and_(st.c.node.in_(nodes), st.c.cluster == cluster)
+        values = {'size': st.c.size + size, 'mtime': mtime}
+        if population:
+            total = st.c.population + population
+            values['population'] = case(
+                [(st.c.node != nodes[0], st.c.population),
+                 (total > 0, total)], else_=0)
+        rp = self.conn.execute(st.update().where(where).values(**values))
+        rp.close()
+        if rp.rowcount == len(nodes):
+            return
+        r = self.conn.execute(select([st.c.node], where))
+        existing = set(row[0] for row in r.fetchall())
+        r.close()
+        missing = [{'node': n, 'size': size, 'mtime': mtime,
+                    'cluster': cluster,
+                    'population': max(population, 0) if n == nodes[0] else 0}
+                   for n in nodes if n not in existing]
+        self.conn.execute(st.insert(), missing).close()
 
     def statistics_latest(self, node, before=inf, except_cluster=0):
         """Return population, total size and last mtime
@@ -973,6 +1179,17 @@ class Node(DBWorker):
         s = s.values(**{key: value})
         self.conn.execute(s).close()
 
+    def version_put_property_bulk(self, serials, key, value, props=None):
+        """Set value for the property of the versions specified by key."""
+
+        props = props or self._props
+        if key not in props or not serials:
+            return
+        s = self.versions.update()
+        s = s.where(self.versions.c.serial.in_(serials))
+        s = s.values(**{key: value})
+        self.conn.execute(s).close()
+
     def version_recluster(self, serial, cluster,
                           update_statistics_ancestors_depth=None):
         """Move the version into another cluster."""
@@ -1170,7 +1387,8 @@ class Node(DBWorker):
     def latest_version_list(self, parent, prefix='', delimiter=None,
                             start='', limit=10000, before=inf,
                             except_cluster=0, pathq=[], domain=None,
-                            filterq=[], sizeq=None, all_props=False):
+                            filterq=[], sizeq=None, all_props=False,
+                            virtual=True):
         """Return a (list of (path, serial) tuples, list of common prefixes)
            for the current versions of the paths with the given parent,
            matching the following criteria.
@@ -1216,7 +1434,11 @@ class Node(DBWorker):
            If arguments are None, then the corresponding matching rule
            will always match.
 
-           Limit applies to the first list of tuples returned.
+           Limit applies to the first list of tuples returned or, if a
+           delimiter is given, to the number of distinct paths and common
+           prefixes returned. If virtual is False, the common prefixes are
+           not returned and do not count against the limit. Either way, a
+           single query is executed.
 
            If all_props is True, return all properties after path,
            not just serial.
@@ -1334,41 +1556,51 @@ class Node(DBWorker):
             rp.close()
             return r, ()
 
-        pfz = len(prefix)
-        dz = len(delimiter)
-        count = 0
-        prefixes = []
-        pappend = prefixes.append
-        matches = []
-        mappend = matches.append
-
+        # Roll up the paths to the first delimiter after the prefix and
+        # return the first limit distinct paths, each with its version, if
+        # any, and whether there are paths under it.
+        r = s.cte('r')
+        if self.conn.dialect.name == 'sqlite':
+            instr = func.instr
+        else:
+            instr = func.strpos
+        length = len(prefix) + len(delimiter) - 1
+        if not virtual:
+            # Only the paths that are not under a common prefix are returned
+            pos = instr(func.substr(r.c.path, len(prefix) + 1), delimiter)
+            s = select([r]).where(or_(pos == 0,
+                                      length + pos == func.length(r.c.path)))
+            s = s.order_by(r.c.path).limit(limit or None)
+            rp = self.conn.execute(s, start=start)
+            rows = rp.fetchall()
+            rp.close()
+            return [tuple(row) for row in rows], ()
+
+        p = select([r.c.path,
+                    instr(func.substr(r.c.path, len(prefix) + 1),
+                          delimiter).label('pos')]).alias('p')
+        k = select([case([(p.c.pos == 0, p.c.path)],
+                         else_=func.substr(p.c.path, 1, length + p.c.pos)
+                         ).label('key'),
+                    case([(or_(p.c.pos == 0,
+                               length + p.c.pos == func.length(p.c.path)),
+                           0)], else_=1).label('nested')]).alias('k')
+        g = select([k.c.key, func.max(k.c.nested).label('nested')])
+        g = g.group_by(k.c.key).order_by(k.c.key)
+        g = g.limit(limit or None).alias('g')
+        s = select([g.c.key, g.c.nested, r],
+                   from_obj=[g.outerjoin(r, r.c.path == g.c.key)])
+        s = s.order_by(g.c.key)
         rp = self.conn.execute(s, start=start)
-        while True:
-            props = rp.fetchone()
-            if props is None:
-                break
-            path = props[0]
-            idx = path.find(delimiter, pfz)
-
-            if idx < 0:
-                mappend(props)
-                count += 1
-                if count >= limit:
-                    break
-                continue
-
-            if idx + dz == len(path):
-                mappend(props)
-                count += 1
-                continue  # Get one more, in case there is a path.
-            pf = path[:idx + dz]
-            pappend(pf)
-            if count >= limit:
-                break
-
-            rp = self.conn.execute(s, start=strnextling(pf))  # New start.
+        rows = rp.fetchall()
         rp.close()
-
+        matches = []
+        prefixes = []
+        for row in rows:
+            if row[2] is not None:
+                matches.append(tuple(row[2:]))
+            if row[1]:
+                prefixes.append(row[0])
         return matches, prefixes
 
     def latest_uuid(self, uuid, cluster):
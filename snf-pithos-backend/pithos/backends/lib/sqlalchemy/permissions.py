@@ -96,6 +96,28 @@ class Permissions(XFeatures, Groups, Public, Node):
             del(permissions[WRITE])
         return permissions
 
+    def access_get_for_paths(self, paths):
+        """Get permissions for paths, with a single query.
+           Return a dict mapping each path with permissions
+           to a dict like the one returned by access_get()."""
+
+        paths = list(set(paths))
+        if not paths:
+            return {}
+        x = self.xfeatures
+        f = self.xfeaturevals
+        s = select([x.c.path, f.c.key, f.c.value],
+                   from_obj=[x.join(f, x.c.feature_id == f.c.feature_id)])
+        s = s.where(x.c.path.in_(paths))
+        r = self.conn.execute(s)
+        rows = r.fetchall()
+        r.close()
+        keys = {READ: 'read', WRITE: 'write'}
+        permissions = defaultdict(lambda: defaultdict(list))
+        for path, key, value in rows:
+            permissions[path][keys.get(key, key)].append(value)
+        return dict(permissions)
+
     def access_members(self, path):
         feature = self.xfeature_get(path)
         if not feature:
@@ -132,6 +154,12 @@ class Permissions(XFeatures, Groups, Public, Node):
         if not feature:
             return False
         members = self.feature_get(feature, access)
+        return self.access_check_members(members, member)
+
+    def access_check_members(self, members, member):
+        """Return true if member is included in members,
+           directly, through '*' or through some group."""
+
         if member in members or '*' in members:
             return True
         for owner, group in self.group_parents(member):
@@ -175,6 +203,13 @@ class Permissions(XFeatures, Groups, Public, Node):
 #         # Compute valid.
 #         return [x[0] for x in r if x[0] in valid]
 
+        valid = self._access_inherit_candidates(path)
+        if not valid:
+            return []
+        features = set(x[1] for x in self.xfeature_get_bulk(valid) or ())
+        return [x for x in valid if x in features]
+
+    def _access_inherit_candidates(self, path):
         # Only keep path components.
         parts = path.rstrip('/').split('/')
         valid = []
@@ -183,7 +218,38 @@ class Permissions(XFeatures, Groups, Public, Node):
             valid.append(subp)
             if subp != path:
                 valid.append(subp + '/')
-        return [x for x in valid if self.xfeature_get(x)]
+        return valid
+
+    def access_inherit_props(self, path, cluster=0):
+        """Return the paths influencing the access for path, closest first.
+           Each entry is a (path, type, permissions) tuple, where type
+           is the type of the latest version of the path in cluster
+           (None if there is no such version) and permissions maps
+           READ and WRITE to member lists."""
+
+        valid = self._access_inherit_candidates(path)
+        if not valid:
+            return []
+        x = self.xfeatures
+        f = self.xfeaturevals
+        n = self.nodes
+        v = self.versions
+        j = x.outerjoin(f, f.c.feature_id == x.c.feature_id)
+        j = j.outerjoin(n, n.c.path == x.c.path)
+        j = j.outerjoin(v, and_(v.c.serial == n.c.latest_version,
+                                v.c.cluster == cluster))
+        s = select([x.c.path, v.c.type, f.c.key, f.c.value], from_obj=[j])
+        s = s.where(x.c.path.in_(valid))
+        r = self.conn.execute(s)
+        rows = r.fetchall()
+        r.close()
+        inherited = {}
+        for p, ptype, key, value in rows:
+            if p not in inherited:
+                inherited[p] = (p, ptype, defaultdict(list))
+            if key is not None:
+                inherited[p][2][key].append(value)
+        return [inherited[p] for p in sorted(inherited, reverse=True)]
 
     def access_inherit_bulk(self, paths):
         """Return the paths influencing the access for path."""
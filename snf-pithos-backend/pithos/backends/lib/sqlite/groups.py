@@ -32,6 +32,7 @@ class Groups(DBWorker):
                             primary key (owner, name, member) ) """)
         execute(""" create index if not exists idx_groups_member
                     on groups(member) """)
+        self.parents = {}
 
     def group_names(self, owner):
         """List all group names belonging to owner."""
@@ -53,6 +54,7 @@ class Groups(DBWorker):
     def group_add(self, owner, group, member):
         """Add a member to a group."""
 
+        self.parents.clear()
         q = ("insert or ignore into groups (owner, name, member) "
              "values (?, ?, ?)")
         self.execute(q, (owner, group, member))
@@ -62,6 +64,7 @@ class Groups(DBWorker):
            Receive groups as a mapping object.
         """
 
+        self.parents.clear()
         q = ("insert or ignore into groups (owner, name, member) "
              "values (?, ?, ?)")
         self.executemany(q, ((owner, group, member)
@@ -71,18 +74,21 @@ class Groups(DBWorker):
     def group_remove(self, owner, group, member):
         """Remove a member from a group."""
 
+        self.parents.clear()
         q = "delete from groups where owner = ? and name = ? and member = ?"
         self.execute(q, (owner, group, member))
 
     def group_delete(self, owner, group):
         """Delete a group."""
 
+        self.parents.clear()
         q = "delete from groups where owner = ? and name = ?"
         self.execute(q, (owner, group))
 
     def group_destroy(self, owner):
         """Delete all groups belonging to owner."""
 
+        self.parents.clear()
         q = "delete from groups where owner = ?"
         self.execute(q, (owner,))
 
@@ -101,8 +107,20 @@ class Groups(DBWorker):
         return bool(self.fetchone())
 
     def group_parents(self, member):
-        """Return all (owner, group) tuples that contain member."""
+        """Return all (owner, group) tuples that contain member.
 
-        q = "select owner, name from groups where member = ?"
-        self.execute(q, (member,))
-        return self.fetchall()
+        Results are kept until group_parents_reset() is called or the
+        groups are modified.
+        """
+
+        if member not in self.parents:
+            q = "select owner, name from groups where member = ?"
+            self.execute(q, (member,))
+            self.parents[member] = self.fetchall()
+        return self.parents[member]
+
+    def group_parents_reset(self):
+        """Forget the results of group_parents(), e.g. in a new transaction.
+        """
+
+        self.parents.clear()
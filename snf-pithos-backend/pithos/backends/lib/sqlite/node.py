@@ -13,13 +13,16 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import sys
+
 from time import time
 from operator import itemgetter
 from itertools import groupby
 
 from dbworker import DBWorker
 
-from pithos.backends.modular import MAP_AVAILABLE
+from pithos.backends.modular import (MAP_AVAILABLE, CLUSTER_NORMAL,
+                                      CLUSTER_HISTORY, CLUSTER_DELETED)
 from pithos.backends.filter import parse_filters
 
 
@@ -84,6 +87,11 @@ class Node(DBWorker):
 
         execute(""" pragma foreign_keys = on """)
 
+        # Common table expressions are available since SQLite 3.8.3.
+        execute(""" select sqlite_version() """)
+        version = tuple(int(x) for x in self.fetchone()[0].split('.')[:3])
+        self.with_cte = version >= (3, 8, 3)
+
         execute(""" create table if not exists nodes
                           ( node       integer primary key,
                             parent     integer default 0,
@@ -391,6 +399,152 @@ class Node(DBWorker):
         self.execute(q, (node,))
         return True
 
+    def node_delete_bulk(self, parent, prefix='', start='', limit=1000,
+                         muser='', remove_history=False,
+                         update_statistics_ancestors_depth=None):
+        """Delete the current versions of up to limit children of parent,
+           whose path starts with prefix and is greater than start.
+
+           Each current version is moved to the history cluster (or removed,
+           if remove_history is True) and the node gets a new, empty version
+           in the deleted cluster. The statistics are updated once.
+           Return the (paths, hashes, size) of the deleted versions, ordered
+           by path. Deletion can be resumed by passing the last path as start.
+        """
+
+        execute = self.execute
+        if not start or start < prefix:
+            start = strprevling(prefix)
+        nextling = strnextling(prefix)
+        q = ("select n.node, n.path, v.serial, v.hash, v.size "
+             "from nodes n, versions v "
+             "where n.parent = ? "
+             "and n.path > ? and n.path < ? "
+             "and v.serial = n.latest_version "
+             "and v.cluster = ? "
+             "order by n.path limit ?")
+        execute(q, (parent, start, nextling, CLUSTER_NORMAL, limit))
+        rows = self.fetchall()
+        if not rows:
+            return [], [], 0
+        nodes = [r[0] for r in rows]
+        serials = [r[2] for r in rows]
+        size = sum(r[4] for r in rows)
+        count = len(rows)
+        marks = ','.join('?' * count)
+
+        mtime = time()
+        q = ("insert into versions (node, hash, size, type, source, mtime, "
+             "muser, uuid, checksum, cluster, available, "
+             "map_check_timestamp, mapfile, is_snapshot) "
+             "select node, null, 0, '', serial, ?, ?, uuid, '', ?, "
+             "available, map_check_timestamp, null, is_snapshot "
+             "from versions where serial in (%s) "
+             "order by serial" % marks)
+        execute(q, [mtime, muser, CLUSTER_DELETED] + serials)
+        if remove_history:
+            q = "delete from versions where serial in (%s)" % marks
+        else:
+            q = ("update versions set cluster = %d "
+                 "where serial in (%s)" % (CLUSTER_HISTORY, marks))
+        execute(q, serials)
+        q = ("update nodes set latest_version = "
+             "(select max(serial) from versions "
+             "where versions.node = nodes.node) "
+             "where node in (%s)" % marks)
+        execute(q, nodes)
+        q = ("update attributes set is_latest = 0 "
+             "where node in (%s)" % marks)
+        execute(q, nodes)
+
+        ancestors = self.node_get_ancestors(nodes[0],
+                                            update_statistics_ancestors_depth)
+        self._statistics_upsert(ancestors, -count, -size, mtime,
+                                CLUSTER_NORMAL)
+        if not remove_history:
+            self._statistics_upsert(ancestors, count, size, mtime,
+                                    CLUSTER_HISTORY)
+        self._statistics_upsert(ancestors, count, 0, mtime, CLUSTER_DELETED)
+        return [r[1] for r in rows], [r[3] for r in rows], size
+
+    def version_copy_bulk(self, serials, parent, paths, muser, uuids=None,
+                          update_statistics_ancestors_depth=None):
+        """Create a new current version for each of the paths, children of
+           parent, copying the properties and attributes of the respective
+           version in serials. The nodes of the paths are created if needed
+           and must not have a current version. The statistics are updated
+           once.
+
+           If uuids is not None, the new versions get these uuids and new
+           mapfiles. Otherwise, they keep the uuids and mapfiles of the
+           source versions.
+           Return the (serial, mapfile) of the new versions, in order.
+        """
+
+        if not serials:
+            return []
+        execute = self.execute
+        count = len(serials)
+        marks = ','.join('?' * count)
+        q = "insert or ignore into nodes (parent, path) values (?, ?)"
+        self.executemany(q, ((parent, path) for path in paths))
+        q = "select path, node from nodes where path in (%s)" % marks
+        execute(q, paths)
+        nodes = dict(self.fetchall())
+        nodes = [nodes[path] for path in paths]
+
+        mtime = time()
+        q = ("insert into versions (node, hash, size, type, source, mtime, "
+             "muser, uuid, checksum, cluster, available, "
+             "map_check_timestamp, mapfile, is_snapshot) "
+             "select ?, hash, size, type, serial, ?, ?, %s, checksum, ?, "
+             "available, map_check_timestamp, "
+             "case when size = 0 then null else %s end, is_snapshot "
+             "from versions where serial = ?")
+        if uuids is None:
+            args = ((node, mtime, muser, CLUSTER_NORMAL, serial)
+                    for node, serial in zip(nodes, serials))
+            self.executemany(q % ('uuid', 'mapfile'), args)
+        else:
+            q2 = ("insert into mapfile_seq (dummy) "
+                  "select 0 from versions where serial in (%s)" % marks)
+            last = execute(q2, serials).lastrowid
+            mapfiles = [''.join([self.mapfile_prefix, unicode(seq)])
+                        for seq in xrange(last - count + 1, last + 1)]
+            args = ((node, mtime, muser, uuid, CLUSTER_NORMAL, mapfile, serial)
+                    for node, uuid, mapfile, serial in zip(
+                        nodes, uuids, mapfiles, serials))
+            self.executemany(q % ('?', '?'), args)
+        q = ("update nodes set latest_version = "
+             "(select max(serial) from versions "
+             "where versions.node = nodes.node) "
+             "where node in (%s)" % marks)
+        execute(q, nodes)
+
+        q = ("update attributes set is_latest = 0 "
+             "where node in (%s)" % marks)
+        execute(q, nodes)
+        q = ("insert into attributes "
+             "(serial, domain, key, value, node, is_latest) "
+             "select v.serial, a.domain, a.key, a.value, v.node, 1 "
+             "from nodes n, versions v, attributes a "
+             "where n.node in (%s) "
+             "and v.serial = n.latest_version "
+             "and a.serial = v.source" % marks)
+        execute(q, nodes)
+
+        q = ("select n.node, v.serial, v.mapfile, v.size "
+             "from nodes n, versions v "
+             "where n.node in (%s) "
+             "and v.serial = n.latest_version" % marks)
+        execute(q, nodes)
+        rows = dict((r[0], r[1:]) for r in self.fetchall())
+        size = sum(r[2] for r in rows.itervalues())
+        ancestors = self.node_get_ancestors(nodes[0],
+                                            update_statistics_ancestors_depth)
+        self._statistics_upsert(ancestors, count, size, mtime, CLUSTER_NORMAL)
+        return [rows[node][:2] for node in nodes]
+
     def node_accounts(self, accounts=()):
         q = ("select path, node from nodes where node != 0 and parent = 0 ")
         args = []
@@ -458,21 +612,7 @@ class Node(DBWorker):
            May be zero or positive or negative numbers.
         """
 
-        qs = ("select population, size from statistics "
-              "where node = ? and cluster = ?")
-        qu = ("insert or replace into statistics "
-              "(node, population, size, mtime, cluster) "
-              "values (?, ?, ?, ?, ?)")
-        self.execute(qs, (node, cluster))
-        r = self.fetchone()
-        if r is None:
-            prepopulation, presize = (0, 0)
-        else:
-            prepopulation, presize = r
-        population += prepopulation
-        population = max(population, 0)
-        size += presize
-        self.execute(qu, (node, population, size, mtime, cluster))
+        self._statistics_upsert([node], population, size, mtime, cluster)
 
     def statistics_update_ancestors(self, node, population, size, mtime,
                                     cluster=0, recursion_depth=None):
@@ -481,20 +621,66 @@ class Node(DBWorker):
            Population is not recursive.
         """
 
-        i = 0
-        while True:
-            if node == ROOTNODE:
-                break
-            if recursion_depth is not None and recursion_depth <= i:
-                break
-            props = self.node_get_properties(node)
-            if props is None:
-                break
-            parent, path = props
-            self.statistics_update(parent, population, size, mtime, cluster)
-            node = parent
-            population = 0  # Population isn't recursive
-            i += 1
+        ancestors = self.node_get_ancestors(node, recursion_depth)
+        self._statistics_upsert(ancestors, population, size, mtime, cluster)
+
+    def node_get_ancestors(self, node, depth=None):
+        """Return the parent of the node, its parent and so on up to the
+           root, or up to ``depth`` ancestors (if not None).
+        """
+
+        if node == ROOTNODE or (depth is not None and depth <= 0):
+            return []
+        if not self.with_cte:
+            ancestors = []
+            while node != ROOTNODE and (depth is None or
+                                        len(ancestors) < depth):
+                props = self.node_get_properties(node)
+                if props is None:
+                    break
+                node = props[0]
+                ancestors.append(node)
+            return ancestors
+        q = ("select parent from ("
+             "with recursive chain(node, parent, depth) as ("
+             "select node, parent, 1 from nodes "
+             "where node = ? and node != ? "
+             "union all "
+             "select n.node, n.parent, c.depth + 1 "
+             "from nodes as n, chain as c "
+             "where n.node = c.parent and c.parent != ? and c.depth < ?) "
+             "select parent, depth from chain) "
+             "order by depth")
+        depth = depth if depth is not None else sys.maxint
+        self.execute(q, (node, ROOTNODE, ROOTNODE, depth))
+        return [r[0] for r in self.fetchall()]
+
+    def _statistics_upsert(self, nodes, population, size, mtime, cluster):
+        """Add size to the statistics of all nodes and population to the
+           statistics of the first one, creating missing rows.
+        """
+
+        if not nodes:
+            return
+        marks = ','.join('?' * len(nodes))
+        q = ("update statistics "
+             "set population = case when node != ? then population "
+             "else max(population + ?, 0) end, "
+             "size = size + ?, mtime = ? "
+             "where node in (%s) and cluster = ?" % marks)
+        args = [nodes[0], population, size, mtime] + nodes + [cluster]
+        if self.execute(q, args).rowcount == len(nodes):
+            return
+        q = ("select node from statistics "
+             "where node in (%s) and cluster = ?" % marks)
+        self.execute(q, nodes + [cluster])
+        existing = set(r[0] for r in self.fetchall())
+        q = ("insert into statistics "
+             "(node, population, size, mtime, cluster) "
+             "values (?, ?, ?, ?, ?)")
+        self.executemany(q, [
+            (n, max(population, 0) if n == nodes[0] else 0, size, mtime,
+             cluster) for n in nodes if n not in existing])
 
     def statistics_latest(self, node, before=inf, except_cluster=0):
         """Return population, total size and last mtime
@@ -712,6 +898,16 @@ class Node(DBWorker):
         q = "update versions set %s = ? where serial = ?" % key
         self.execute(q, (value, serial))
 
+    def version_put_property_bulk(self, serials, key, value, props=None):
+        """Set value for the property of the versions specified by key."""
+
+        props = props or self._props
+        if key not in props or not serials:
+            return
+        q = "update versions set %s = ? where serial in (%s)" % (
+            key, ','.join('?' for _ in serials))
+        self.execute(q, [value] + list(serials))
+
     def version_recluster(self, serial, cluster,
                           update_statistics_ancestors_depth=None):
         """Move the version into another cluster."""
@@ -989,7 +1185,8 @@ class Node(DBWorker):
     def latest_version_list(self, parent, prefix='', delimiter=None,
                             start='', limit=10000, before=inf,
                             except_cluster=0, pathq=[], domain=None,
-                            filterq=[], sizeq=None, all_props=False):
+                            filterq=[], sizeq=None, all_props=False,
+                            virtual=True):
         """Return a (list of (path, serial) tuples, list of common prefixes)
            for the current versions of the paths with the given parent,
            matching the following criteria.
@@ -1035,7 +1232,13 @@ class Node(DBWorker):
            If arguments are None, then the corresponding matching rule
            will always match.
 
-           Limit applies to the first list of tuples returned.
+           Limit applies to the first list of tuples returned or, if a
+           delimiter is given, to the number of distinct paths and common
+           prefixes returned. If virtual is False, the common prefixes are
+           not returned and do not count against the limit. Either way, a
+           single query is executed, unless SQLite does not support common
+           table expressions, in which case the query is executed again
+           after every common prefix.
 
            If all_props is True, return all properties after path,
            not just serial.
@@ -1095,40 +1298,73 @@ class Node(DBWorker):
 
         pfz = len(prefix)
         dz = len(delimiter)
-        count = 0
-        fetchone = self.fetchone
-        prefixes = []
-        pappend = prefixes.append
-        matches = []
-        mappend = matches.append
+        if not self.with_cte:
+            # Execute the query again after every common prefix, starting
+            # from the paths after it.
+            count = 0
+            fetchone = self.fetchone
+            prefixes = []
+            matches = []
 
-        execute(q, args)
-        while True:
-            props = fetchone()
-            if props is None:
-                break
-            path = props[0]
-            idx = path.find(delimiter, pfz)
-
-            if idx < 0:
-                mappend(props)
-                count += 1
-                if count >= limit:
+            execute(q, args)
+            while True:
+                props = fetchone()
+                if props is None:
                     break
-                continue
-
-            if idx + dz == len(path):
-                mappend(props)
-                count += 1
-                continue  # Get one more, in case there is a path.
-            pf = path[:idx + dz]
-            pappend(pf)
-            if count >= limit:
-                break
-
-            args[start_index] = strnextling(pf)  # New start.
+                path = props[0]
+                idx = path.find(delimiter, pfz)
+
+                if idx < 0 or idx + dz == len(path):
+                    if limit and count >= limit:
+                        break
+                    matches.append(props)
+                    count += 1
+                    continue  # Get one more, in case there is a path.
+                pf = path[:idx + dz]
+                if virtual:
+                    if not matches or matches[-1][0] != pf:
+                        if limit and count >= limit:
+                            break
+                        count += 1
+                    prefixes.append(pf)
+
+                args[start_index] = strprevling(strnextling(pf))
+                execute(q, args)
+
+            return matches, prefixes
+
+        if not virtual:
+            # Only the paths that are not under a common prefix are returned
+            q = ("select * from (%s) "
+                 "where instr(substr(path, ?), ?) in (0, length(path) - ?) "
+                 "order by path limit ?" % q)
+            args += [pfz + 1, delimiter, pfz + dz - 1, limit or -1]
             execute(q, args)
+            return self.fetchall(), ()
 
+        # Roll up the paths to the first delimiter after the prefix and
+        # return the first limit distinct paths, each with its version, if
+        # any, and whether there are paths under it.
+        q = ("with r as (%s) "
+             "select g.key, g.nested, r.* from "
+             "(select key, max(nested) as nested from "
+             "(select case when pos = 0 then path "
+             "else substr(path, 1, ? + pos) end as key, "
+             "case when pos = 0 or ? + pos = length(path) then 0 "
+             "else 1 end as nested "
+             "from (select path, instr(substr(path, ?), ?) as pos from r)) "
+             "group by key order by key limit ?) g "
+             "left join r on r.path = g.key "
+             "order by g.key" % q)
+        args += [pfz + dz - 1, pfz + dz - 1, pfz + 1, delimiter, limit or -1]
+        execute(q, args)
+        matches = []
+        prefixes = []
+        for row in self.fetchall():
+            if row[2] is not None:
+                matches.append(row[2:])
+            if row[1]:
+                prefixes.append(row[0])
         return matches, prefixes
 
     def latest_uuid(self, uuid, cluster):
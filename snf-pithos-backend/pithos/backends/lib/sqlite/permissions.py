@@ -92,6 +92,26 @@ class Permissions(XFeatures, Groups, Public, Node):
             del(permissions[WRITE])
         return permissions
 
+    def access_get_for_paths(self, paths):
+        """Get permissions for paths, with a single query.
+           Return a dict mapping each path with permissions
+           to a dict like the one returned by access_get()."""
+
+        paths = list(set(paths))
+        if not paths:
+            return {}
+        q = ("select x.path, f.key, f.value "
+             "from xfeatures x join xfeaturevals f "
+             "on x.feature_id = f.feature_id "
+             "where x.path in (%s)") % ','.join('?' for _ in paths)
+        self.execute(q, paths)
+        rows = self.fetchall()
+        keys = {READ: 'read', WRITE: 'write'}
+        permissions = defaultdict(lambda: defaultdict(list))
+        for path, key, value in rows:
+            permissions[path][keys.get(key, key)].append(value)
+        return dict(permissions)
+
     def access_members(self, path):
         feature = self.xfeature_get(path)
         if not feature:
@@ -128,6 +148,12 @@ class Permissions(XFeatures, Groups, Public, Node):
         if not feature:
             return False
         members = self.feature_get(feature, access)
+        return self.access_check_members(members, member)
+
+    def access_check_members(self, members, member):
+        """Return true if member is included in members,
+           directly, through '*' or through some group."""
+
         if member in members or '*' in members:
             return True
         for owner, group in self.group_parents(member):
@@ -162,6 +188,13 @@ class Permissions(XFeatures, Groups, Public, Node):
 #         # Compute valid.
 #         return [x[0] for x in r if x[0] in valid]
 
+        valid = self._access_inherit_candidates(path)
+        if not valid:
+            return []
+        features = set(x[1] for x in self.xfeature_get_bulk(valid) or ())
+        return [x for x in valid if x in features]
+
+    def _access_inherit_candidates(self, path):
         # Only keep path components.
         parts = path.rstrip('/').split('/')
         valid = []
@@ -170,7 +203,34 @@ class Permissions(XFeatures, Groups, Public, Node):
             valid.append(subp)
             if subp != path:
                 valid.append(subp + '/')
-        return [x for x in valid if self.xfeature_get(x)]
+        return valid
+
+    def access_inherit_props(self, path, cluster=0):
+        """Return the paths influencing the access for path, closest first.
+           Each entry is a (path, type, permissions) tuple, where type
+           is the type of the latest version of the path in cluster
+           (None if there is no such version) and permissions maps
+           READ and WRITE to member lists."""
+
+        valid = self._access_inherit_candidates(path)
+        if not valid:
+            return []
+        q = ("select x.path, v.type, f.key, f.value "
+             "from xfeatures x "
+             "left join xfeaturevals f on f.feature_id = x.feature_id "
+             "left join nodes n on n.path = x.path "
+             "left join versions v on v.serial = n.latest_version "
+             "and v.cluster = ? "
+             "where x.path in (%s)") % ','.join('?' for _ in valid)
+        self.execute(q, [cluster] + valid)
+        rows = self.fetchall()
+        inherited = {}
+        for p, ptype, key, value in rows:
+            if p not in inherited:
+                inherited[p] = (p, ptype, defaultdict(list))
+            if key is not None:
+                inherited[p][2][key].append(value)
+        return [inherited[p] for p in sorted(inherited, reverse=True)]
 
     def access_inherit_bulk(self, paths):
         """Return the paths influencing the access for paths."""
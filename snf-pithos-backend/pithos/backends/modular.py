@@ -25,8 +25,7 @@ from traceback import format_exc
 from time import time
 
 from pithos.workers import glue
-from archipelago.common import Segment, Xseg_ctx
-from objpool import ObjectPool
+from pithos.backends.blockcache import get_block_cache
 
 try:
     from astakosclient import AstakosClient
@@ -88,6 +87,7 @@ DEFAULT_BLOCK_MODULE = 'pithos.backends.lib.hashfiler'
 DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024  # 4MB
 DEFAULT_HASH_ALGORITHM = 'sha256'
 DEFAULT_BLOCK_PARAMS = {'mappool': None, 'blockpool': None}
+DEFAULT_BLOCK_CACHE_SIZE = 0  # No block cache.
 
 # Default setting for new accounts.
 DEFAULT_ACCOUNT_QUOTA = 0  # No quota.
@@ -120,6 +120,10 @@ DEFAULT_RESOURCE_MAX_METADATA = 32
 DEFAULT_ACC_MAX_GROUPS = 32
 DEFAULT_ACC_MAX_GROUP_MEMBERS = 32
 
+DEFAULT_DELETE_CHUNK_SIZE = 1000
+
+DEFAULT_MAP_CHECK_BATCH_SIZE = 100
+
 logger = logging.getLogger(__name__)
 
 _propnames = ('serial', 'node', 'hash', 'size', 'type', 'source', 'mtime',
@@ -248,7 +252,12 @@ class ModularBackend(object):
                  mapfile_prefix=DEFAULT_MAPFILE_PREFIX,
                  resource_max_metadata=DEFAULT_RESOURCE_MAX_METADATA,
                  acc_max_groups=DEFAULT_ACC_MAX_GROUPS,
-                 acc_max_group_members=DEFAULT_ACC_MAX_GROUP_MEMBERS):
+                 acc_max_group_members=DEFAULT_ACC_MAX_GROUP_MEMBERS,
+                 block_cache_size=DEFAULT_BLOCK_CACHE_SIZE,
+                 db_pool_params=None,
+                 aggregate_commissions=False,
+                 delete_chunk_size=DEFAULT_DELETE_CHUNK_SIZE,
+                 map_check_batch_size=DEFAULT_MAP_CHECK_BATCH_SIZE):
 
         not_nullable = ('block_size', 'hash_algorithm', 'block_params',
                         'public_url_security', 'public_url_alphabet',
@@ -287,7 +296,8 @@ class ModularBackend(object):
             return sys.modules[m]
 
         self.db_module = load_module(db_module)
-        self.wrapper = self.db_module.DBWrapper(db_connection)
+        self.wrapper = self.db_module.DBWrapper(db_connection,
+                                                **(db_pool_params or {}))
         params = {'wrapper': self.wrapper}
         self.config = self.db_module.Config(**params)
         self.commission_serials = self.db_module.QuotaholderSerial(**params)
@@ -304,18 +314,21 @@ class ModularBackend(object):
 
         self.ALLOWED = ['read', 'write']
 
-        glue.WorkerGlue.setupXsegPool(ObjectPool, Segment, Xseg_ctx,
-                                      cfile=archipelago_conf_file,
-                                      pool_size=xseg_pool_size)
-
-        self.ioctx_pool = glue.WorkerGlue.ioctx_pool
         self.block_module = load_module(block_module)
         self.block_params = block_params
         params = {'block_size': self.block_size,
                   'hash_algorithm': self.hash_algorithm,
-                  'archipelago_cfile': archipelago_conf_file}
+                  'archipelago_cfile': archipelago_conf_file,
+                  'xseg_pool_size': xseg_pool_size}
         params.update(self.block_params)
         self.store = self.block_module.Store(**params)
+        # Only set up by block modules that use Archipelago.
+        self.ioctx_pool = glue.WorkerGlue.ioctx_pool
+        if block_cache_size:
+            self.block_cache = get_block_cache(
+                block_cache_size, self.block_size, self.hash_algorithm)
+        else:
+            self.block_cache = None
 
         self.astakos_auth_url = astakos_auth_url
         self.service_token = service_token
@@ -332,6 +345,15 @@ class ModularBackend(object):
                 pool_size=astakosclient_poolsize)
 
         self.serials = []
+        # Aggregate the quota changes of each transaction into a single
+        # commission, issued when the transaction ends.
+        self.aggregate_commissions = aggregate_commissions
+        self.pending_provisions = defaultdict(int)
+        self.pending_commission_names = []
+        # Number of objects deleted in each transaction of a bulk delete.
+        self.delete_chunk_size = delete_chunk_size
+        # Number of unavailable snapshots checked in each domain listing.
+        self.map_check_batch_size = map_check_batch_size
 
         self._move_object = partial(self._copy_object, is_move=True)
 
@@ -350,11 +372,20 @@ class ModularBackend(object):
         self.lock_container_path = lock_container_path
         self.wrapper.execute()
         self.serials = []
+        self.pending_provisions.clear()
+        self.pending_commission_names = []
         self._reset_allowed_paths()
+        self.permissions.group_parents_reset()
         self.in_transaction = True
 
     def post_exec(self, success_status=True):
         if success_status:
+            try:
+                self._issue_pending_commission()
+            except:
+                self._abort_exec()
+                raise
+
             # register serials
             if self.serials:
                 self.commission_serials.insert_many(
@@ -374,16 +405,29 @@ class ModularBackend(object):
                     r['accepted'])
 
             self.wrapper.commit()
+            self.in_transaction = False
         else:
-            if self.serials:
-                r = self.astakosclient.resolve_commissions(
-                    accept_serials=[],
-                    reject_serials=self.serials)
-                self.commission_serials.delete_many(
-                    r['rejected'])
-            self.wrapper.rollback()
+            self._abort_exec()
+
+    def _abort_exec(self):
+        self.pending_provisions.clear()
+        self.pending_commission_names = []
+        if self.serials:
+            r = self.astakosclient.resolve_commissions(
+                accept_serials=[],
+                reject_serials=self.serials)
+            self.commission_serials.delete_many(
+                r['rejected'])
+        self.wrapper.rollback()
         self.in_transaction = False
 
+    def _commit_chunk(self):
+        """Finish the current transaction and start a new one."""
+
+        lock_container_path = self.lock_container_path
+        self.post_exec(True)
+        self.pre_exec(lock_container_path)
+
     def close(self):
         """Close the backend connection."""
         self.wrapper.close()
@@ -899,22 +943,11 @@ class ModularBackend(object):
                     user, account, -size, project, name=path)
         else:
             # remove only contents
-            src_names = self._list_objects_no_limit(
-                user, account, container, prefix='', delimiter=None,
-                virtual=False, domain=None, keys=[], shared=False, until=None,
-                size_range=None, all_props=True, public=False,
-                listing_limit=listing_limit)
-            freed_space = 0
-            for t in src_names:
-                del_size = self._delete_object(user, account, container, t[0],
-                                               delimiter=None,
-                                               report_size_change=False)
-                freed_space += del_size
-
+            name = '/'.join((account, container, ''))
+            freed_space = self._delete_objects_bulk(user, account, container,
+                                                    '', name=name)
             self._report_size_change(
-                user, account, -freed_space, project, name='/'.join((account,
-                                                                    container,
-                                                                    '')))
+                user, account, -freed_space, project, name=name)
 
         # remove all the cached allowed paths
         # removing the specific path could be more expensive
@@ -1270,20 +1303,24 @@ class ModularBackend(object):
         """
 
         allowed = 'write'
-        permissions_path = self._get_permissions_path(account, container, name)
+        permissions_path, permissions = self._get_permissions(account,
+                                                              container, name)
         if user != account:
-            if self.permissions.access_check(permissions_path, self.WRITE,
-                                             user):
+            if self.permissions.access_check_members(
+                    permissions.get(self.WRITE, []), user):
                 allowed = 'write'
-            elif self.permissions.access_check(permissions_path, self.READ,
-                                               user):
+            elif self.permissions.access_check_members(
+                    permissions.get(self.READ, []), user):
                 allowed = 'read'
             else:
                 raise NotAllowedError("User does not have access to the path")
         self._lookup_object(account, container, name)
-        return (allowed,
-                permissions_path,
-                self.permissions.access_get(permissions_path))
+        access = {}
+        if self.READ in permissions:
+            access['read'] = permissions[self.READ]
+        if self.WRITE in permissions:
+            access['write'] = permissions[self.WRITE]
+        return (allowed, permissions_path, access)
 
     @debug_method
     @backend_method
@@ -1385,6 +1422,42 @@ class ModularBackend(object):
                                            'map_check_timestamp', time())
             return hashmap
 
+    def _update_available_bulk(self, objects):
+        """Check the maps of unavailable snapshots and update the database.
+
+        Receive a list of (props, meta) tuples. Up to map_check_batch_size
+        snapshots, the least recently checked first, are looked up in the
+        store, skipping those checked in the last map_check_interval
+        seconds. The database is updated with two statements and the
+        'available' key of the metadata of the snapshots found is set.
+        """
+
+        now = time()
+        pending = []
+        for props, meta in objects:
+            if props[self.MAP_CHECK_TIMESTAMP]:
+                elapsed_time = now - float(props[self.MAP_CHECK_TIMESTAMP])
+                if elapsed_time < self.map_check_interval:
+                    continue
+            pending.append((props, meta))
+        pending.sort(key=lambda x: float(x[0][self.MAP_CHECK_TIMESTAMP] or 0))
+        pending = pending[:self.map_check_batch_size]
+        if not pending:
+            return
+        available = []
+        for props, meta in pending:
+            try:
+                self.store.map_get(props[self.HASH], props[self.SIZE])
+            except:  # map does not exist
+                continue
+            available.append(props[self.SERIAL])
+            meta['available'] = MAP_AVAILABLE
+        self.node.version_put_property_bulk(available, 'available',
+                                            MAP_AVAILABLE)
+        self.node.version_put_property_bulk(
+            [props[self.SERIAL] for props, meta in pending],
+            'map_check_timestamp', now)
+
     def _get_object_hashmap(self, props, update_available=True):
         if props[self.HASH] is None:
             return []
@@ -1428,6 +1501,31 @@ class ModularBackend(object):
                 src_version, dest_version, d, dest_node, meta=existing,
                 replace=True)
 
+    def _check_quota(self, account_node, container_node):
+        # Check account quota.
+        if not self.using_external_quotaholder:
+            account_quota = long(self._get_policy(
+                account_node, is_account_policy=True)[QUOTA_POLICY])
+            account_usage = self._get_statistics(account_node,
+                                                 compute=True)[1]
+            if (account_quota > 0 and account_usage > account_quota):
+                raise QuotaError(
+                    'Account quota exceeded: limit: %s, usage: %s' % (
+                        account_quota, account_usage))
+
+        # Check container quota.
+        container_quota = long(self._get_policy(
+            container_node, is_account_policy=False)[QUOTA_POLICY])
+        container_usage = self._get_statistics(container_node)[1]
+        if (container_quota > 0 and container_usage > container_quota):
+            # This must be executed in a transaction, so the version is
+            # never created if it fails.
+            raise QuotaError(
+                'Container quota exceeded: limit: %s, usage: %s' % (
+                    container_quota, container_usage
+                )
+            )
+
     def _update_object_hash(self, user, account, container, name, size, type,
                             hash, checksum, domain, meta, replace_meta,
                             permissions, src_node=None, src_version_id=None,
@@ -1469,29 +1567,7 @@ class ModularBackend(object):
                                           update_statistics_ancestors_depth=1)
         size_delta = size - del_size
         if size_delta > 0:
-            # Check account quota.
-            if not self.using_external_quotaholder:
-                account_quota = long(self._get_policy(
-                    account_node, is_account_policy=True)[QUOTA_POLICY])
-                account_usage = self._get_statistics(account_node,
-                                                     compute=True)[1]
-                if (account_quota > 0 and account_usage > account_quota):
-                    raise QuotaError(
-                        'Account quota exceeded: limit: %s, usage: %s' % (
-                            account_quota, account_usage))
-
-            # Check container quota.
-            container_quota = long(self._get_policy(
-                container_node, is_account_policy=False)[QUOTA_POLICY])
-            container_usage = self._get_statistics(container_node)[1]
-            if (container_quota > 0 and container_usage > container_quota):
-                # This must be executed in a transaction, so the version is
-                # never created if it fails.
-                raise QuotaError(
-                    'Container quota exceeded: limit: %s, usage: %s' % (
-                        container_quota, container_usage
-                    )
-                )
+            self._check_quota(account_node, container_node)
 
         if report_size_change:
             self._report_size_change(
@@ -1604,7 +1680,7 @@ class ModularBackend(object):
             hashmap = [self.put_block('')]
         map_ = HashMap(self.block_size, self.hash_algorithm)
         map_.extend([self._unhexlify_hash(x) for x in hashmap])
-        missing = self.store.block_search(map_)
+        missing = self._missing_blocks(map_)
         if missing:
             ie = IndexError()
             ie.data = [binascii.hexlify(x) for x in missing]
@@ -1734,33 +1810,45 @@ class ModularBackend(object):
         if delimiter:
             prefix = (src_name + delimiter if not
                       src_name.endswith(delimiter) else src_name)
-            src_names = self._list_objects_no_limit(
-                user, src_account, src_container, prefix, delimiter=None,
-                virtual=False, domain=None, keys=[], shared=False, until=None,
-                size_range=None, all_props=True, public=False,
-                listing_limit=listing_limit)
-            src_names.sort(key=lambda x: x[2])  # order by nodes
-            paths = [elem[0] for elem in src_names]
-            nodes = [elem[2] for elem in src_names]
-            # TODO: Will do another fetch of the properties
-            # in duplicate version...
-            props = self._get_versions(nodes)
-
-            for prop, vsrc_name, node in zip(props, paths, nodes):
-                dest_prefix = (dest_name + delimiter if not
-                               dest_name.endswith(delimiter) else dest_name)
-                _version_id = prop[self.SERIAL]
-                _type = prop[self.TYPE]
-                _dest_name = vsrc_name.replace(prefix, dest_prefix, 1)
-                serials, size_delta, del_size = self._copy_object(
-                    user, src_account, src_container, vsrc_name,
-                    dest_account, dest_container, _dest_name, _type,
-                    src_version=_version_id, is_move=is_move,
-                    delimiter=None,
+            dest_prefix = (dest_name + delimiter if not
+                           dest_name.endswith(delimiter) else dest_name)
+            if self._can_copy_objects_bulk(user, src_account, src_container,
+                                           prefix, dest_account,
+                                           dest_container, dest_prefix):
+                serials, size_delta, del_size = self._copy_objects_bulk(
+                    user, src_account, src_container, prefix, dest_account,
+                    dest_container, dest_prefix, is_move=is_move,
+                    listing_limit=listing_limit,
                     report_size_change=(not bulk_report_size_change))
                 dest_versions.extend(serials)
                 occupied_space += size_delta
                 freed_space += del_size
+            else:
+                src_names = self._list_objects_no_limit(
+                    user, src_account, src_container, prefix,
+                    delimiter=None, virtual=False, domain=None, keys=[],
+                    shared=False, until=None, size_range=None,
+                    all_props=True, public=False, listing_limit=listing_limit)
+                src_names.sort(key=lambda x: x[2])  # order by nodes
+                paths = [elem[0] for elem in src_names]
+                nodes = [elem[2] for elem in src_names]
+                # TODO: Will do another fetch of the properties
+                # in duplicate version...
+                props = self._get_versions(nodes)
+
+                for prop, vsrc_name, node in zip(props, paths, nodes):
+                    _version_id = prop[self.SERIAL]
+                    _type = prop[self.TYPE]
+                    _dest_name = vsrc_name.replace(prefix, dest_prefix, 1)
+                    serials, size_delta, del_size = self._copy_object(
+                        user, src_account, src_container, vsrc_name,
+                        dest_account, dest_container, _dest_name, _type,
+                        src_version=_version_id, is_move=is_move,
+                        delimiter=None,
+                        report_size_change=(not bulk_report_size_change))
+                    dest_versions.extend(serials)
+                    occupied_space += size_delta
+                    freed_space += del_size
 
         # bulk repost size change
         if report_size_change and bulk_report_size_change:
@@ -1771,6 +1859,120 @@ class ModularBackend(object):
                 name=dest_obj_path)
         return dest_versions, occupied_space, freed_space
 
+    def _can_copy_objects_bulk(self, user, src_account, src_container,
+                               prefix, dest_account, dest_container,
+                               dest_prefix):
+        """Return whether the objects under prefix can be copied under
+        dest_prefix with _copy_objects_bulk.
+
+        This is the case if the user owns them, the source and destination
+        prefixes do not overlap and no object exists under dest_prefix.
+        Otherwise, the objects are copied one by one.
+        """
+
+        if user != src_account or user != dest_account:
+            return False
+        if src_container == dest_container and (
+                prefix.startswith(dest_prefix) or
+                dest_prefix.startswith(prefix)):
+            return False
+        path, node = self._lookup_container(dest_account, dest_container)
+        return not self._list_object_properties(
+            node, path, dest_prefix, limit=1, virtual=False)
+
+    def _copy_objects_bulk(self, user, src_account, src_container, prefix,
+                           dest_account, dest_container, dest_prefix,
+                           is_move=False, listing_limit=10000,
+                           report_size_change=True):
+        """Copy or move the objects whose name starts with prefix under
+        dest_prefix.
+
+        Objects are copied one listing page at a time, with a few set-based
+        statements per page, and the result is the same as copying them one
+        by one with _copy_object. _can_copy_objects_bulk must hold.
+        Return the new versions, the space occupied and the space freed.
+        """
+
+        src_path, src_node = self._lookup_container(src_account,
+                                                    src_container)
+        dest_path, dest_node = self._lookup_container(dest_account,
+                                                      dest_container)
+        account_node = self._lookup_account(dest_account, True)[1]
+        src_project = self._get_project(src_node)
+        dest_project = self._get_project(dest_node)
+        limit = listing_limit or 10000
+        dest_versions = []
+        occupied_space = 0
+        freed_space = 0
+        marker = None
+        while True:
+            objects = self._list_object_properties(
+                src_node, src_path, prefix, marker=marker, limit=limit,
+                virtual=False, all_props=True)
+            if not objects:
+                break
+            names = [x[0] for x in objects]
+            props = [x[1:] for x in objects]
+            if is_move:
+                uuids = None
+            else:
+                if any(p[self.AVAILABLE] != MAP_AVAILABLE for p in props):
+                    raise NotAllowedError("Copying objects not available in "
+                                          "the storage backend is "
+                                          "forbidden.")
+                uuids = [self._generate_uuid() for p in props]
+            dest_paths = ['/'.join((dest_path, dest_prefix + n[len(prefix):]))
+                          for n in names]
+            versions = self.node.version_copy_bulk(
+                [p[self.SERIAL] for p in props], dest_node, dest_paths, user,
+                uuids, update_statistics_ancestors_depth=1)
+            size = sum(p[self.SIZE] for p in props)
+            if size > 0:
+                self._check_quota(account_node, dest_node)
+
+            if not is_move:
+                # store destination mapfiles
+                for p, (_, mapfile) in zip(props, versions):
+                    if p[self.SIZE] == 0:
+                        continue
+                    try:
+                        hashmap = self._get_object_hashmap(
+                            p, update_available=False)
+                    except:
+                        raise NotAllowedError(
+                            "Copy is not permitted: failed to get source "
+                            "object's mapfile: %s" % p[self.MAPFILE])
+                    self.store.map_put(mapfile, hashmap, p[self.SIZE],
+                                       self.block_size)
+
+            del_size = 0
+            if is_move:
+                start = '/'.join((src_path, marker)) if marker else ''
+                _, del_size = self._delete_objects_chunk(
+                    user, src_node, '/'.join((src_path, prefix)), start,
+                    len(objects))
+            dest_versions.extend(serial for serial, _ in versions)
+            occupied_space += size
+            freed_space += del_size
+
+            if report_size_change:
+                # report each object, in the order of _copy_object
+                for p, name, path in zip(props, names, dest_paths):
+                    self._report_size_change(
+                        user, dest_account, p[self.SIZE], dest_project,
+                        name=path)
+                    if del_size:
+                        self._report_size_change(
+                            user, src_account, -p[self.SIZE], src_project,
+                            name='/'.join((src_path, name)))
+            if len(objects) < limit:
+                break
+            marker = names[-1]
+
+        if is_move:
+            self._reset_allowed_paths()
+        return dest_versions, occupied_space, freed_space
+
     @debug_method
     @backend_method
     def copy_object(self, user, src_account, src_container, src_name,
@@ -1882,35 +2084,27 @@ class ModularBackend(object):
         if not self._exists(node):
             raise ItemNotExists("Object is deleted.")
 
+        freed_space = 0
+        if delimiter:
+            # Delete the contents before the object itself, so that if a
+            # chunk fails, the object is still there and repeating the
+            # request resumes the deletion.
+            prefix = name + delimiter if not name.endswith(delimiter) else name
+            freed_space += self._delete_objects_bulk(user, account, container,
+                                                     prefix, name=path + '/')
+
         # keep reference to the mapfile
         # in case we will want to delete them in the future
         src_version_id, dest_version_id, _ = self._put_version_duplicate(
             user, node, size=0, type='', hash=None, checksum='',
             cluster=CLUSTER_DELETED, update_statistics_ancestors_depth=1,
             keep_src_mapfile=True)
-        freed_space = self._apply_versioning(
+        freed_space += self._apply_versioning(
             account, container, src_version_id,
             update_statistics_ancestors_depth=1)
-        paths = [path]
-
-        if delimiter:
-            prefix = name + delimiter if not name.endswith(delimiter) else name
-            src_names = self._list_objects_no_limit(
-                user, account, container, prefix, delimiter=None,
-                virtual=False, domain=None, keys=[], shared=False, until=None,
-                size_range=None, all_props=True, public=False,
-                listing_limit=listing_limit)
-            for t in src_names:
-                path = '/'.join((account, container, t[0]))
-                del_size = self._delete_object(user, account, container, t[0],
-                                               delimiter=None,
-                                               report_size_change=False)
-                freed_space += del_size
-                paths.append(path)
-        self.permissions.access_clear_bulk(paths)
+        self.permissions.access_clear(path)
 
         if report_size_change:
-            path = '/'.join([account, container, name])
             if delimiter:
                 path += '/'
             self._report_size_change(
@@ -1921,6 +2115,56 @@ class ModularBackend(object):
         self._reset_allowed_paths()
         return freed_space
 
+    def _delete_objects_bulk(self, user, account, container, prefix, name=''):
+        """Delete the objects whose name starts with prefix.
+
+        Objects are deleted in chunks of delete_chunk_size, with a few
+        set-based statements per chunk. All chunks but the last are
+        committed in their own transaction after their size change is
+        reported, so a failure does not undo the chunks already deleted
+        and repeating the request resumes the deletion.
+        Return the space freed by the last chunk, for the caller to report.
+        """
+
+        path, node = self._lookup_container(account, container)
+        project = self._get_project(node)
+        start = ''
+        while True:
+            paths, freed_space = self._delete_objects_chunk(
+                user, node, '/'.join((path, prefix)), start,
+                self.delete_chunk_size)
+            if len(paths) < self.delete_chunk_size:
+                return freed_space
+            self._report_size_change(
+                user, account, -freed_space, project, name=name)
+            self._commit_chunk()
+            # lock the container path again
+            path, node = self._lookup_container(account, container)
+            start = paths[-1]
+
+    def _delete_objects_chunk(self, user, container_node, prefix, start,
+                              limit):
+        """Delete up to limit objects of the container whose path starts
+        with prefix and is greater than start.
+
+        Return the paths of the objects deleted and the space freed.
+        """
+
+        versioning = self._get_policy(
+            container_node, is_account_policy=False)[VERSIONING_POLICY]
+        remove_history = versioning != 'auto'
+        paths, hashes, size = self.node.node_delete_bulk(
+            container_node, prefix, start, limit, user,
+            remove_history=remove_history,
+            update_statistics_ancestors_depth=1)
+        if remove_history:
+            for h in hashes:
+                self.store.map_delete(h)
+        if paths:
+            self.permissions.access_clear_bulk(paths)
+        freed_space = size if remove_history or self.free_versioning else 0
+        return paths, freed_space
+
     @debug_method
     @backend_method
     def delete_object(self, user, account, container, name, until=None,
@@ -2023,11 +2267,38 @@ class ModularBackend(object):
         """
 
         logger.debug("get_block: %s", hash)
+        cache = self.block_cache
+        if cache is not None:
+            block = cache.get(hash)
+            if block is not None:
+                return block
         block = self.store.block_get_archipelago(hash)
         if not block:
             raise ItemNotExists("Block does not exist")
+        if cache is not None:
+            cache.put(hash, block)
         return block
 
+    def _missing_blocks(self, hashes):
+        """Return the hashes missing from the store, in the order given.
+
+        Each distinct hash is checked once and blocks in the block cache are
+        known to exist, so the rest are checked with a single store call.
+        """
+        seen = set()
+        unique = []
+        for h in hashes:
+            if h not in seen:
+                seen.add(h)
+                unique.append(h)
+        cache = self.block_cache
+        if cache is not None:
+            unique = [h for h in unique if binascii.hexlify(h) not in cache]
+        if not unique:
+            return []
+        exists = self.store.block_exists(unique)
+        return [h for h, e in zip(unique, exists) if not e]
+
     def put_block(self, data):
         """Store a block and return the hash."""
 
@@ -2319,8 +2590,8 @@ class ModularBackend(object):
 
         objects, prefixes = self.node.latest_version_list(
             parent, prefix, delimiter, start, limit, before, CLUSTER_DELETED,
-            allowed, domain, filterq, sizeq, all_props)
-        objects.extend([(p, None) for p in prefixes] if virtual else [])
+            allowed, domain, filterq, sizeq, all_props, virtual)
+        objects.extend([(p, None) for p in prefixes])
         objects.sort(key=lambda x: x[0])
         objects = [(x[0][len(cont_prefix):],) + x[1:] for x in objects]
         return objects
@@ -2341,12 +2612,43 @@ class ModularBackend(object):
         if not self.using_external_quotaholder:
             return
 
+        if self.aggregate_commissions and self.in_transaction:
+            self.pending_provisions[(account, source)] += size
+            self.pending_commission_names.append(name)
+            return
+
         serial = self.astakosclient.issue_one_commission(
             holder=account,
             provisions={(source, 'pithos.diskspace'): size},
             name=name)
         self.serials.append(serial)
 
+    def _issue_pending_commission(self):
+        """Issue one commission for the aggregated quota changes.
+
+        Raises: AstakosClientException
+        """
+
+        user_provisions = {}
+        project_provisions = defaultdict(int)
+        for (account, source), size in self.pending_provisions.iteritems():
+            if size == 0:
+                continue
+            user_provisions[(account, source, 'pithos.diskspace')] = size
+            project_provisions[(source, 'pithos.diskspace')] += size
+        names = self.pending_commission_names
+        self.pending_provisions.clear()
+        self.pending_commission_names = []
+        if not user_provisions:
+            return
+
+        name = names[0]
+        if len(names) > 1:
+            name = '%s and %d more' % (name, len(names) - 1)
+        serial = self.astakosclient.issue_commission_generic(
+            user_provisions, dict(project_provisions), name=name)
+        self.serials.append(serial)
+
     # Policy functions.
 
     def _check_project(self, value):
@@ -2470,26 +2772,28 @@ class ModularBackend(object):
                 formatted.append((prop[0], self.MATCH_EXACT))
         return formatted
 
-    def _get_permissions_path(self, account, container, name):
+    def _get_permissions(self, account, container, name):
+        """Return the path the object gets its permissions from,
+        along with the members granted each access, or (None, {}).
+        """
+
         path = '/'.join((account, container, name))
-        permission_paths = self.permissions.access_inherit(path)
-        permission_paths.sort()
-        permission_paths.reverse()
-        for p in permission_paths:
+        inherited = self.permissions.access_inherit_props(path,
+                                                          CLUSTER_NORMAL)
+        for p, ptype, permissions in inherited:
             if p == path:
-                return p
+                return p, permissions
             else:
                 if p.count('/') < 2:
                     continue
-                node = self.node.node_lookup(p)
-                props = None
-                if node is not None:
-                    props = self.node.version_lookup(node, inf, CLUSTER_NORMAL)
-                if props is not None:
-                    if props[self.TYPE].split(';', 1)[0].strip() in (
+                if ptype is not None:
+                    if ptype.split(';', 1)[0].strip() in (
                             'application/directory', 'application/folder'):
-                        return p
-        return None
+                        return p, permissions
+        return None, {}
+
+    def _get_permissions_path(self, account, container, name):
+        return self._get_permissions(account, container, name)[0]
 
     def _get_permissions_path_bulk(self, account, container, names):
         formatted_paths = []
@@ -2563,11 +2867,12 @@ class ModularBackend(object):
         path = '/'.join((account, container, name))
         if self.permissions.public_get(path) is not None:
             return
-        path = self._get_permissions_path(account, container, name)
+        path, permissions = self._get_permissions(account, container, name)
         if not path:
             raise NotAllowedError("User does not have access to the object")
-        if (not self.permissions.access_check(path, self.READ, user) and not
-                self.permissions.access_check(path, self.WRITE, user)):
+        members = (permissions.get(self.READ, []) +
+                   permissions.get(self.WRITE, []))
+        if not self.permissions.access_check_members(members, user):
             raise NotAllowedError("User does not have read access "
                                   "to the object")
 
@@ -2575,11 +2880,11 @@ class ModularBackend(object):
     def _can_write_object(self, user, account, container, name):
         if user == account:
             return
-        path = '/'.join((account, container, name))
-        path = self._get_permissions_path(account, container, name)
+        path, permissions = self._get_permissions(account, container, name)
         if not path:
             raise NotAllowedError("User does not have access to the object")
-        if not self.permissions.access_check(path, self.WRITE, user):
+        if not self.permissions.access_check_members(
+                permissions.get(self.WRITE, []), user):
             raise NotAllowedError("User does not have write access "
                                   "to the object")
 
@@ -2618,16 +2923,24 @@ class ModularBackend(object):
             allowed_paths = None
         obj_list = self.node.domain_object_list(
             domain, allowed_paths, CLUSTER_NORMAL)
-        return [(path,
-                 self._build_metadata(props, user_defined_meta),
-                 self.permissions.access_get(path)) for
-                path, props, user_defined_meta in obj_list]
+        permissions = self.permissions.access_get_for_paths(
+            [path for path, props, user_defined_meta in obj_list])
+        objects = []
+        unavailable = []
+        for path, props, user_defined_meta in obj_list:
+            meta = self._build_metadata(props, user_defined_meta,
+                                        update_available=False)
+            if props[self.AVAILABLE] == MAP_UNAVAILABLE:
+                unavailable.append((props, meta))
+            objects.append((path, meta, permissions.get(path, {})))
+        self._update_available_bulk(unavailable)
+        return objects
 
     # util functions
 
     def _build_metadata(self, props, user_defined=None,
-                        include_user_defined=True):
-        if props[self.AVAILABLE] == MAP_UNAVAILABLE:
+                        include_user_defined=True, update_available=True):
+        if props[self.AVAILABLE] == MAP_UNAVAILABLE and update_available:
             try:
                 self._update_available(props)
             except IllegalOperationError:
@@ -17,15 +17,23 @@ from pithos.backends.test.common import CommonMixin
 from pithos.backends.test.quota import TestQuotaMixin
 from pithos.backends.test.delete_by_uuid import TestDeleteByUUIDMixin
 from pithos.backends.test.snapshots import TestSnapshotsMixin
+from pithos.backends.test.listing import TestListingMixin
+from pithos.backends.test.permissions import TestPermissionsMixin
+from pithos.backends.test.blocker import TestArchipelagoBlocker
+from pithos.backends.test.filestore import TestFileStore
+from pithos.backends.test.blockcache import TestBlockCache
+from pithos.backends.test.dbwrapper import TestDBWrapper
 
 from sqlalchemy import create_engine
 
 import os
+import shutil
 import time
 
 
 class TestSQLAlchemyBackend(CommonMixin, TestDeleteByUUIDMixin,
-                            TestQuotaMixin, TestSnapshotsMixin):
+                            TestQuotaMixin, TestSnapshotsMixin,
+                            TestListingMixin, TestPermissionsMixin):
     db_module = 'pithos.backends.lib.sqlalchemy'
     db_connection_str = \
         '%(scheme)s://%(user)s:%(pwd)s@%(host)s:%(port)s/%(name)s'
@@ -63,7 +71,8 @@ class TestSQLAlchemyBackend(CommonMixin, TestDeleteByUUIDMixin,
 
 
 class TestSQLiteBackend(CommonMixin, TestDeleteByUUIDMixin, TestQuotaMixin,
-                        TestSnapshotsMixin):
+                        TestSnapshotsMixin, TestListingMixin,
+                        TestPermissionsMixin):
     db_module = 'pithos.backends.lib.sqlite'
     db_connection = location = '/tmp/test_pithos_backend.db'
     mapfile_prefix = 'snf_test_pithos_backend_sqlite_%s_' % \
@@ -76,3 +85,25 @@ class TestSQLiteBackend(CommonMixin, TestDeleteByUUIDMixin, TestQuotaMixin,
     @classmethod
     def destroy_db(cls):
         os.remove(cls.location)
+
+
+class TestSQLiteBackendFileStore(TestSQLiteBackend):
+    block_module = 'pithos.backends.lib.filestore'
+    block_path = '/tmp/test_pithos_backend_data_%s' % time.time()
+    block_params = {'path': block_path}
+    mapfile_prefix = 'snf_test_pithos_backend_filestore_%s_' % \
+        time.time()
+
+    @classmethod
+    def destroy_db(cls):
+        super(TestSQLiteBackendFileStore, cls).destroy_db()
+        shutil.rmtree(cls.block_path, ignore_errors=True)
+
+
+class TestSQLiteBackendWithoutCTE(TestSQLiteBackendFileStore):
+    """Use the queries for SQLite versions without common table
+    expressions (before 3.8.3)."""
+
+    def setUp(self):
+        super(TestSQLiteBackendWithoutCTE, self).setUp()
+        self.b.node.with_cte = False
@@ -0,0 +1,64 @@
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from pithos.backends.blockcache import BlockCache, get_block_cache
+
+import unittest
+
+
+class TestBlockCache(unittest.TestCase):
+    def test_get_put(self):
+        c = BlockCache(10)
+        self.assertEqual(c.get('a'), None)
+        c.put('a', 'aaaa')
+        self.assertEqual(c.get('a'), 'aaaa')
+        s = c.stats()
+        self.assertEqual((s['hits'], s['misses'], s['used']), (1, 1, 4))
+
+    def test_eviction(self):
+        c = BlockCache(10)
+        c.put('a', 'aaaa')
+        c.put('b', 'bbbb')
+        c.get('a')  # b is now the least recently used
+        c.put('c', 'cccc')
+        self.assertEqual(c.get('b'), None)
+        self.assertEqual(c.get('a'), 'aaaa')
+        self.assertEqual(c.get('c'), 'cccc')
+        self.assertEqual(c.evictions, 1)
+        self.assertEqual(c.used, 8)
+
+        c.put('d', 'dddddddddd')
+        self.assertEqual(len(c), 1)
+        self.assertEqual(c.used, 10)
+        self.assertEqual(c.evictions, 3)
+
+    def test_oversized(self):
+        c = BlockCache(3)
+        c.put('a', 'aaaa')
+        self.assertEqual(len(c), 0)
+        self.assertEqual(c.used, 0)
+
+    def test_replace(self):
+        c = BlockCache(10)
+        c.put('a', 'aaaa')
+        c.put('a', 'aaaa')
+        self.assertEqual(c.used, 4)
+        c.clear()
+        self.assertEqual((len(c), c.used), (0, 0))
+
+    def test_shared(self):
+        c = get_block_cache(100, 4, 'sha256')
+        self.assertTrue(get_block_cache(100, 4, 'sha256') is c)
+        self.assertFalse(get_block_cache(100, 8, 'sha256') is c)
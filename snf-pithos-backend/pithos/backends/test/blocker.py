@@ -0,0 +1,154 @@
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from binascii import hexlify
+from mock import patch
+
+from pithos.backends.test.fakexseg import FakeXseg, FakeIoctxPool
+from pithos.backends.test.util import get_random_data
+
+import os
+import tempfile
+import unittest
+
+
+def fake_archipelago_blocker(xseg, **params):
+    """Create an ArchipelagoBlocker talking to a FakeXseg port."""
+    from pithos.backends.lib.hashfiler.archipelagoblocker import \
+        ArchipelagoBlocker
+
+    fd, cfile = tempfile.mkstemp()
+    try:
+        os.write(fd, '[mapperd]\nblockerb_port = 1\n')
+        os.close(fd)
+        params.setdefault('blocksize', 1024)
+        params.setdefault('hashtype', 'sha256')
+        blocker = ArchipelagoBlocker(archipelago_cfile=cfile, **params)
+    finally:
+        os.remove(cfile)
+    blocker.ioctx_pool = FakeIoctxPool()
+    return blocker
+
+
+class TestArchipelagoBlocker(unittest.TestCase):
+    block_size = 1024
+
+    def setUp(self):
+        self.xseg = FakeXseg()
+        self.patcher = patch(
+            'pithos.backends.lib.hashfiler.archipelagoblocker.Request',
+            self.xseg.request_class())
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.assertEqual(self.xseg.outstanding, 0)
+        self.assertEqual(self.xseg.inflight, 0)
+
+    def blocker(self, **params):
+        return fake_archipelago_blocker(self.xseg, blocksize=self.block_size,
+                                        **params)
+
+    def test_block_stor(self):
+        b = self.blocker(batch_size=4, write_depth=3)
+        blocks = [get_random_data(self.block_size) for _ in range(10)]
+        hashes, missing = b.block_stor(blocks)
+        self.assertEqual(hashes, [b.block_hash(x) for x in blocks])
+        self.assertEqual(missing, range(10))
+        for h, data in zip(hashes, blocks):
+            self.assertEqual(self.xseg.objects[hexlify(h)], data)
+        self.assertTrue(self.xseg.max_inflight <= 4)
+        self.assertEqual(b.ioctx_pool.outstanding, 0)
+
+        # store again along with new blocks
+        new = [get_random_data(self.block_size) for _ in range(3)]
+        self.xseg.reset_counters()
+        hashes, missing = b.block_stor(new + blocks)
+        self.assertEqual(missing, [0, 1, 2])
+        # 13 info requests plus 3 write requests
+        self.assertEqual(self.xseg.submitted, 16)
+
+    def test_block_stor_write_depth(self):
+        b = self.blocker(batch_size=64, write_depth=2)
+        blocks = [get_random_data(self.block_size) for _ in range(8)]
+        b.block_stor(blocks)
+        # all info requests are in flight together, writes are bounded
+        self.assertEqual(self.xseg.max_inflight, 8)
+        self.xseg.reset_counters()
+        b.block_stor([get_random_data(self.block_size) for _ in range(8)])
+        self.assertEqual(self.xseg.submitted, 16)
+
+    def test_block_stor_duplicates(self):
+        b = self.blocker()
+        data = get_random_data(self.block_size)
+        hashes, missing = b.block_stor([data, data, data])
+        self.assertEqual(len(set(hashes)), 1)
+        self.assertEqual(missing, [0, 1, 2])
+        # three info requests and a single write
+        self.assertEqual(self.xseg.submitted, 4)
+
+    def test_block_ping(self):
+        b = self.blocker(batch_size=3)
+        blocks = [get_random_data(self.block_size) for _ in range(5)]
+        hashes, _ = b.block_stor(blocks[:2])
+        absent = [b.block_hash(x) for x in blocks[2:]]
+        query = absent[2:] + hashes + absent + absent[:1]
+        self.xseg.reset_counters()
+        self.assertEqual(b.block_ping(query),
+                         [absent[2], absent[0], absent[1]])
+        # duplicates are checked once
+        self.assertEqual(self.xseg.submitted, 5)
+        self.assertEqual(b.block_ping(hashes), [])
+
+    def test_block_exists(self):
+        b = self.blocker(batch_size=4)
+        blocks = [get_random_data(self.block_size) for _ in range(3)]
+        hashes, _ = b.block_stor(blocks)
+        absent = [b.block_hash(get_random_data(self.block_size))
+                  for _ in range(7)]
+        self.xseg.reset_counters()
+        self.assertEqual(b.block_exists(absent[:5] + hashes + absent[5:]),
+                         [False] * 5 + [True] * 3 + [False] * 2)
+        self.assertEqual(self.xseg.submitted, 10)
+        self.assertEqual(self.xseg.max_inflight, 4)
+        self.assertEqual(b.block_exists([]), [])
+
+    def test_serial(self):
+        b = self.blocker(batch_size=1, write_depth=1)
+        blocks = [get_random_data(self.block_size) for _ in range(4)]
+        hashes, missing = b.block_stor(blocks)
+        self.assertEqual(missing, range(4))
+        self.assertEqual(self.xseg.max_inflight, 1)
+        self.assertEqual(b.block_ping(hashes), [])
+
+    def test_write_error(self):
+        b = self.blocker(write_depth=2)
+        Request = self.xseg.request_class()
+
+        class FailingRequest(Request):
+            def success(self):
+                return self.op != 'write' and super(FailingRequest,
+                                                    self).success()
+
+        blocks = [get_random_data(self.block_size) for _ in range(4)]
+        with patch(
+                'pithos.backends.lib.hashfiler.archipelagoblocker.Request',
+                FailingRequest):
+            self.assertRaises(IOError, b.block_stor, blocks)
+        self.assertEqual(b.ioctx_pool.outstanding, 0)
+
+    def test_invalid_params(self):
+        self.assertRaises(ValueError, self.blocker, batch_size=-1)
+        self.assertRaises(ValueError, self.blocker, write_depth=-2)
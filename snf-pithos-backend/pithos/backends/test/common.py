@@ -29,6 +29,8 @@ class CommonMixin(unittest.TestCase):
     hash_algorithm = 'sha256'
     account = 'user'
     free_versioning = True
+    block_module = None
+    block_params = None
 
     @classmethod
     def setUpClass(cls):
@@ -44,11 +46,20 @@ class CommonMixin(unittest.TestCase):
                                  block_size=self.block_size,
                                  hash_algorithm=self.hash_algorithm,
                                  free_versioning=self.free_versioning,
-                                 mapfile_prefix=self.mapfile_prefix)
+                                 mapfile_prefix=self.mapfile_prefix,
+                                 **self.block_kwargs())
         self.b.astakosclient = MagicMock()
         self.b.astakosclient.issue_one_commission.return_value = 42
         self.b.commission_serials = MagicMock()
 
+    def block_kwargs(self):
+        kwargs = {}
+        if self.block_module is not None:
+            kwargs['block_module'] = self.block_module
+        if self.block_params is not None:
+            kwargs['block_params'] = self.block_params
+        return kwargs
+
     def tearDown(self):
         account = self.account
         for c in self.b.list_containers(account, account):
@@ -0,0 +1,54 @@
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from pithos.backends.lib.sqlalchemy.dbwrapper import DBWrapper, pool_stats
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestDBWrapper(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.db = 'sqlite:///%s' % os.path.join(self.path, 'db')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_shared_engine(self):
+        w1 = DBWrapper(self.db)
+        w2 = DBWrapper(self.db)
+        self.assertTrue(w1.engine is w2.engine)
+        self.assertTrue(w1.conn is not w2.conn)
+        w3 = DBWrapper(self.db, pool_pre_ping=True)
+        self.assertTrue(w3.engine is not w1.engine)
+        # SQLite connections are not pooled, so they are not tested either
+        self.assertFalse(w3.engine.pool_stats.pre_ping)
+        for w in (w1, w2, w3):
+            w.close()
+
+    def test_stats(self):
+        w = DBWrapper(self.db, pool_pre_ping=True)
+        w.execute()
+        w.conn.execute('create table t (x integer)')
+        w.commit()
+        w.close()
+        stats = w.engine.pool_stats.stats()
+        self.assertEqual(stats['checkouts'], 1)
+        self.assertEqual(stats['connects'], 1)
+        self.assertEqual(stats['disconnects'], 0)
+        self.assertEqual(pool_stats()[self.db], stats)
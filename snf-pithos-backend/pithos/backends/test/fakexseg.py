@@ -0,0 +1,131 @@
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""In-process stand-in for the xseg Request API of Archipelago.
+
+The stand-in keeps the objects of a single blocker port in memory and
+models the storage round-trip: a request completes `latency` seconds after
+it has been submitted, so requests submitted together complete together.
+"""
+
+from time import time, sleep
+
+
+class FakeXseg(object):
+    """The state of an emulated Archipelago blocker port."""
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.objects = {}
+        self.submitted = 0
+        self.waited = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        self.outstanding = 0  # requests got but not put
+
+    def reset_counters(self):
+        self.submitted = 0
+        self.waited = 0
+        self.max_inflight = 0
+
+    def request_class(self):
+        """Return a Request class bound to this port."""
+        xseg = self
+
+        class FakeRequest(object):
+            def __init__(self, op, target, data=None, offset=0, size=0):
+                self.op = op
+                self.target = target
+                self.data = data
+                self.offset = offset
+                self.size = size
+                self.deadline = None
+                self.done = False
+                self.ret = False
+                self.reply = None
+                xseg.outstanding += 1
+
+            @classmethod
+            def get_info_request(cls, ioctx, dst, target):
+                return cls('info', target)
+
+            @classmethod
+            def get_write_request(cls, ioctx, dst, target, data=None,
+                                  offset=0, datalen=0):
+                return cls('write', target, data=data[:datalen],
+                           offset=offset)
+
+            @classmethod
+            def get_read_request(cls, ioctx, dst, target, size=0, offset=0):
+                return cls('read', target, offset=offset, size=size)
+
+            def submit(self):
+                assert self.deadline is None, "Request submitted twice"
+                xseg.submitted += 1
+                xseg.inflight += 1
+                xseg.max_inflight = max(xseg.max_inflight, xseg.inflight)
+                self.deadline = time() + xseg.latency
+
+            def wait(self):
+                assert self.deadline is not None, "Request not submitted"
+                if self.done:
+                    return
+                remaining = self.deadline - time()
+                if remaining > 0:
+                    sleep(remaining)
+                xseg.waited += 1
+                xseg.inflight -= 1
+                self.done = True
+                self._complete()
+
+            def _complete(self):
+                objects = xseg.objects
+                if self.op == 'info':
+                    self.ret = self.target in objects
+                elif self.op == 'write':
+                    obj = objects.get(self.target, '')
+                    obj = obj[:self.offset].ljust(self.offset, '\x00')
+                    objects[self.target] = obj + self.data
+                    self.ret = True
+                elif self.op == 'read':
+                    obj = objects.get(self.target)
+                    self.ret = obj is not None
+                    if obj is not None:
+                        self.reply = obj[self.offset:self.offset + self.size]
+
+            def success(self):
+                return self.done and self.ret
+
+            def get_data(self, _type=None):
+                return self.reply
+
+            def put(self):
+                xseg.outstanding -= 1
+
+        return FakeRequest
+
+
+class FakeIoctxPool(object):
+    """Minimal replacement of the xseg context pool."""
+
+    def __init__(self):
+        self.outstanding = 0
+
+    def pool_get(self):
+        self.outstanding += 1
+        return object()
+
+    def pool_put(self, ioctx):
+        self.outstanding -= 1
@@ -0,0 +1,113 @@
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from binascii import hexlify
+
+from pithos.backends.lib.filestore import Store
+from pithos.backends.test.util import get_random_data
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+
+class TestFileStore(unittest.TestCase):
+    block_size = 1024
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = Store(path=self.path, block_size=self.block_size,
+                           hash_algorithm='sha256', umask=0o027)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def files(self):
+        return sorted(os.path.join(d, f) for d, _, files in os.walk(self.path)
+                      for f in files)
+
+    def test_block_put_get(self):
+        data = get_random_data(self.block_size / 2)
+        h = self.store.block_put(data)
+        self.assertEqual(self.store.block_get(h),
+                         data + '\x00' * (self.block_size / 2))
+        self.assertEqual(self.store.block_get(h),
+                         self.store.block_get_archipelago(hexlify(h)))
+
+        name = hexlify(h)
+        path = os.path.join(self.path, 'blocks', name[0:2], name[2:4], name)
+        self.assertEqual(self.files(), [path])
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o640)
+
+        # storing the same block does not rewrite it
+        mtime = os.stat(path).st_mtime
+        self.assertEqual(self.store.block_put(data), h)
+        self.assertEqual(os.stat(path).st_mtime, mtime)
+        self.assertEqual(len(self.files()), 1)
+
+    def test_block_get_missing(self):
+        h = self.store.blocker.block_hash(get_random_data(10))
+        self.assertEqual(self.store.block_get(h), None)
+
+    def test_block_search(self):
+        stored = [self.store.block_put(get_random_data(self.block_size))
+                  for _ in range(3)]
+        blocker = self.store.blocker
+        absent = [blocker.block_hash(get_random_data(self.block_size))
+                  for _ in range(2)]
+        self.assertEqual(self.store.block_search(stored), [])
+        self.assertEqual(
+            self.store.block_search(absent + stored + absent[::-1]), absent)
+        self.assertEqual(self.store.block_exists(absent + stored),
+                         [False, False, True, True, True])
+
+    def test_block_update(self):
+        data = get_random_data(self.block_size)
+        h = self.store.block_put(data)
+        h2 = self.store.block_update(h, 10, 'x' * 10)
+        self.assertEqual(self.store.block_get(h2),
+                         data[:10] + 'x' * 10 + data[20:])
+        self.assertEqual(self.store.block_get(h), data)
+
+    def test_map_put_get(self):
+        hashes = [hexlify(self.store.block_put(get_random_data(10)))
+                  for _ in range(5)]
+        name = 'snf_file_1'
+        self.store.map_put(name, hashes, 5 * self.block_size, self.block_size)
+        self.assertEqual(self.store.map_get(name, 5 * self.block_size),
+                         hashes)
+        maps = [f for f in self.files() if '/maps/' in f]
+        self.assertEqual(len(maps), 1)
+        # packed binary hashes
+        self.assertEqual(os.path.getsize(maps[0]), 5 * 32)
+
+        # maps are immutable, but may be overwritten as a whole
+        self.store.map_put(name, hashes[:2], 2 * self.block_size,
+                           self.block_size)
+        self.assertEqual(self.store.map_get(name, 2 * self.block_size),
+                         hashes[:2])
+
+    def test_map_get_missing(self):
+        self.assertRaises(IOError, self.store.map_get, 'missing', 0)
+
+    def test_no_temporary_files(self):
+        for _ in range(10):
+            self.store.block_put(get_random_data(self.block_size))
+        self.store.map_put('name/with/slashes', [], 0, self.block_size)
+        self.assertEqual(self.store.map_get('name/with/slashes', 0), [])
+        self.assertFalse([f for f in self.files()
+                          if os.path.basename(f).startswith('.tmp-')])
@@ -0,0 +1,56 @@
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from pithos.backends.test.util import get_random_name
+
+
+class TestListingMixin(object):
+    def test_list_objects_delimiter(self):
+        account = self.account
+        container = get_random_name()
+        self.b.put_container(account, account, container)
+        for obj in ('a', 'a/', 'a/b', 'a/b/c', 'ax/b', 'ay', 'b/c/d', 'c'):
+            self.upload_object(account, account, container, obj)
+        self.b.delete_object(account, account, container, 'c')
+
+        def list_objects(**kwargs):
+            return [(o[0], o[1] is not None) for o in
+                    self.b.list_objects(account, account, container,
+                                        **kwargs)]
+
+        self.assertEqual(list_objects(delimiter='/'),
+                         [('a', True), ('a/', True), ('a/', False),
+                          ('ax/', False), ('ay', True), ('b/', False)])
+        self.assertEqual(list_objects(delimiter='/', limit=3),
+                         [('a', True), ('a/', True), ('a/', False)])
+        self.assertEqual(list_objects(delimiter='/', marker='ax/'),
+                         [('ax/', False), ('ay', True), ('b/', False)])
+        self.assertEqual(list_objects(prefix='a/', delimiter='/'),
+                         [('a/', True), ('a/b', True), ('a/b/', False)])
+        # 'ay' follows the common prefix 'ax' and must not be skipped
+        self.assertEqual(list_objects(delimiter='x'),
+                         [('a', True), ('a/', True), ('a/b', True),
+                          ('a/b/c', True), ('ax', False), ('ay', True),
+                          ('b/c/d', True)])
+        # without virtual directories, common prefixes do not count
+        # against the limit
+        self.assertEqual(list_objects(delimiter='/', virtual=False),
+                         [('a', True), ('a/', True), ('ay', True)])
+        self.assertEqual(list_objects(delimiter='/', marker='a/', limit=1,
+                                      virtual=False),
+                         [('ay', True)])
+        self.assertEqual(list_objects(prefix='a/', delimiter='/', limit=1,
+                                      marker='a/', virtual=False),
+                         [('a/b', True)])
@@ -0,0 +1,62 @@
+# Copyright (C) 2014 GRNET S.A.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from pithos.backends.test.util import get_random_name
+from pithos.backends.exceptions import NotAllowedError
+
+
+class TestPermissionsMixin(object):
+    def test_inherited_permissions(self):
+        account = self.account
+        other = get_random_name()
+        container = get_random_name()
+        self.b.put_container(account, account, container)
+        self.b.update_account_groups(account, account, {'group': [other]})
+        self.upload_object(account, account, container, 'd', data='',
+                           length=0, type_='application/directory',
+                           permissions={'read': ['%s:group' % account]})
+        self.upload_object(account, account, container, 'd/e/o')
+        self.upload_object(account, account, container, 'x',
+                           permissions={'read': [other]})
+        t = other, account, container
+
+        def get_meta(name):
+            return self.b.get_object_meta(*(t + (name,)),
+                                          include_user_defined=False)
+
+        # 'x' is not a folder, so 'x/o' does not inherit its permissions
+        self.upload_object(account, account, container, 'x/o')
+        self.assertRaises(NotAllowedError, get_meta, 'x/o')
+
+        get_meta('d/e/o')
+        self.assertRaises(NotAllowedError, self.b.update_object_meta,
+                          *(t + ('d/e/o', 'pithos', {'k': 'v'})))
+        self.assertEqual(self.b.get_object_permissions(*(t + ('d/e/o',))),
+                         ('read', '/'.join((account, container, 'd')),
+                          {'read': ['%s:group' % account]}))
+
+        # the closest path with permissions takes precedence
+        self.b.update_object_permissions(account, account, container,
+                                         'd/e/o', {'write': [other]})
+        self.assertEqual(self.b.get_object_permissions(*(t + ('d/e/o',))),
+                         ('write', '/'.join((account, container, 'd/e/o')),
+                          {'write': [other]}))
+        self.b.update_object_meta(*(t + ('d/e/o', 'pithos', {'k': 'v'})))
+
+        # group changes apply at once
+        get_meta('d')
+        self.b.update_account_groups(account, account, {'group': [account]},
+                                     replace=True)
+        self.assertRaises(NotAllowedError, get_meta, 'd')
@@ -13,7 +13,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from mock import call
+from mock import call, patch
 from functools import wraps, partial
 
 import uuid as uuidlib
@@ -672,6 +672,50 @@ class TestQuotaMixin(object):
                 provisions={(account, 'pithos.diskspace'): -len(data2)},
                 name='/'.join([account, container, obj2]))]
 
+    @assert_issue_commission_calls
+    def test_move_dir_to_other_project_in_pages(self):
+        account = self.account
+        container = get_random_name()
+        self.b.put_container(account, account, container)
+
+        folder = get_random_name()
+        self.create_folder(account, account, container, folder)
+
+        objects = sorted('/'.join([folder, get_random_name()])
+                         for i in range(3))
+        data = [self._upload_object(account, account, container, obj)
+                for obj in objects]
+        for obj in objects:
+            self.b.update_object_meta(account, account, container, obj,
+                                      'pithos', {'key': obj})
+
+        other_container = get_random_name()
+        project = unicode(uuidlib.uuid4())
+        self.b.put_container(account, account, other_container,
+                             policy={'project': project})
+
+        self.b.move_object(account, account, container, folder,
+                           account, other_container, folder,
+                           'application/directory',
+                           domain='pithos',
+                           delimiter='/', listing_limit=2)
+        for obj, d in zip(objects, data):
+            self.expected_issue_commission_calls += [
+                call.issue_one_commissions(
+                    holder=account,
+                    provisions={(project, 'pithos.diskspace'): len(d)},
+                    name='/'.join([account, other_container, obj])),
+                call.issue_one_commissions(
+                    holder=account,
+                    provisions={(account, 'pithos.diskspace'): -len(d)},
+                    name='/'.join([account, container, obj]))]
+            self.assertObjectNotExist(account, container, obj)
+            self.assertObjectExists(account, other_container, obj)
+            meta = self.b.get_object_meta(account, account, other_container,
+                                          obj, 'pithos',
+                                          include_user_defined=True)
+            self.assertEqual(meta['key'], obj)
+
     @assert_issue_commission_calls
     def test_move_dir_to_other_account(self):
         account = self.account
@@ -785,3 +829,150 @@ class TestQuotaMixin(object):
                 holder=account,
                 provisions={(project, 'pithos.diskspace'): -len(data)},
                 name='/'.join([account, container, folder, '']))]
+
+    @assert_issue_commission_calls
+    def test_delete_dir_in_chunks(self):
+        account = self.account
+        container = get_random_name()
+        project = unicode(uuidlib.uuid4())
+        self.b.put_container(account, account, container,
+                             policy={'project': project})
+        self.b.delete_chunk_size = 2
+
+        folder = get_random_name()
+        self.create_folder(account, account, container, folder)
+
+        objects = sorted('/'.join([folder, get_random_name()])
+                         for i in range(3))
+        data = [self._upload_object(account, account, container, obj)
+                for obj in objects]
+
+        self.b.delete_object(account, account, container, folder,
+                             delimiter='/')
+
+        name = '/'.join([account, container, folder, ''])
+        self.expected_issue_commission_calls += [
+            call.issue_one_commissions(
+                holder=account,
+                provisions={(project, 'pithos.diskspace'):
+                            -len(data[0] + data[1])},
+                name=name),
+            call.issue_one_commissions(
+                holder=account,
+                provisions={(project, 'pithos.diskspace'): -len(data[2])},
+                name=name)]
+        for obj in objects:
+            self.assertObjectNotExist(account, container, obj)
+
+    @assert_issue_commission_calls
+    def test_delete_dir_resumed(self):
+        account = self.account
+        container = get_random_name()
+        project = unicode(uuidlib.uuid4())
+        self.b.put_container(account, account, container,
+                             policy={'project': project})
+        self.b.delete_chunk_size = 2
+
+        folder = get_random_name()
+        self.create_folder(account, account, container, folder)
+
+        objects = sorted('/'.join([folder, get_random_name()])
+                         for i in range(5))
+        data = [self._upload_object(account, account, container, obj)
+                for obj in objects]
+
+        # fail the second chunk
+        delete_chunk = self.b._delete_objects_chunk
+        chunks = []
+
+        def failing_delete_chunk(*args):
+            chunks.append(args)
+            if len(chunks) == 2:
+                raise IOError
+            return delete_chunk(*args)
+
+        with patch.object(self.b, '_delete_objects_chunk',
+                          failing_delete_chunk):
+            self.assertRaises(IOError, self.b.delete_object, account,
+                              account, container, folder, delimiter='/')
+        self.assertObjectExists(account, container, folder)
+        for obj in objects[2:]:
+            self.assertObjectExists(account, container, obj)
+
+        # repeating the request resumes the deletion
+        self.b.delete_object(account, account, container, folder,
+                             delimiter='/')
+
+        name = '/'.join([account, container, folder, ''])
+        self.expected_issue_commission_calls += [
+            call.issue_one_commissions(
+                holder=account,
+                provisions={(project, 'pithos.diskspace'):
+                            -len(data[0] + data[1])},
+                name=name),
+            call.issue_one_commissions(
+                holder=account,
+                provisions={(project, 'pithos.diskspace'):
+                            -len(data[2] + data[3])},
+                name=name),
+            call.issue_one_commissions(
+                holder=account,
+                provisions={(project, 'pithos.diskspace'): -len(data[4])},
+                name=name)]
+        self.assertObjectNotExist(account, container, folder)
+        for obj in objects:
+            self.assertObjectNotExist(account, container, obj)
+
+    def test_aggregate_commissions(self):
+        account = self.account
+        container = get_random_name()
+        project = unicode(uuidlib.uuid4())
+        self.b.aggregate_commissions = True
+        self.b.astakosclient.issue_commission_generic.return_value = 43
+        self.b.astakosclient.resolve_commissions.return_value = {
+            'accepted': [43], 'rejected': []}
+
+        self.b.pre_exec()
+        self.b.put_container(account, account, container,
+                             policy={'project': project})
+        folder = get_random_name()
+        self.create_folder(account, account, container, folder)
+        data = ''
+        for i in range(3):
+            obj = '/'.join([folder, get_random_name()])
+            data += self.upload_object(account, account, container, obj)
+        other_folder = get_random_name()
+        self.b.copy_object(account, account, container, folder,
+                           account, container, other_folder,
+                           'application/directory', domain='pithos',
+                           delimiter='/')
+        self.b.post_exec(True)
+
+        self.assertEqual(self.b.astakosclient.issue_one_commission.mock_calls,
+                         [])
+        issue = self.b.astakosclient.issue_commission_generic
+        self.assertEqual(issue.call_count, 1)
+        user_provisions, project_provisions = issue.call_args[0]
+        self.assertEqual(
+            user_provisions,
+            {(account, project, 'pithos.diskspace'): 2 * len(data)})
+        self.assertEqual(project_provisions,
+                         {(project, 'pithos.diskspace'): 2 * len(data)})
+        self.b.astakosclient.resolve_commissions.assert_called_once_with(
+            accept_serials=[43], reject_serials=[])
+
+    def test_aggregate_commissions_failure(self):
+        account = self.account
+        container = get_random_name()
+        obj = get_random_name()
+        self.b.aggregate_commissions = True
+        self.b.put_container(account, account, container)
+        self.b.astakosclient.issue_commission_generic.side_effect = \
+            ValueError()
+
+        self.b.pre_exec()
+        self.upload_object(account, account, container, obj)
+        self.assertRaises(ValueError, self.b.post_exec, True)
+        self.assertFalse(self.b.in_transaction)
+        self.assertEqual(self.b.list_objects(account, account, container),
+                         [])
@@ -15,6 +15,8 @@
 
 import uuid as uuidlib
 
+from mock import MagicMock
+
 from pithos.backends.exceptions import (IllegalOperationError, NotAllowedError,
                                         ItemNotExists, BrokenSnapshot)
 from pithos.backends.modular import MAP_ERROR, MAP_UNAVAILABLE, MAP_AVAILABLE
@@ -199,3 +201,43 @@ class TestSnapshotsMixin(object):
         self.assertEqual(meta['uuid'], uuid)
         self.assertTrue('available' in meta)
         self.assertEqual(meta['available'], MAP_UNAVAILABLE)
+
+    def test_get_domain_objects_available(self):
+        names = ['snf-snap-2-%d' % i for i in range(3)]
+        for name in names:
+            self.b.register_object_map(self.account, self.account,
+                                       'snapshots', name, domain='test',
+                                       size=100,
+                                       type='application/octet-stream',
+                                       mapfile='archip:%s' % name,
+                                       meta={'foo': 'bar'},
+                                       permissions={'read': ['somebody']})
+
+        def map_get(name, size):
+            if name == 'archip:%s' % names[0]:
+                raise IOError
+            return []
+        self.b.store.map_get = MagicMock(side_effect=map_get)
+        self.b.map_check_interval = 3600
+        self.b.map_check_batch_size = 2
+
+        def list_available():
+            objects = self.b.get_domain_objects(domain='test',
+                                                user=self.account)
+            for path, meta, permissions in objects:
+                self.assertEqual(permissions, {'read': ['somebody']})
+            return dict((path.rsplit('/', 1)[1], meta['available'])
+                        for path, meta, permissions in objects)
+
+        # at most map_check_batch_size maps are checked per listing
+        list_available()
+        self.assertEqual(self.b.store.map_get.call_count, 2)
+        self.assertEqual(list_available(),
+                         {names[0]: MAP_UNAVAILABLE,
+                          names[1]: MAP_AVAILABLE,
+                          names[2]: MAP_AVAILABLE})
+        self.assertEqual(self.b.store.map_get.call_count, 3)
+
+        # missing maps are not checked again before map_check_interval
+        list_available()
+        self.assertEqual(self.b.store.map_get.call_count, 3)
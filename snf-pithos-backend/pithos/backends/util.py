@@ -56,6 +56,8 @@ class PithosBackendPool(ObjectPool):
             try:
                 r, w, x = select([fd], (), (), 0)
                 if r:
+                    # Do not return a dead connection to the engine pool.
+                    conn.invalidate()
                     conn.close()
                     return False
             except: